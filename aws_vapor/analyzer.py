@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+from typing import Dict, List, Tuple
+
+from aws_vapor import dsl, encoder
+
+DEFAULT_MAX_BYTES = 1048576
+DEFAULT_MAX_RESOURCES = 500
+DEFAULT_MAX_PARAMETERS = 200
+DEFAULT_MAX_OUTPUTS = 200
+DEFAULT_TOP = 10
+
+
+class LimitExceededError(ValueError):
+    """This error is raised when a template exceeds limits of AWS CloudFormation."""
+
+
+class SizeReport(object):
+    """This class holds encoded sizes of a template, of its sections and of its elements in bytes.
+
+    A size of a section includes its name and brackets, and a size of the template includes all of them.
+    """
+
+    def __init__(self):
+        self.total_bytes = 0
+        self.sections = {}  # type: Dict[str, int]
+        self.counts = {}  # type: Dict[str, int]
+        self.elements = []  # type: List[Tuple[str, str, int]]
+
+    def largest(self, top: int = DEFAULT_TOP) -> List[Tuple[str, str, int]]:
+        """Return a section name, an element name and a size of the largest elements in descending order of size."""
+        return sorted(self.elements, key=lambda element: -element[2])[:top]
+
+    def violations(self, max_bytes: int = DEFAULT_MAX_BYTES, max_resources: int = DEFAULT_MAX_RESOURCES,
+                   max_parameters: int = DEFAULT_MAX_PARAMETERS, max_outputs: int = DEFAULT_MAX_OUTPUTS) -> List[str]:
+        """Return descriptions of limits which the template exceeds.
+
+        Args:
+            max_bytes: A maximum size of the template in bytes. If 0, the size is not limited.
+
+            max_resources: A maximum number of resources. If 0, the number is not limited.
+
+            max_parameters: A maximum number of parameters. If 0, the number is not limited.
+
+            max_outputs: A maximum number of outputs. If 0, the number is not limited.
+
+        Returns:
+            Descriptions of exceeded limits.
+
+        """
+        violations = []
+        if max_bytes and self.total_bytes > max_bytes:
+            violations.append('template size %s bytes exceeds %s bytes' % (
+                '{:,}'.format(self.total_bytes), '{:,}'.format(max_bytes)))
+        for section_name, maximum in (('Resources', max_resources), ('Parameters', max_parameters),
+                                      ('Outputs', max_outputs)):
+            count = self.counts.get(section_name, 0)
+            if maximum and count > maximum:
+                violations.append('%s %s exceed %s %s' % (
+                    '{:,}'.format(count), section_name.lower(), '{:,}'.format(maximum), section_name.lower()))
+        return violations
+
+    def format(self, top: int = DEFAULT_TOP) -> str:
+        """Format sizes of the template, of its sections and of its largest elements."""
+        def ratio(size: int) -> str:
+            return '%.1f%%' % (size * 100.0 / self.total_bytes) if self.total_bytes else '-'
+
+        lines = ['template: %s bytes, %s resources' % (
+            '{:,}'.format(self.total_bytes), '{:,}'.format(self.counts.get('Resources', 0)))]
+        for section_name, size in sorted(list(self.sections.items()), key=lambda section: -section[1]):
+            lines.append('  %s: %s bytes (%s), %s elements' % (
+                section_name, '{:,}'.format(size), ratio(size), '{:,}'.format(self.counts[section_name])))
+        if self.elements:
+            lines.append('largest elements:')
+            for section_name, name, size in self.largest(top):
+                lines.append('  %s/%s: %s bytes (%s)' % (section_name, name, '{:,}'.format(size), ratio(size)))
+        return '\n'.join(lines)
+
+
+def analyze(template: dsl.Template, encoding: encoder.Encoding = encoder.DEFAULT_ENCODING) -> SizeReport:
+    """Measure encoded sizes of a template, of its sections and of its elements in one traversal.
+
+    Elements are encoded by :mod:`aws_vapor.encoder` or :mod:`aws_vapor.emitter`, which cache them,
+    so that writing the template afterwards doesn't encode them again.
+
+    Args:
+        template: A template builder.
+
+        encoding: A style of the document and a backend, with which the template is written.
+
+    Returns:
+        A report of sizes.
+
+    """
+    report = SizeReport()
+    for section_name, element, chunk in encoding.iter_fragments(template):
+        size = len(chunk.encode('utf-8'))
+        report.total_bytes += size
+        if section_name is None:
+            continue
+        if section_name not in report.sections:
+            report.sections[section_name] = 0
+            report.counts[section_name] = 0
+        report.sections[section_name] += size
+        if element is not None:
+            report.counts[section_name] += 1
+            report.elements.append((section_name, element.name, size))
+    return report
+
+
+def check_limits(template: dsl.Template, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_resources: int = DEFAULT_MAX_RESOURCES, top: int = DEFAULT_TOP,
+                 encoding: encoder.Encoding = encoder.DEFAULT_ENCODING, max_parameters: int = DEFAULT_MAX_PARAMETERS,
+                 max_outputs: int = DEFAULT_MAX_OUTPUTS) -> SizeReport:
+    """Analyze a template and raise an error with a report if it exceeds limits.
+
+    Args:
+        template: A template builder.
+
+        max_bytes: A maximum size of the template in bytes. If 0, the size is not limited.
+
+        max_resources: A maximum number of resources. If 0, the number is not limited.
+
+        top: A number of the largest elements in a report.
+
+        encoding: A style of the document and a backend, with which the template is written.
+
+        max_parameters: A maximum number of parameters. If 0, the number is not limited.
+
+        max_outputs: A maximum number of outputs. If 0, the number is not limited.
+
+    Returns:
+        A report of sizes.
+
+    Raises:
+        LimitExceededError: If the template exceeds any of limits.
+
+    """
+    report = analyze(template, encoding)
+    violations = report.violations(max_bytes, max_resources, max_parameters, max_outputs)
+    if violations:
+        raise LimitExceededError('%s\n%s' % ('\n'.join(violations), report.format(top)))
+    return report
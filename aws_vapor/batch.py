@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Iterator, List, Tuple
+from argparse import ArgumentParser
+
+from aws_vapor import generator, utils
+from cliff.command import Command
+
+import fnmatch
+import logging
+import os
+import re
+import time
+
+OUTPUT_FILE_EXTENSION = '.json'
+
+
+class Batch(Command):
+    """This class generates AWS CloudFormation templates from all vaporfiles under a directory."""
+
+    log = logging.getLogger(__name__)
+
+    def get_parser(self, program_name: str) -> ArgumentParser:
+        parser = super(Batch, self).get_parser(program_name)
+        parser.add_argument('directory',
+                            help='a directory searched for vaporfiles recursively')
+        parser.add_argument('--pattern', default='*.py',
+                            help='a glob pattern of file names of vaporfiles')
+        parser.add_argument('--task', default=generator.DEFAULT_TASK_NAME,
+                            help='a task name defined in each vaporfile')
+        parser.add_argument('--contrib',
+                            help='a module search path of contrib recipes')
+        parser.add_argument('--recipe', nargs='+',
+                            help='a module name of contrib recipe')
+        parser.add_argument('--output-dir', required=True,
+                            help='a directory to which templates are written in the same layout as vaporfiles')
+        parser.add_argument('--jobs', type=int,
+                            help='a number of processes generating templates in parallel')
+        return parser
+
+    def take_action(self, args: Any) -> int:
+        directory = os.path.abspath(args.directory)
+        output_directory = os.path.abspath(args.output_dir)
+
+        defaults = utils.get_properties_from_config_file('defaults', ['contrib', 'recipes'])
+        contrib = args.contrib or defaults['contrib']
+        recipes = args.recipe
+        if recipes is None and defaults['recipes'] is not None:
+            recipes = defaults['recipes'].split()
+
+        file_paths = find_vaporfiles(directory, args.pattern, args.task)
+        jobs = [(file_path, output_file_path(directory, file_path, output_directory)) for file_path in file_paths]
+
+        started = time.perf_counter()
+        failures = 0
+        for file_path, elapsed, error in generate_vaporfiles(jobs, args.task, contrib, recipes, args.jobs):
+            if error is None:
+                self.log.info('generated %s in %.3fs', file_path, elapsed)
+            else:
+                failures += 1
+                self.log.error('failed to generate %s in %.3fs\n%s', file_path, elapsed, error)
+
+        self.log.info('generated %d of %d vaporfiles in %.3fs',
+                      len(jobs) - failures, len(jobs), time.perf_counter() - started)
+        return 1 if failures > 0 else 0
+
+
+def find_vaporfiles(directory: str, pattern: str, task_name: str) -> List[str]:
+    """Find vaporfiles defining a task under a directory.
+
+    Files are matched by a name and checked to define a top level function named `task_name`
+    without being imported, so that helper modules next to vaporfiles are skipped.
+
+    Args:
+        directory: A directory searched recursively.
+
+        pattern: A glob pattern of file names.
+
+        task_name: A task name which vaporfiles should define.
+
+    Returns:
+        Sorted absolute paths to vaporfiles.
+
+    """
+    task_definition = re.compile(r'^def\s+%s\s*\(' % re.escape(task_name), re.MULTILINE)
+
+    file_paths = []
+    for parent, directories, filenames in os.walk(directory):
+        directories[:] = sorted([d for d in directories if not d.startswith('.') and d != '__pycache__'])
+        for filename in sorted(fnmatch.filter(filenames, pattern)):
+            if filename.startswith('_'):
+                continue
+            file_path = os.path.join(parent, filename)
+            if task_definition.search(utils.read_file(file_path)):
+                file_paths.append(file_path)
+    return sorted(file_paths)
+
+
+def output_file_path(directory: str, file_path: str, output_directory: str) -> str:
+    """Return a path to an output file, relative path of which is the same as a vaporfile's."""
+    relative_path = os.path.relpath(os.path.splitext(file_path)[0], directory)
+    return os.path.join(output_directory, relative_path + OUTPUT_FILE_EXTENSION)
+
+
+def generate_vaporfile(file_path: str, task_name: str, contrib: str, recipes: List[str],
+                       output_path: str) -> Tuple[str, float, str]:
+    """Generate an AWS CloudFormation template from a vaporfile in a worker process.
+
+    Modules imported from the directory of the vaporfile are unloaded afterwards,
+    so that vaporfiles in other directories can import their own modules having the same names.
+
+    Returns:
+        The path to the vaporfile, elapsed seconds and a formatted traceback if failed, otherwise `None`.
+
+    """
+    current_directory = os.getcwd()
+    with utils.unload_modules_from(os.path.dirname(file_path)):
+        try:
+            _, elapsed, error = generator.generate_task(file_path, task_name, contrib, recipes, output_path)
+        finally:
+            os.chdir(current_directory)
+    return file_path, elapsed, error
+
+
+def generate_vaporfiles(jobs: List[Tuple[str, str]], task_name: str, contrib: str, recipes: List[str],
+                        max_workers: int = None) -> Iterator[Tuple[str, float, str]]:
+    """Generate AWS CloudFormation templates from vaporfiles in a pool of worker processes.
+
+    Args:
+        jobs: Pairs of a path to a vaporfile and a path to its output file.
+
+        task_name: A task name defined in each vaporfile.
+
+        contrib: A module search path of contrib recipes.
+
+        recipes: Module names of contrib recipes, or `None`.
+
+        max_workers: A number of worker processes. If not specified, a number of CPUs is used.
+            If 1, vaporfiles are generated one by one in the current process.
+
+    Returns:
+        An iterator of results of :func:`generate_vaporfile` in order of `jobs`.
+
+    """
+    for output_path in set([output_path for _, output_path in jobs]):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    if max_workers <= 1:
+        for file_path, output_path in jobs:
+            yield generate_vaporfile(file_path, task_name, contrib, recipes, output_path)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(generate_vaporfile,
+                               [file_path for file_path, _ in jobs],
+                               [task_name] * len(jobs),
+                               [contrib] * len(jobs),
+                               [recipes] * len(jobs),
+                               [output_path for _, output_path in jobs],
+                               chunksize=max(len(jobs) // (max_workers * 4), 1))
+        for result in results:
+            yield result
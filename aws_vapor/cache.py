@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Dict, Iterable, List, Tuple
+
+from aws_vapor import utils
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+import aws_vapor.meta as meta
+
+DEFAULT_CACHE_DIRECTORY = os.path.join(utils.GLOBAL_CONFIG_DIRECTORY, 'cache')
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+STATS_FILE_NAME = 'stats.json'
+BLOCK_SIZE = 64 * 1024
+
+
+def hash_bytes(data: bytes) -> str:
+    """Return a SHA-256 hex digest of `data`."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(file_path: str) -> str:
+    """Return a SHA-256 hex digest of a file content, or `None` if the file doesn't exist."""
+    hasher = hashlib.sha256()
+    try:
+        with open(file_path, mode='rb') as fh:
+            for block in iter(lambda: fh.read(BLOCK_SIZE), b''):
+                hasher.update(block)
+    except OSError:
+        return None
+    return hasher.hexdigest()
+
+
+def _touch(file_path: str):
+    try:
+        os.utime(file_path)
+    except OSError:
+        pass
+
+
+class BuildCache(object):
+    """This class stores generated templates on disk, addressed by hashes of their inputs.
+
+    An entry consists of a manifest and an object. A manifest is named after a key of a task,
+    that is, a hash of the vaporfile source, the task name, the recipes, the output options and the aws-vapor version.
+    It records hashes of files which the task depended on while generating it, and a hash of the template,
+    under which the template is stored as an object. An entry is used only if none of the files has been modified.
+
+    When the total size of entries exceeds `max_bytes`, the least recently used entries are evicted.
+
+    Only files read through :mod:`aws_vapor.utils` and modules imported from the vaporfile's directory
+    and the contrib directory are recorded, so that only tasks depending on nothing else,
+    such as files read by :func:`open` or environment variables, should be generated with the cache.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        self.directory = os.path.abspath(directory or DEFAULT_CACHE_DIRECTORY)
+        self.max_bytes = DEFAULT_CACHE_SIZE if max_bytes is None else max_bytes
+
+    def _manifest_path(self, key: str) -> str:
+        return os.path.join(self.directory, 'manifests', key[:2], key + '.json')
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    def key_of(self, file_path: str, task_name: str, contrib: str, recipes: List[str],
+               options: Dict[str, Any] = None) -> str:
+        """Return a key of a task.
+
+        Args:
+            file_path: A path to vaporfile.
+
+            task_name: A task name defined in vaporfile.
+
+            contrib: A module search path of contrib recipes.
+
+            recipes: Module names of contrib recipes, or `None`.
+
+            options: A mapping of options affecting the output.
+
+        Returns:
+            A hex digest.
+
+        """
+        inputs = {
+            'version': meta.version,
+            'python': list(sys.version_info[:2]),
+            'vaporfile': os.path.abspath(file_path),
+            'source': hash_file(file_path),
+            'task': task_name,
+            'contrib': os.path.abspath(contrib) if contrib is not None else None,
+            'recipes': list(recipes) if recipes is not None else None,
+            'options': options or {},
+        }
+        return hash_bytes(json.dumps(inputs, sort_keys=True).encode('utf-8'))
+
+    def lookup(self, key: str) -> str:
+        """Return a path to a template stored under a key.
+
+        Returns:
+            A path to a file of the template, or `None` if not stored or any of its dependencies is modified.
+
+        """
+        try:
+            with open(self._manifest_path(key)) as fh:
+                manifest = json.load(fh)
+            for file_path, digest in list(manifest['dependencies'].items()):
+                if hash_file(file_path) != digest:
+                    raise LookupError(file_path)
+            object_path = self._object_path(manifest['output'])
+            if hash_file(object_path) != manifest['output']:
+                raise LookupError(manifest['output'])
+        except (OSError, ValueError, KeyError, LookupError):
+            return None
+
+        _touch(self._manifest_path(key))
+        _touch(object_path)
+        return object_path
+
+    def store(self, key: str, chunks: Iterable[str], dependencies: Iterable[str]) -> str:
+        """Store a template under a key with hashes of files which it depends on.
+
+        The template is written chunk by chunk to a temporary file, which is hashed as it is written,
+        so that the whole template is never held in memory.
+
+        Args:
+            key: A key of a task, as :meth:`key_of` returns.
+
+            chunks: An iterable of chunks of the template.
+
+            dependencies: Paths to files which the template depends on.
+
+        Returns:
+            A path to a file of the template.
+
+        """
+        temporary_directory = os.path.join(self.directory, 'tmp')
+        os.makedirs(temporary_directory, exist_ok=True)
+        hasher = hashlib.sha256()
+        fd, temporary_path = tempfile.mkstemp(dir=temporary_directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, mode='wb') as fh:
+                for chunk in chunks:
+                    data = chunk.encode('utf-8')
+                    hasher.update(data)
+                    fh.write(data)
+            os.chmod(temporary_path, 0o644)
+            object_path = self._object_path(hasher.hexdigest())
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.replace(temporary_path, object_path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+
+        manifest = {
+            'dependencies': {file_path: hash_file(file_path) for file_path in sorted(dependencies)},
+            'output': hasher.hexdigest(),
+            'created': time.time(),
+        }
+        utils.write_file_atomically(self._manifest_path(key), json.dumps(manifest, sort_keys=True).encode('utf-8'))
+        return object_path
+
+    def _entries(self) -> Tuple[List[Tuple[float, str, str, int]], Dict[str, int]]:
+        manifests = []
+        objects = {}
+        for subdirectory in ['manifests', 'objects']:
+            for root, _, filenames in os.walk(os.path.join(self.directory, subdirectory)):
+                for filename in filenames:
+                    file_path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(file_path)
+                        if subdirectory == 'objects':
+                            objects[filename] = stat.st_size
+                            continue
+                        with open(file_path) as fh:
+                            output = json.load(fh)['output']
+                    except (OSError, ValueError, KeyError):
+                        continue
+                    manifests.append((stat.st_mtime, file_path, output, stat.st_size))
+        manifests.sort()
+        return manifests, objects
+
+    def evict(self) -> int:
+        """Evict the least recently used entries until the total size is at most `max_bytes`.
+
+        Returns:
+            A number of evicted entries.
+
+        """
+        manifests, objects = self._entries()
+        references = {}
+        for _, _, output, _ in manifests:
+            references[output] = references.get(output, 0) + 1
+        total = sum([size for _, _, _, size in manifests]) + sum(list(objects.values()))
+
+        evicted = 0
+        for _, file_path, output, size in manifests:
+            if total <= self.max_bytes:
+                break
+            os.remove(file_path)
+            total -= size
+            evicted += 1
+            references[output] -= 1
+            if references[output] == 0 and output in objects:
+                os.remove(self._object_path(output))
+                total -= objects.pop(output)
+
+        for digest in [digest for digest in objects if not references.get(digest)]:
+            os.remove(self._object_path(digest))
+        return evicted
+
+    def clear(self):
+        """Remove all entries and statistics."""
+        import shutil
+        if os.path.exists(self.directory):
+            shutil.rmtree(self.directory)
+
+    def save_stats(self, hits: int, misses: int):
+        """Add numbers of hits and misses of a run to the statistics saved in the cache directory.
+
+        Args:
+            hits: A number of templates restored from the cache.
+
+            misses: A number of templates not found in the cache.
+
+        """
+        stats = self._load_stats()
+        stats['hits'] += hits
+        stats['misses'] += misses
+        utils.write_file_atomically(os.path.join(self.directory, STATS_FILE_NAME), json.dumps(stats).encode('utf-8'))
+
+    def _load_stats(self) -> Dict[str, int]:
+        try:
+            with open(os.path.join(self.directory, STATS_FILE_NAME)) as fh:
+                stats = json.load(fh)
+            return {'hits': int(stats['hits']), 'misses': int(stats['misses'])}
+        except (OSError, ValueError, KeyError):
+            return {'hits': 0, 'misses': 0}
+
+    def stats(self) -> Dict[str, int]:
+        """Return statistics of the cache.
+
+        Returns:
+            A mapping of statistics.
+
+            example::
+
+                {
+                    'hits': 10,         # hits saved by `save_stats`
+                    'misses': 4,        # misses saved by `save_stats`
+                    'entries': 4,
+                    'bytes': 20480,
+                    'max_bytes': 67108864
+                }
+
+        """
+        manifests, objects = self._entries()
+        saved = self._load_stats()
+        return {
+            'hits': saved['hits'],
+            'misses': saved['misses'],
+            'entries': len(manifests),
+            'bytes': sum([size for _, _, _, size in manifests]) + sum(list(objects.values())),
+            'max_bytes': self.max_bytes,
+        }
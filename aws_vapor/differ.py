@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Dict, Iterator, List, Tuple
+from argparse import ArgumentParser
+
+from aws_vapor import dsl, generator, utils
+from cliff.command import Command
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+DIGEST_KEY = ('digest',)
+DIGEST_SIZE = 16
+CANONICAL_SEPARATORS = (',', ':')
+TEMPLATE_LEVELS = 2
+
+Change = Tuple[str, Tuple[Any, ...], Any, Any]
+
+
+class Differ(Command):
+    """This class compares two AWS CloudFormation templates, generated from vaporfiles or read from JSON files."""
+
+    log = logging.getLogger(__name__)
+
+    def get_parser(self, program_name: str) -> ArgumentParser:
+        parser = super(Differ, self).get_parser(program_name)
+        parser.add_argument('old',
+                            help='a vaporfile (*.py) or a JSON file of a template before changes')
+        parser.add_argument('new',
+                            help='a vaporfile (*.py) or a JSON file of a template after changes')
+        parser.add_argument('--task', default=generator.DEFAULT_TASK_NAME,
+                            help='a task name defined in vaporfiles')
+        parser.add_argument('--contrib',
+                            help='a module search path of contrib recipes')
+        parser.add_argument('--recipe', nargs='+',
+                            help='a module name of contrib recipe')
+        parser.add_argument('--names-only', action='store_true', default=False,
+                            help='a flag whether or not only paths to changed values are shown')
+        return parser
+
+    def take_action(self, args: Any) -> int:
+        """Show changes between two templates, and return 1 if they differ, as `diff` does."""
+        file_paths = [os.path.abspath(args.old), os.path.abspath(args.new)]
+
+        contrib = None
+        if args.recipe is not None:
+            contrib = args.contrib or utils.get_property_from_config_file('defaults', 'contrib')
+
+        started = time.perf_counter()
+        memo = {}  # type: Dict[int, bytes]
+        old, new = [load_tree(file_path, args.task, contrib, args.recipe, memo) for file_path in file_paths]
+
+        changes = 0
+        for change in diff_templates(old, new, memo):
+            changes += 1
+            self.app.stdout.write(format_change(change, args.names_only) + '\n')
+
+        self.log.info('found %d changes in %.3fs', changes, time.perf_counter() - started)
+        return 1 if changes > 0 else 0
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k if isinstance(k, str) else json.dumps(k): _normalize(v) for k, v in list(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def digest_value(value: Any, memo: Dict[int, bytes] = None) -> bytes:
+    """Return a hash of a value, which is computed from its JSON document with sorted keys.
+
+    Mappings are hashed regardless of an order of their keys, and values which are encoded as the same JSON document,
+    such as a tuple and a list, have the same hash.
+
+    Args:
+        value: A value of a template.
+
+        memo: A mapping of `id()` of a mapping or a list to its hash, which are reused and added to.
+            Every value in it must be alive and not modified since it was hashed.
+
+    Returns:
+        A hash.
+
+    """
+    container = isinstance(value, (dict, list, tuple))
+    if container and memo is not None and id(value) in memo:
+        return memo[id(value)]
+    try:
+        document = json.dumps(value, sort_keys=True, separators=CANONICAL_SEPARATORS)
+    except TypeError:
+        # keys other than strings can't be sorted together with strings.
+        document = json.dumps(_normalize(value), sort_keys=True, separators=CANONICAL_SEPARATORS)
+    digest = hashlib.blake2b(document.encode('utf-8'), digest_size=DIGEST_SIZE).digest()
+    if container and memo is not None:
+        memo[id(value)] = digest
+    return digest
+
+
+def digest_tree(tree: Dict[str, Any], memo: Dict[int, bytes] = None) -> bytes:
+    """Return a Merkle hash of a mapping of a template.
+
+    A hash of a template is computed from hashes of its sections, and a hash of a section from hashes of its elements,
+    so that hashes cached on elements which are not modified are reused.
+
+    Args:
+        tree: A mapping of a template.
+
+        memo: A mapping passed to :func:`digest_value`.
+
+    Returns:
+        A hash.
+
+    """
+    hasher = hashlib.blake2b(b'template', digest_size=DIGEST_SIZE)
+    for key, value in sorted(list(tree.items()), key=lambda entry: entry[0]):
+        hasher.update(json.dumps(key).encode('utf-8'))
+        if isinstance(value, dict):
+            section = hashlib.blake2b(b'section', digest_size=DIGEST_SIZE)
+            for name, attrs in sorted(list(value.items()), key=lambda entry: entry[0]):
+                section.update(json.dumps(name).encode('utf-8'))
+                section.update(digest_value(attrs, memo))
+            hasher.update(section.digest())
+        else:
+            hasher.update(digest_value(value, memo))
+    return hasher.digest()
+
+
+def digest_element(element: dsl.Element) -> Dict[str, bytes]:
+    """Return hashes of entries that an element puts into a top level section.
+
+    The hashes are cached on the element, and reused until the element (or a value in it) is modified.
+
+    Args:
+        element: An element of a template.
+
+    Returns:
+        A mapping of a logical name to a hash of its attributes.
+
+    """
+    def digest(target: dsl.Element) -> Dict[str, bytes]:
+        fragment = {}
+        target.to_template(fragment)
+        return {name: digest_value(attrs) for name, attrs in list(fragment.items())}
+
+    return element.cached(DIGEST_KEY, digest)
+
+
+def template_tree(template: dsl.Template, memo: Dict[int, bytes]) -> Dict[str, Any]:
+    """Convert a template as `Template.to_template` does, adding cached hashes of its elements to `memo`.
+
+    Args:
+        template: A template builder.
+
+        memo: A mapping which is passed to :func:`digest_value` later.
+
+    Returns:
+        A mapping of a template.
+
+    """
+    tree = {'AWSTemplateFormatVersion': template.version, 'Description': template.description}
+    for section_name, elements in list(template.elements.items()):
+        section = tree[section_name] = {}
+        for element in elements:
+            fragment = {}
+            element.to_template(fragment)
+            digests = digest_element(element)
+            for name, attrs in list(fragment.items()):
+                if isinstance(attrs, (dict, list, tuple)) and name in digests:
+                    memo[id(attrs)] = digests[name]
+            section.update(fragment)
+    return tree
+
+
+def digest_template(template: dsl.Template) -> bytes:
+    """Return a Merkle hash of a template as :func:`digest_tree` does, reusing hashes cached on elements."""
+    memo = {}  # type: Dict[int, bytes]
+    return digest_tree(template_tree(template, memo), memo)
+
+
+def diff_values(old: Any, new: Any, memo: Dict[int, bytes] = None, path: Tuple[Any, ...] = (),
+                expand: int = 0) -> Iterator[Change]:
+    """Compare two values by their hashes, descending only into items whose hashes differ.
+
+    Items of sequences are compared by their positions.
+
+    Args:
+        old: A value before changes.
+
+        new: A value after changes.
+
+        memo: A mapping passed to :func:`digest_value`, so that each item is hashed once.
+
+        path: Keys and indexes from the top of templates to the values.
+
+        expand: A number of levels which are descended without being hashed, such as the top level and sections
+            of templates, whose elements are compared by their hashes.
+
+    Returns:
+        An iterator of a kind of a change, which is `added`, `removed` or `changed`,
+        keys and indexes to a changed value, an old value and a new value.
+
+    """
+    if memo is None:
+        memo = {}
+    if expand <= 0 and digest_value(old, memo) == digest_value(new, memo):
+        return
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, value in list(old.items()):
+            if key not in new:
+                yield 'removed', path + (key,), value, None
+            else:
+                for change in diff_values(value, new[key], memo, path + (key,), expand - 1):
+                    yield change
+        for key, value in list(new.items()):
+            if key not in old:
+                yield 'added', path + (key,), None, value
+    elif isinstance(old, (list, tuple)) and isinstance(new, (list, tuple)):
+        for index in range(min(len(old), len(new))):
+            for change in diff_values(old[index], new[index], memo, path + (index,), expand - 1):
+                yield change
+        for index in range(len(new), len(old)):
+            yield 'removed', path + (index,), old[index], None
+        for index in range(len(old), len(new)):
+            yield 'added', path + (index,), None, new[index]
+    elif old != new or type(old) != type(new):
+        yield 'changed', path, old, new
+
+
+def diff_templates(old: Dict[str, Any], new: Dict[str, Any], memo: Dict[int, bytes] = None) -> Iterator[Change]:
+    """Compare two mappings of templates element by element, as :func:`diff_values` does."""
+    return diff_values(old, new, memo, expand=TEMPLATE_LEVELS)
+
+
+def format_change(change: Change, names_only: bool = False) -> str:
+    """Format a change as `+ path: value`, `- path: value` or `~ path: old -> new`."""
+    kind, path, old, new = change
+    location = '/'.join([str(key) for key in path])
+    mark = {'added': '+', 'removed': '-', 'changed': '~'}[kind]
+    if names_only:
+        return '%s %s' % (mark, location)
+    if kind == 'added':
+        return '%s %s: %s' % (mark, location, json.dumps(new))
+    if kind == 'removed':
+        return '%s %s: %s' % (mark, location, json.dumps(old))
+    return '%s %s: %s -> %s' % (mark, location, json.dumps(old), json.dumps(new))
+
+
+def load_tree(file_path: str, task_name: str, contrib: str, recipes: List[str], memo: Dict[int, bytes]) -> Any:
+    """Generate a template from a vaporfile, or read a template from a JSON file.
+
+    Modules imported from the directory of the vaporfile are unloaded afterwards,
+    so that two vaporfiles in different directories can import their own modules having the same names.
+
+    Args:
+        file_path: An absolute path to a vaporfile or to a JSON file.
+
+        task_name: A task name defined in vaporfile.
+
+        contrib: A module search path of contrib recipes.
+
+        recipes: Module names of contrib recipes, or `None`.
+
+        memo: A mapping to which hashes of elements are added.
+
+    Returns:
+        A mapping of a template.
+
+    Raises:
+        ValueError: If the file is a YAML file.
+
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.py':
+        current_directory = os.getcwd()
+        with utils.unload_modules_from(os.path.dirname(file_path)):
+            try:
+                template, _ = generator.build_template(file_path, task_name, contrib, recipes)
+            finally:
+                os.chdir(current_directory)
+        return template_tree(template, memo)
+    if extension in ('.yaml', '.yml'):
+        raise ValueError('yaml templates can not be compared. file: %r' % file_path)
+    with open(file_path) as fh:
+        return json.load(fh)
@@ -1,30 +1,406 @@
 # -*- coding: utf-8 -*-
 
-from typing import Any
+from typing import Any, Dict, Iterator, List, Tuple
 from argparse import ArgumentParser
 
 from aws_vapor import utils
 from cliff.command import Command
 from os import path
-from urllib import parse, request
+from urllib import parse
+
+import hashlib
+import json
+import logging
+import threading
+import time
+
+DEFAULT_DOWNLOAD_CACHE_DIRECTORY = path.join(utils.GLOBAL_CONFIG_DIRECTORY, 'downloads')
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+Recipe = Tuple[str, str, str]
 
 
 class Downloader(Command):
     """This class downloads recipe from remote repository."""
 
+    log = logging.getLogger(__name__)
+
     def get_parser(self, program_name: str) -> ArgumentParser:
         parser = super(Downloader, self).get_parser(program_name)
-        parser.add_argument('url',
+        parser.add_argument('url', nargs='?',
                             help='an URL of downloading recipe')
+        parser.add_argument('--manifest',
+                            help='a file listing URLs of recipes and their SHA-256 hashes')
+        parser.add_argument('--contrib',
+                            help='a directory to which recipes are downloaded')
+        parser.add_argument('--jobs', type=int, default=4,
+                            help='a number of recipes downloaded in parallel')
+        parser.add_argument('--offline', action='store_true', default=False,
+                            help='a flag whether or not recipes are installed from the download cache only')
+        parser.add_argument('--no-cache', action='store_true', default=False,
+                            help='a flag whether or not recipes are downloaded without the download cache')
+        parser.add_argument('--cache-dir',
+                            help='a directory of the download cache')
         return parser
 
-    def take_action(self, args: Any):
-        file_url = args.url
-        filename = parse.urlsplit(file_url).path.split('/')[-1:][0]
-        contrib = utils.get_property_from_config_file('defaults', 'contrib')
-        download_recipe(file_url, filename, contrib)
+    def take_action(self, args: Any) -> int:
+        if (args.url is None) == (args.manifest is None):
+            raise ValueError('specify either an URL or --manifest')
+
+        if args.offline and args.no_cache:
+            raise ValueError('--offline requires the download cache')
+
+        defaults = utils.get_properties_from_config_file('defaults', ['contrib', 'download_cache_dir'])
+        contrib = args.contrib or defaults['contrib']
+        cache = None if args.no_cache else DownloadCache(args.cache_dir or defaults['download_cache_dir'])
+
+        if args.manifest is None:
+            file_url = args.url
+            filename = parse.urlsplit(file_url).path.split('/')[-1:][0]
+            recipes = [(file_url, filename, None)]
+        else:
+            with open(args.manifest) as fh:
+                recipes = parse_manifest(fh.read())
+
+        failures = 0
+        for file_url, file_path, state, elapsed, error in install_recipes(recipes, contrib, args.jobs, cache,
+                                                                          args.offline):
+            if error is None:
+                self.log.info('installed %s to %s (%s) in %.3fs', file_url, file_path, state, elapsed)
+            else:
+                failures += 1
+                self.log.error('failed to download %s in %.3fs: %s', file_url, elapsed, error)
+        return 1 if failures > 0 else 0
 
 
 def download_recipe(file_url: str, filename: str, contrib: str):
+    pool = ConnectionPool()
+    try:
+        install_recipe(pool, (file_url, filename, None), contrib)
+    finally:
+        pool.close()
+
+
+def parse_manifest(lines: str) -> List[Recipe]:
+    """Parse a manifest of recipes.
+
+    Each line consists of an URL of a recipe, optionally followed by `sha256=<hex digest>` and a file name,
+    which is the last segment of the URL path if not specified. Empty lines and lines starting with `#` are ignored.
+
+    example::
+
+        # recipes shared by all projects
+        https://example.com/recipes/add_mapping.py sha256=8f43...e1a2
+        https://example.com/recipes/v2/replace.py sha256=09b7...c3d4 replace_parameter.py
+
+    Args:
+        lines: A content of a manifest.
+
+    Returns:
+        A list of an URL, a file name and a SHA-256 hex digest or `None` of each recipe.
+
+    """
+    recipes = []
+    for number, line in enumerate(lines.split('\n'), start=1):
+        fields = line.split('#', 1)[0].split()
+        if not fields:
+            continue
+
+        file_url, digest, filename = fields[0], None, None
+        for field in fields[1:]:
+            if field.startswith('sha256='):
+                digest = field[len('sha256='):].lower()
+            elif filename is None:
+                filename = field
+            else:
+                raise ValueError('unexpected field in manifest. line %d: %r' % (number, line))
+
+        if parse.urlsplit(file_url).scheme not in ('http', 'https'):
+            raise ValueError('unsupported URL in manifest. line %d: %r' % (number, line))
+        filename = filename or parse.urlsplit(file_url).path.split('/')[-1]
+        if not filename or filename != path.basename(filename) or filename in ('.', '..'):
+            raise ValueError('invalid file name in manifest. line %d: %r' % (number, line))
+        if filename in [existing for _, existing, _ in recipes]:
+            raise ValueError('duplicate file name in manifest. line %d: %r' % (number, line))
+        recipes.append((file_url, filename, digest))
+    return recipes
+
+
+class ConnectionPool(object):
+    """This class keeps HTTP connections alive, so that subsequent requests to the same host reuse them.
+
+    A connection is used by one thread at a time, and returned to the pool when a response is read completely.
+    Requests through a proxy given by environment variables such as `http_proxy` and `https_proxy`,
+    and requests to URLs of the other schemes, such as `ftp` and `file`, are sent by `urllib` without the pool.
+    """
+
+    def __init__(self, timeout: float = 30.0):
+        self.timeout = timeout
+        self.connections = 0
+        self._idle = {}  # type: Dict[Tuple[str, str, int], List[Any]]
+        self._lock = threading.Lock()
+
+    def _acquire(self, origin: Tuple[str, str, int]) -> Tuple[Any, bool]:
+        with self._lock:
+            idle = self._idle.get(origin)
+            if idle:
+                return idle.pop(), True
+            self.connections += 1
+
+        import http.client
+
+        scheme, host, port = origin
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout), False
+        return http.client.HTTPConnection(host, port, timeout=self.timeout), False
+
+    def _release(self, origin: Tuple[str, str, int], connection: Any):
+        with self._lock:
+            self._idle.setdefault(origin, []).append(connection)
+
+    def _request(self, method: str, url: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        import http.client
+
+        parts = parse.urlsplit(url)
+        origin = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+        target = parse.urlunsplit(('', '', parts.path or '/', parts.query, ''))
+
+        while True:
+            connection, reused = self._acquire(origin)
+            try:
+                connection.request(method, target, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if reused:
+                    # the server may have closed an idle connection, so that retry with a new connection.
+                    continue
+                raise
+
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(origin, connection)
+            return response.status, {k.lower(): v for k, v in response.getheaders()}, body
+
+    def request(self, method: str, url: str, headers: Dict[str, str] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """Send a request, following redirects.
+
+        Args:
+            method: An HTTP method.
+
+            url: An URL.
+
+            headers: A mapping of request headers.
+
+        Returns:
+            A status, a mapping of response headers with lower-cased names, and a response body.
+
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            if _bypasses_pool(url):
+                return self._urlopen(method, url, headers or {})
+            status, response_headers, body = self._request(method, url, headers or {})
+            if status not in REDIRECT_STATUSES or 'location' not in response_headers:
+                return status, response_headers, body
+            url = parse.urljoin(url, response_headers['location'])
+        raise ValueError('too many redirects. url: %r' % url)
+
+    def _urlopen(self, method: str, url: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        from urllib import error, request
+
+        try:
+            with request.urlopen(request.Request(url, headers=headers, method=method), timeout=self.timeout) as res:
+                # `file` and `ftp` responses don't have a status.
+                return res.getcode() or 200, {k.lower(): v for k, v in res.info().items()}, res.read()
+        except error.HTTPError as e:
+            try:
+                return e.code, {k.lower(): v for k, v in e.headers.items()}, e.read()
+            finally:
+                e.close()
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            for connections in list(self._idle.values()):
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+
+def _bypasses_pool(url: str) -> bool:
+    from urllib import request
+
+    parts = parse.urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        return True
+    return parts.scheme in request.getproxies() and not request.proxy_bypass(parts.hostname or '')
+
+
+class DownloadCache(object):
+    """This class stores downloaded recipes with their validators, so that unchanged recipes are not downloaded again.
+
+    An index maps an URL to the 'ETag' and 'Last-Modified' headers and a SHA-256 hash of a recipe,
+    and a recipe is stored as an object named after its hash.
+    The index is updated under a lock of a file next to it, so that processes sharing the cache
+    don't lose entries which the others add.
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = path.abspath(directory or DEFAULT_DOWNLOAD_CACHE_DIRECTORY)
+        self._lock = threading.Lock()
+
+    def _index_path(self) -> str:
+        return path.join(self.directory, 'index.json')
+
+    def _lock_path(self) -> str:
+        return path.join(self.directory, 'index.lock')
+
+    def _object_path(self, digest: str) -> str:
+        return path.join(self.directory, 'objects', digest[:2], digest)
+
+    def _load_index(self) -> Dict[str, Dict[str, str]]:
+        try:
+            with open(self._index_path()) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, file_url: str) -> Tuple[Dict[str, str], bytes]:
+        """Return an index entry and a content of a recipe, or `(None, None)` if not stored."""
+        with self._lock:
+            entry = self._load_index().get(file_url)
+        if entry is None:
+            return None, None
+        try:
+            with open(self._object_path(entry['sha256']), mode='rb') as fh:
+                body = fh.read()
+        except OSError:
+            return None, None
+        if hashlib.sha256(body).hexdigest() != entry['sha256']:
+            return None, None
+        return entry, body
+
+    def put(self, file_url: str, headers: Dict[str, str], body: bytes):
+        """Store a content of a recipe with validators in response headers."""
+        digest = hashlib.sha256(body).hexdigest()
+        if not path.exists(self._object_path(digest)):
+            utils.write_file_atomically(self._object_path(digest), body)
+        entry = {'sha256': digest}
+        for name in ['etag', 'last-modified']:
+            if name in headers:
+                entry[name] = headers[name]
+        with self._lock, utils.lock_file(self._lock_path()):
+            index = self._load_index()
+            index[file_url] = entry
+            utils.write_file_atomically(self._index_path(), json.dumps(index, indent=2, sort_keys=True).encode('utf-8'))
+
+
+def _validators(entry: Dict[str, str]) -> Dict[str, str]:
+    headers = {}
+    if 'etag' in entry:
+        headers['If-None-Match'] = entry['etag']
+    if 'last-modified' in entry:
+        headers['If-Modified-Since'] = entry['last-modified']
+    return headers
+
+
+def install_recipe(pool: ConnectionPool, recipe: Recipe, contrib: str, cache: DownloadCache = None,
+                   offline: bool = False) -> Tuple[str, str]:
+    """Download a recipe, verify its hash and write it into the contrib directory at once.
+
+    If a cache is given, a recipe stored in it is validated by a conditional request,
+    and is not downloaded again unless modified. A recipe is not written if the same one is already in `contrib`.
+
+    Args:
+        pool: A connection pool.
+
+        recipe: An URL, a file name and a SHA-256 hex digest or `None`.
+
+        contrib: A directory to which the recipe is written.
+
+        cache: A download cache, or `None`.
+
+        offline: A flag whether or not the recipe is installed from the cache without any request.
+
+    Returns:
+        A path to the recipe, and how it was installed, that is,
+        'downloaded', 'not modified' (validated by the cache) or 'offline' (served from the cache).
+
+    """
+    file_url, filename, digest = recipe
+    entry, body = cache.get(file_url) if cache is not None else (None, None)
+    if entry is not None and digest is not None and entry['sha256'] != digest:
+        entry, body = None, None
+
+    if offline:
+        if entry is None:
+            raise ValueError('not in the download cache. url: %r' % file_url)
+        state = 'offline'
+    else:
+        status, headers, content = pool.request('GET', file_url, _validators(entry) if entry is not None else None)
+        if status == 304 and entry is not None:
+            state = 'not modified'
+        elif status == 200:
+            state, body = 'downloaded', content
+        else:
+            raise ValueError('unexpected status %d. url: %r' % (status, file_url))
+
+    actual = hashlib.sha256(body).hexdigest()
+    if digest is not None and actual != digest:
+        raise ValueError('hash mismatch. url: %r, expected: %s, actual: %s' % (file_url, digest, actual))
+    if state == 'downloaded' and cache is not None:
+        cache.put(file_url, headers, body)
+
     file_path = path.join(contrib, filename)
-    request.urlretrieve(file_url, file_path)
+    try:
+        with open(file_path, mode='rb') as fh:
+            unchanged = hashlib.sha256(fh.read()).hexdigest() == actual
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        utils.write_file_atomically(file_path, body)
+    return file_path, state
+
+
+def install_recipes(recipes: List[Recipe], contrib: str, jobs: int = None, cache: DownloadCache = None,
+                    offline: bool = False) -> Iterator[Tuple[str, str, str, float, str]]:
+    """Download recipes in parallel over pooled keep-alive connections.
+
+    Args:
+        recipes: URLs, file names and SHA-256 hex digests or `None` of recipes, as :func:`parse_manifest` returns.
+
+        contrib: A directory to which recipes are written.
+
+        jobs: A number of threads downloading recipes.
+
+        cache: A download cache, or `None`.
+
+        offline: A flag whether or not recipes are installed from the cache without any request.
+
+    Returns:
+        An iterator of an URL, a path to the recipe, how it was installed as :func:`install_recipe` returns,
+        elapsed seconds and an error message if failed, otherwise `None`, in order of `recipes`.
+
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    pool = ConnectionPool()
+
+    def install(recipe: Recipe) -> Tuple[str, str, str, float, str]:
+        started = time.perf_counter()
+        file_path = path.join(contrib, recipe[1])
+        try:
+            (file_path, state) = install_recipe(pool, recipe, contrib, cache, offline)
+        except Exception as e:
+            return recipe[0], file_path, None, time.perf_counter() - started, '%s' % e
+        return recipe[0], file_path, state, time.perf_counter() - started, None
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(min(jobs or 4, len(recipes)), 1)) as executor:
+            for result in executor.map(install, recipes):
+                yield result
+    finally:
+        pool.close()
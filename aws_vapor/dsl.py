@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Union
 
 from aws_vapor import utils
-from collections import OrderedDict
+
+import csv
+import hashlib
+import json
+import pickle
 
 RegexPattern = str
 MapNameOrMapping = Union[str, 'Mapping']
@@ -11,6 +15,10 @@ LogicalNameOrElement = Union[str, 'Element']
 IntrinsicFunction = Dict[str, Any]
 PseudoParameter = Dict[str, Any]
 
+# the highest protocol of python 3.6, so that fingerprints don't change between versions
+PICKLE_PROTOCOL = 4
+FINGERPRINT_SIZE = 16
+
 
 class Template(object):
     """An AWS CloudFormation template builder."""
@@ -18,7 +26,8 @@ class Template(object):
     def __init__(self, version: str = '2010-09-09', description: str = ''):
         self.version = version
         self.description = description
-        self.elements = OrderedDict()
+        self.elements = {}
+        self._indices = {}
 
     def description(self, description: str) -> 'Template':
         self.description = description
@@ -29,22 +38,54 @@ class Template(object):
             self.elements[section_name] = []
         return self.elements[section_name]
 
-    def _merge_or_replace_element(self, section_name: str, element: 'Element', merge: bool) -> 'Element':
-        def index_of_section(s: List['Element'], n: str) -> int:
-            if len([item for item in s if item.name == n]) >= 1:
-                return [item.name for item in s].index(n)
-            else:
-                return -1
+    def _get_index(self, section_name: str) -> Dict[str, int]:
+        section = self._get_section(section_name)
+        index = self._indices.get(section_name)
+        if index is None or len(index) != len(section):
+            index = self._indices[section_name] = {}
+            for i, item in enumerate(section):
+                index.setdefault(item.name, i)
+        return index
+
+    def _index_of(self, section_name: str, name: str) -> int:
+        section = self._get_section(section_name)
+        position = self._get_index(section_name).get(name, -1)
+        if position != -1 and section[position].name != name:
+            # `elements` was edited behind our back, so rebuild the index from scratch.
+            del self._indices[section_name]
+            position = self._get_index(section_name).get(name, -1)
+        return position
+
+    def get(self, section_name: str, name: str) -> Union['Element', None]:
+        """Look up an element by a name of a section and its logical name.
+
+        Args:
+            section_name: A name of a top level section (e.g. 'Resources').
+
+            name: A logical name of an element.
 
+        Returns:
+            An element, or `None` if the section doesn't contain `name`.
+
+        """
+        if section_name not in self.elements:
+            return None
+        index = self._index_of(section_name, name)
+        if index == -1:
+            return None
+        return self.elements[section_name][index]
+
+    def _merge_or_replace_element(self, section_name: str, element: 'Element', merge: bool) -> 'Element':
         section = self._get_section(section_name)
-        index = index_of_section(section, element.name)
+        index = self._index_of(section_name, element.name)
 
         if index == -1:
+            self._indices[section_name][element.name] = len(section)
             section.append(element)
         elif merge:
             existing = section[index]
             for k, v in list(element.attrs.items()):
-                existing.attrs[k] = v
+                existing.attributes(k, v)
         else:
             section[index] = element
 
@@ -68,30 +109,149 @@ class Template(object):
     def outputs(self, element: 'Element', merge: bool = False) -> 'Element':
         return self._merge_or_replace_element('Outputs', element, merge)
 
-    def to_template(self) -> OrderedDict:
-        template = OrderedDict()
+    def to_template(self) -> Dict[str, Any]:
+        template = {}
         template['AWSTemplateFormatVersion'] = self.version
         template['Description'] = self.description
         for section_name, entries in list(self.elements.items()):
-            section = template[section_name] = OrderedDict()
+            section = template[section_name] = {}
             for element in entries:
                 element.to_template(section)
 
         return template
 
 
+def _touching(method: Callable[..., Any]) -> Callable[..., Any]:
+    def touch_and_call(self, *args, **kwargs):
+        self._element._caches = None
+        return method(self, *args, **kwargs)
+
+    touch_and_call.__name__ = method.__name__
+    return touch_and_call
+
+
+class _Attributes(dict):
+    """This class holds attributes of an element, and discards cached encoded forms of the element when modified.
+
+    Only modifications of the mapping itself are tracked, not those of values in it.
+    It is pickled and copied as a plain `dict`.
+    """
+
+    __slots__ = ('_element',)
+
+    def __init__(self, element: 'Element', *args):
+        super(_Attributes, self).__init__(*args)
+        self._element = element
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+    __setitem__ = _touching(dict.__setitem__)
+    __delitem__ = _touching(dict.__delitem__)
+    clear = _touching(dict.clear)
+    pop = _touching(dict.pop)
+    popitem = _touching(dict.popitem)
+    setdefault = _touching(dict.setdefault)
+    update = _touching(dict.update)
+    if hasattr(dict, '__ior__'):
+        __ior__ = _touching(dict.__ior__)
+
+
 class Element(object):
-    """This is an abstract base class of a template section."""
+    """This is an abstract base class of a template section.
+
+    Encoded forms of an element are cached until the element is modified through its methods or through `attrs`.
+    Call :meth:`touch` after modifying a value in `attrs` in place, such as `attrs['Properties']`,
+    or set `verify_caches` to `True` to detect such modifications at a cost of a fingerprint on every lookup.
+    """
+
+    __slots__ = ('name', '_attrs', '_caches')
+
+    # whether or not cached forms are stored under a fingerprint of entries, which is taken on every lookup
+    verify_caches = False
 
     def __init__(self, name: str):
         self.name = name
-        self.attrs = OrderedDict()
+        self._attrs = None
+        self._caches = None
+
+    @property
+    def attrs(self) -> Dict[str, Any]:
+        """A mapping of attributes, which is allocated on first access.
+
+        Modifying the mapping discards cached encoded forms, but modifying a value in it doesn't.
+        """
+        if type(self._attrs) is not _Attributes:
+            self._attrs = _Attributes(self, self._attrs or ())
+        return self._attrs
+
+    @attrs.setter
+    def attrs(self, attrs: Dict[str, Any]):
+        self._attrs = _Attributes(self, attrs)
+        self.touch()
 
     def attributes(self, name: str, value: Any):
         """Map `name` to `value` and return `self`."""
         self.attrs[name] = value
         return self
 
+    def touch(self):
+        """Mark `self` as modified and discard cached encoded forms of `self`."""
+        self._caches = None
+
+    def fingerprint(self) -> Union[bytes, None]:
+        """Return a hash of entries that `self` puts into a top level section.
+
+        The entries are pickled, so that values equal but of different types (e.g. `1`, `1.0` and `True`)
+        have different fingerprints.
+
+        Returns:
+            A hash of the entries, or `None` if they cannot be pickled.
+
+        """
+        fragment = {}
+        self.to_template(fragment)
+        try:
+            pickled = pickle.dumps(fragment, PICKLE_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return None
+        return hashlib.blake2b(pickled, digest_size=FINGERPRINT_SIZE).digest()
+
+    @property
+    def dirty(self) -> bool:
+        """`True` if `self` has been modified since it was encoded last time."""
+        if self._caches is None:
+            return True
+        return self.verify_caches and self._caches[0] != self.fingerprint()
+
+    def cached(self, key: Any, compute: Callable[['Element'], Any]) -> Any:
+        """Return a value cached under `key`, or compute and cache it if `self` has been modified since.
+
+        If `verify_caches` is `True`, values are cached under a fingerprint of entries of `self`,
+        and are computed every time if the entries cannot be fingerprinted.
+
+        Args:
+            key: A key identifying a kind of encoded forms.
+
+            compute: A function that takes `self` and returns an encoded form of it.
+
+        Returns:
+            An encoded form of `self`.
+
+        """
+        if self.verify_caches:
+            fingerprint = self.fingerprint()
+            if fingerprint is None:
+                return compute(self)
+            if self._caches is None or self._caches[0] != fingerprint:
+                self._caches = (fingerprint, {})
+        elif self._caches is None:
+            self._caches = (None, {})
+        caches = self._caches[1]
+        if key not in caches:
+            caches[key] = compute(self)
+        return caches[key]
+
     def to_template(self, template: Dict[str, Any]):
         """Convert mapped key-value pairs into a top level section of an AWS CloudFormation template.
 
@@ -102,7 +262,7 @@ class Element(object):
             Passed a mapping object.
 
         """
-        template[self.name] = self.attrs
+        template[self.name] = self._attrs if self._attrs is not None else {}
 
 
 class Metadatum(Element):
@@ -110,6 +270,8 @@ class Metadatum(Element):
     each instance of which represents details about the template.
     """
 
+    __slots__ = ()
+
     def __init__(self, name: str):
         super(Metadatum, self).__init__(name)
 
@@ -119,6 +281,8 @@ class Parameter(Element):
     each instance of which passes values into your template when you create a stack.
     """
 
+    __slots__ = ()
+
     def __init__(self, name: str):
         super(Parameter, self).__init__(name)
 
@@ -167,14 +331,198 @@ class Parameter(Element):
         return self.attributes('MinValue', str(value))
 
 
+class _Missing(object):
+    __slots__ = ()
+
+    def __reduce__(self):
+        # copied and unpickled as the same object, which cells are compared with by identity
+        return '_MISSING'
+
+    def __repr__(self) -> str:
+        return 'MISSING'
+
+
+_MISSING = _Missing()
+
+
+class MappingTable(object):
+    """This class holds a large mapping in columns, each of which is a list of values of a second level key.
+
+    A row of every top level key has a cell in every column, which is :data:`MappingTable.MISSING`
+    if the top level key doesn't have the second level key, so that a cell is looked up by two positions.
+    """
+
+    __slots__ = ('keys', 'columns', '_positions')
+
+    MISSING = _MISSING
+
+    def __init__(self):
+        self.keys = []  # type: List[str]
+        self.columns = {}  # type: Dict[str, List[Any]]
+        self._positions = {}  # type: Dict[str, int]
+
+    def add_row(self, key: str, values: Dict[str, Any]):
+        """Add a row of a top level key, or update cells of an existing row."""
+        position = self._positions.get(key)
+        if position is None:
+            position = self._positions[key] = len(self.keys)
+            self.keys.append(key)
+            for column in list(self.columns.values()):
+                column.append(MappingTable.MISSING)
+        for name, value in list(values.items()):
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = [MappingTable.MISSING] * len(self.keys)
+            column[position] = value
+
+    def has_key(self, key: str) -> bool:
+        """Return whether or not `key` is a top level key."""
+        return key in self._positions
+
+    def has_item(self, key: str, name: str) -> bool:
+        """Return whether or not a top level key `key` has a second level key `name`."""
+        position = self._positions.get(key)
+        column = self.columns.get(name)
+        return position is not None and column is not None and column[position] is not MappingTable.MISSING
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Convert rows into a mapping of a top level key to a mapping of a second level key to a value."""
+        columns = list(self.columns.items())
+        missing = MappingTable.MISSING
+        return {key: {name: column[position] for name, column in columns if column[position] is not missing}
+                for position, key in enumerate(self.keys)}
+
+
 class Mapping(Element):
     """The `Mapping` class is a subclass of :class:`Element`,
     each instance of which matches a key to a corresponding set of named values.
+
+    A mapping loaded by :meth:`from_csv` or :meth:`from_json_lines` is held in a :class:`MappingTable`
+    until its `attrs` are accessed or it is modified by :meth:`add_category` or :meth:`add_item`.
     """
 
+    __slots__ = ('_category', '_table')
+
     def __init__(self, name: str):
         super(Mapping, self).__init__(name)
         self._category = None
+        self._table = None
+
+    @classmethod
+    def from_rows(cls, name: str, rows: Iterable[Tuple[str, Dict[str, Any]]]) -> 'Mapping':
+        """Create a mapping from rows of a top level key and a mapping of second level keys to values.
+
+        Args:
+            name: A logical name of the mapping.
+
+            rows: An iterable of a top level key and its items. Items of a duplicated top level key are merged.
+
+        Returns:
+            A mapping.
+
+        """
+        table = MappingTable()
+        for key, values in rows:
+            table.add_row(key, values)
+        mapping = cls(name)
+        mapping._table = table
+        return mapping
+
+    @classmethod
+    def from_csv(cls, name: str, stream: Union[str, Iterable[str]], key_column: str = None,
+                 **fmtparams) -> 'Mapping':
+        """Create a mapping from CSV, whose header has a column of top level keys and second level keys.
+
+        Empty cells are left out of the mapping.
+
+        Args:
+            name: A logical name of the mapping.
+
+            stream: A path to a CSV file, a file object or an iterable of lines of CSV.
+
+            key_column: A name of a column of top level keys. If not specified, the first column is used.
+
+            fmtparams: Formatting parameters passed to :func:`csv.reader`.
+
+        Returns:
+            A mapping.
+
+        Raises:
+            ValueError: If CSV doesn't have a header or `key_column`.
+
+        """
+        if isinstance(stream, str):
+            with utils.open_input_file(stream, newline='') as fh:
+                return cls.from_csv(name, fh, key_column, **fmtparams)
+
+        reader = csv.reader(stream, **fmtparams)
+        header = next(reader, None)
+        if not header:
+            raise ValueError('missing header of csv. mapping: %r' % name)
+        if key_column is None:
+            key_column = header[0]
+        if key_column not in header:
+            raise ValueError('missing key column. key_column: %r, header: %r' % (key_column, header))
+        key_index = header.index(key_column)
+        columns = [(index, column) for index, column in enumerate(header) if index != key_index]
+
+        def rows():
+            for row in reader:
+                if not row:
+                    continue
+                yield row[key_index], {column: row[index] for index, column in columns
+                                       if index < len(row) and row[index] != ''}
+
+        return cls.from_rows(name, rows())
+
+    @classmethod
+    def from_json_lines(cls, name: str, stream: Union[str, Iterable[str]], key_field: str = None) -> 'Mapping':
+        """Create a mapping from JSON lines, each of which is an object of a top level key and second level keys.
+
+        Args:
+            name: A logical name of the mapping.
+
+            stream: A path to a JSON lines file, a file object or an iterable of JSON lines.
+
+            key_field: A name of a field of top level keys. If not specified, the first field of each object is used.
+
+        Returns:
+            A mapping.
+
+        Raises:
+            ValueError: If a line is not a JSON object or doesn't have `key_field`.
+
+        """
+        if isinstance(stream, str):
+            with utils.open_input_file(stream) as fh:
+                return cls.from_json_lines(name, fh, key_field)
+
+        def rows():
+            for line in stream:
+                if not line.strip():
+                    continue
+                values = json.loads(line)
+                if not isinstance(values, dict) or not values:
+                    raise ValueError('json line should be an object. line: %r' % line)
+                field = key_field if key_field is not None else next(iter(values))
+                if field not in values:
+                    raise ValueError('missing key field. key_field: %r, line: %r' % (field, line))
+                key = values.pop(field)
+                yield key, values
+
+        return cls.from_rows(name, rows())
+
+    @property
+    def attrs(self) -> Dict[str, Any]:
+        """A mapping of attributes, into which a :class:`MappingTable` is converted on first access."""
+        if self._table is not None:
+            self._attrs, self._table = self._table.to_dict(), None
+        return Element.attrs.fget(self)
+
+    @attrs.setter
+    def attrs(self, attrs: Dict[str, Any]):
+        self._table = None
+        Element.attrs.fset(self, attrs)
 
     def add_category(self, category: str) -> 'Mapping':
         """Create a new top level section of 'Mappings' and return `self`.
@@ -191,7 +539,7 @@ class Mapping(Element):
         """
         self._category = category
         if category not in self.attrs:
-            self.attributes(category, OrderedDict())
+            self.attributes(category, {})
             return self
         return self
 
@@ -199,10 +547,19 @@ class Mapping(Element):
         """Map `key` to `value` in a current selection and return `self`."""
         m = self.attrs[self._category]
         m[key] = value
+        self.touch()
         return self
 
     def find_in_map(self, top_level_key: str, second_level_key: str) -> IntrinsicFunction:
         """Call `Intrinsics.find_in_map` and return its return value."""
+        if self._table is not None:
+            if isinstance(top_level_key, str):
+                if not self._table.has_key(top_level_key):
+                    raise ValueError('missing top_level_key. top_level_key: %r' % top_level_key)
+                if isinstance(second_level_key, str) and not self._table.has_item(top_level_key, second_level_key):
+                    raise ValueError('missing second_level_key. second_level_key: %r' % second_level_key)
+            return Intrinsics.find_in_map(self, top_level_key, second_level_key)
+
         if isinstance(top_level_key, str):
             if top_level_key not in self.attrs:
                 raise ValueError('missing top_level_key. top_level_key: %r' % top_level_key)
@@ -212,12 +569,29 @@ class Mapping(Element):
 
         return Intrinsics.find_in_map(self, top_level_key, second_level_key)
 
+    def to_template(self, template: Dict[str, Any]):
+        """Convert `self.attrs` or rows of a :class:`MappingTable` into a top level section of a template.
+
+        Args:
+            template: A template builder.
+
+        Returns:
+            Passed a mapping object.
+
+        """
+        if self._table is not None:
+            template[self.name] = self._table.to_dict()
+        else:
+            super(Mapping, self).to_template(template)
+
 
 class Condition(Element):
     """The `Condition` class is a subclass of :class:`Element`,
     each instance of which includes statements that define when a resource is created or when a property is defined.
     """
 
+    __slots__ = ('expr',)
+
     def __init__(self, name: str):
         super(Condition, self).__init__(name)
         self.expr = None
@@ -225,6 +599,7 @@ class Condition(Element):
     def expression(self, expression: IntrinsicFunction) -> 'Condition':
         """Set `expression` and return `self`."""
         self.expr = expression
+        self.touch()
         return self
 
     def to_template(self, template: Dict[str, Any]):
@@ -246,6 +621,8 @@ class Resource(Element):
     such as an Amazon EC2 instance or an Amazon S3 bucket.
     """
 
+    __slots__ = ()
+
     def __init__(self, name: str):
         super(Resource, self).__init__(name)
 
@@ -277,7 +654,7 @@ class Resource(Element):
             `self`.
 
         """
-        m = self.attrs['Properties'] if 'Properties' in self.attrs else OrderedDict()
+        m = self.attrs['Properties'] if 'Properties' in self.attrs else {}
         for p in props:
             for k, v in list(p.items()):
                 m[k] = v
@@ -294,6 +671,8 @@ class Output(Element):
     references), return in response (to describe stack calls), or view on the AWS CloudFormation console.
     """
 
+    __slots__ = ()
+
     def __init__(self, name: str):
         super(Output, self).__init__(name)
 
@@ -319,20 +698,131 @@ class Attributes(object):
             return {name: value}
 
 
+INTERNED_SIZE = 65536
+
+
+def _readonly(self, *args, **kwargs):
+    raise TypeError('intrinsic functions are immutable. node: %r' % self)
+
+
+class FrozenList(list):
+    """An immutable and hashable list of arguments of an :class:`IntrinsicNode`, which is encoded as a list."""
+
+    __slots__ = ()
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = pop = remove = clear = sort = reverse = _readonly
+
+
+class IntrinsicNode(dict):
+    """An immutable and hashable intrinsic function or pseudo parameter, which is created by :func:`intrinsic`.
+
+    Nodes of the same function and arguments are the same object, while a node is equal to a `dict`
+    of the same content and is encoded as the `dict` is.
+    """
+
+    __slots__ = ()
+
+    def __hash__(self) -> int:
+        return hash(next(iter(self.items())))
+
+    def __reduce__(self):
+        name, argument = next(iter(self.items()))
+        return intrinsic, (name, tuple(argument) if isinstance(argument, FrozenList) else argument)
+
+    def __copy__(self) -> 'IntrinsicNode':
+        return self
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> 'IntrinsicNode':
+        return self
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _readonly
+
+
+# a name of an intrinsic function to a mapping of a key of arguments to a node
+_interned = {}  # type: Dict[str, Dict[Any, IntrinsicNode]]
+
+
+def _key_of(value: Any) -> Any:
+    # a type tells `True` from `1`, a representation tells `-0.0` from `0.0`, and an identity tells interned nodes
+    # apart, none of which are told apart by equality. strings, the most common arguments, are keys by themselves.
+    if type(value) is str:
+        return value
+    if isinstance(value, IntrinsicNode):
+        return id(value)
+    if isinstance(value, float):
+        return type(value), repr(value)
+    if value is None or isinstance(value, (str, int)):
+        return type(value), value
+    return None
+
+
+def intrinsic(name: str, argument: Any) -> IntrinsicFunction:
+    """Return an intrinsic function `{name: argument}`, which is interned if `argument` is immutable.
+
+    An argument is immutable if it is a string, a number, a boolean, `None`, an interned node, or a tuple of them,
+    which is held as a :class:`FrozenList`. Other arguments, such as lists and dicts which callers may modify later,
+    are held in a plain `dict`. At most `INTERNED_SIZE` nodes of each function are kept for reuse.
+
+    Args:
+        name: A name of an intrinsic function, or `Ref`.
+
+        argument: An argument of the function.
+
+    Returns:
+        An :class:`IntrinsicNode` shared by calls of the same arguments, or a `dict`.
+
+    """
+    if type(argument) is str:
+        key = argument
+    elif isinstance(argument, tuple):
+        key = tuple([_key_of(value) for value in argument])
+        if None in key:
+            return {name: list(argument)}
+    else:
+        key = _key_of(argument)
+        if key is None:
+            return {name: argument}
+
+    nodes = _interned.get(name)
+    if nodes is None:
+        nodes = _interned[name] = {}
+    node = nodes.get(key)
+    if node is None:
+        if len(nodes) >= INTERNED_SIZE:
+            # an interned node refers to nodes in its arguments, so that keys of identities are never reused
+            # as long as they are in the table
+            nodes.clear()
+        node = nodes[key] = IntrinsicNode(((name, FrozenList(argument) if isinstance(argument, tuple) else argument),))
+    return node
+
+
 class Intrinsics(object):
+    """Builders of intrinsic functions.
+
+    Functions of immutable arguments, such as logical names and other intrinsic functions built here,
+    are interned by :func:`intrinsic`, so that an identical function is allocated once.
+    """
+
     @classmethod
     def base64(cls, value_to_encode: Any) -> IntrinsicFunction:
-        return {'Fn::Base64': value_to_encode}
+        return intrinsic('Fn::Base64', value_to_encode)
 
     @classmethod
     def find_in_map(cls, map_name_or_mapping: MapNameOrMapping,
                     top_level_key: str, second_level_key: str) -> IntrinsicFunction:
         if isinstance(map_name_or_mapping, str):
             map_name = map_name_or_mapping
-            return {'Fn::FindInMap': [map_name, top_level_key, second_level_key]}
+            return intrinsic('Fn::FindInMap', (map_name, top_level_key, second_level_key))
         elif isinstance(map_name_or_mapping, Mapping):
             mapping = map_name_or_mapping
-            return {'Fn::FindInMap': [mapping.name, top_level_key, second_level_key]}
+            return intrinsic('Fn::FindInMap', (mapping.name, top_level_key, second_level_key))
         else:
             raise ValueError('value should be map name or mapping. but %r' % type(map_name_or_mapping))
 
@@ -341,42 +831,42 @@ class Intrinsics(object):
         if conditions is None:
             conditions = []
         if 2 <= len(conditions) <= 10:
-            return {'Fn::And': [condition.expr for condition in conditions]}
+            return intrinsic('Fn::And', tuple([condition.expr for condition in conditions]))
         else:
             raise ValueError('the minimum number of conditions is 2, and the maximum is 10. but %r' % len(conditions))
 
     @classmethod
     def fn_equals(cls, value_1: Any, value_2: Any) -> IntrinsicFunction:
-        return {'Fn::Equals': [value_1, value_2]}
+        return intrinsic('Fn::Equals', (value_1, value_2))
 
     @classmethod
     def fn_if(cls, condition_name: str, value_if_true: Any, value_if_false: Any) -> IntrinsicFunction:
-        return {'Fn::If': [condition_name, value_if_true, value_if_false]}
+        return intrinsic('Fn::If', (condition_name, value_if_true, value_if_false))
 
     @classmethod
     def fn_not(cls, condition: Condition) -> IntrinsicFunction:
-        return {'Fn::Not': [condition.expr]}
+        return intrinsic('Fn::Not', (condition.expr,))
 
     @classmethod
     def fn_or(cls, conditions: List[Condition] = None) -> IntrinsicFunction:
         if conditions is None:
             conditions = []
         if 2 <= len(conditions) <= 10:
-            return {'Fn::Or': [condition.expr for condition in conditions]}
+            return intrinsic('Fn::Or', tuple([condition.expr for condition in conditions]))
         else:
             raise ValueError('the minimum number of conditions is 2, and the maximum is 10. but %r' % len(conditions))
 
     @classmethod
     def get_att(cls, logical_name_of_resource: str, attribute_name: str) -> IntrinsicFunction:
-        return {'Fn::GetAtt': [logical_name_of_resource, attribute_name]}
+        return intrinsic('Fn::GetAtt', (logical_name_of_resource, attribute_name))
 
     @classmethod
     def get_azs(cls, region: str = '') -> IntrinsicFunction:
-        return {'Fn::GetAZs': region}
+        return intrinsic('Fn::GetAZs', region)
 
     @classmethod
     def import_value(cls, value_to_import: Any) -> IntrinsicFunction:
-        return {'Fn::ImportValue': value_to_import}
+        return intrinsic('Fn::ImportValue', value_to_import)
 
     @classmethod
     def join(cls, delimiter: str, list_of_values: List[Any]) -> IntrinsicFunction:
@@ -389,7 +879,7 @@ class Intrinsics(object):
     @classmethod
     def sub(cls, template: str, dict_of_parameters: Dict[str, Any] = None) -> IntrinsicFunction:
         if dict_of_parameters is None:
-            return {'Fn::Sub': template}
+            return intrinsic('Fn::Sub', template)
         else:
             return {'Fn::Sub': [template, dict_of_parameters]}
 
@@ -397,38 +887,40 @@ class Intrinsics(object):
     def ref(cls, logical_name_or_element: LogicalNameOrElement) -> IntrinsicFunction:
         if isinstance(logical_name_or_element, str):
             logical_name = logical_name_or_element
-            return {'Ref': logical_name}
+            return intrinsic('Ref', logical_name)
         elif isinstance(logical_name_or_element, Element):
             resource = logical_name_or_element
-            return {'Ref': resource.name}
+            return intrinsic('Ref', resource.name)
         else:
             raise ValueError('value should be logical name or resource. but %r' % type(logical_name_or_element))
 
 
 class Pseudos(object):
+    """Builders of pseudo parameters, each of which is interned as :class:`Intrinsics` does."""
+
     @classmethod
     def account_id(cls) -> PseudoParameter:
-        return {'Ref': 'AWS::AccountId'}
+        return intrinsic('Ref', 'AWS::AccountId')
 
     @classmethod
     def notification_arns(cls) -> PseudoParameter:
-        return {'Ref': 'AWS::NotificationARNs'}
+        return intrinsic('Ref', 'AWS::NotificationARNs')
 
     @classmethod
     def no_value(cls) -> PseudoParameter:
-        return {'Ref': 'AWS::NoValue'}
+        return intrinsic('Ref', 'AWS::NoValue')
 
     @classmethod
     def region(cls) -> PseudoParameter:
-        return {'Ref': 'AWS::Region'}
+        return intrinsic('Ref', 'AWS::Region')
 
     @classmethod
     def stack_id(cls) -> PseudoParameter:
-        return {'Ref': 'AWS::StackId'}
+        return intrinsic('Ref', 'AWS::StackId')
 
     @classmethod
     def stack_name(cls) -> PseudoParameter:
-        return {'Ref': 'AWS::StackName'}
+        return intrinsic('Ref', 'AWS::StackName')
 
 
 class UserData(object):
@@ -438,17 +930,17 @@ class UserData(object):
 
     @classmethod
     def from_files(cls, files: List[Tuple[str, str]], params: Dict[str, Any]) -> Dict[str, Any]:
-        user_data = utils.inject_params(utils.combine_user_data(files), params)
+        user_data = utils.inject_params_to_user_data(files, params)
         return {'UserData': Intrinsics.base64(Intrinsics.join('', user_data))}
 
 
 class CfnInitMetadata(object):
     @classmethod
-    def of(cls, list_of_metadata: List[Union['CfnInitMetadata.Init', 'CfnInitMetadata.Authentication']]) -> OrderedDict:
-        m = OrderedDict()
+    def of(cls, list_of_metadata: List[Union['CfnInitMetadata.Init', 'CfnInitMetadata.Authentication']]) -> Dict[str, Any]:
+        m = {}
         for metadata in list_of_metadata:
             if isinstance(metadata, CfnInitMetadata.Init):
-                im = m['AWS::CloudFormation::Init'] = OrderedDict()
+                im = m['AWS::CloudFormation::Init'] = {}
                 for config_or_config_set in metadata.config_or_config_sets:
                     if isinstance(config_or_config_set, CfnInitMetadata.Config):
                         config = config_or_config_set
@@ -456,7 +948,7 @@ class CfnInitMetadata(object):
                     elif isinstance(config_or_config_set, CfnInitMetadata.ConfigSet):
                         config_set = config_or_config_set
                         if 'configSets' not in im:
-                            csm = im['configSets'] = OrderedDict()
+                            csm = im['configSets'] = {}
                         else:
                             csm = im['configSets']
                         csm[config_set.name] = [config.name for config in config_set.configs]
@@ -465,41 +957,44 @@ class CfnInitMetadata(object):
                     else:
                         raise ValueError('unknown config. config: %r' % metadata.config_or_config_sets)
             elif isinstance(metadata, CfnInitMetadata.Authentication):
-                am = m['AWS::CloudFormation::Authentication'] = OrderedDict()
+                am = m['AWS::CloudFormation::Authentication'] = {}
                 am[metadata.name] = metadata.value
             else:
                 raise ValueError('unknown metadata. metadata: %r' % metadata)
         return m
 
     class Init(object):
+        __slots__ = ('config_or_config_sets',)
 
         def __init__(self, config_or_config_sets: List[Union['CfnInitMetadata.Config', 'CfnInitMetadata.ConfigSet']]):
             self.config_or_config_sets = config_or_config_sets
 
     class ConfigSet(object):
+        __slots__ = ('name', 'configs')
 
         def __init__(self, name, configs: List['CfnInitMetadata.Config']):
             self.name = name
             self.configs = configs
 
     class Config(object):
+        __slots__ = ('name', 'value')
 
         def __init__(self, name: str):
             self.name = name
-            self.value = OrderedDict()
+            self.value = {}
 
-        def _create_and_get_map(self, keys: List[str]) -> OrderedDict:
+        def _create_and_get_map(self, keys: List[str]) -> Dict[str, Any]:
             m = self.value
             for key in keys:
                 if key not in m:
-                    m[key] = OrderedDict()
+                    m[key] = {}
                 m = m[key]
             return m
 
         def commands(self, key: str,
                      command: str, env: Dict[str, Any] = None, cwd: str = None, test: str = None,
                      ignore_errors: bool = None, wait_after_completion: int = None) -> 'CfnInitMetadata.Config':
-            m = OrderedDict()
+            m = {}
             m['command'] = command
             if env is not None:
                 m['env'] = env
@@ -523,15 +1018,13 @@ class CfnInitMetadata(object):
                   local_file_params: str = None) -> 'CfnInitMetadata.Config':
             if local_file_params is None:
                 local_file_params = {}
-            m = OrderedDict()
+            m = {}
             if content is not None:
                 m['content'] = content
             if source is not None:
                 m['source'] = source
             if local_file_path is not None:
-                with open(local_file_path) as fh:
-                    c = fh.read()
-                init_file_content = utils.inject_params(c, local_file_params)
+                init_file_content = utils.inject_params_from_file(local_file_path, local_file_params)
                 m['content'] = Intrinsics.join('', init_file_content)
             if encoding is not None:
                 m['encoding'] = encoding
@@ -551,7 +1044,7 @@ class CfnInitMetadata(object):
             return self
 
         def groups(self, key: str, gid: int = None) -> 'CfnInitMetadata.Config':
-            m = OrderedDict()
+            m = {}
             if gid is not None:
                 m['gid'] = str(gid)
 
@@ -570,7 +1063,7 @@ class CfnInitMetadata(object):
                      ensure_running: bool = None, enabled: bool = None, files: List[str] = None,
                      sources: List[str] = None, packages: Dict[str, List[str]] = None,
                      commands: List[str] = None) -> 'CfnInitMetadata.Config':
-            m = OrderedDict()
+            m = {}
             if ensure_running is not None:
                 m['ensureRunning'] = 'true' if ensure_running else 'false'
             if enabled is not None:
@@ -594,7 +1087,7 @@ class CfnInitMetadata(object):
             return self
 
         def users(self, key: str, uid: int, groups: List[str], home_dir: str) -> 'CfnInitMetadata.Config':
-            m = OrderedDict()
+            m = {}
             m['groups'] = groups
             m['uid'] = str(uid)
             m['homeDir'] = home_dir
@@ -604,6 +1097,7 @@ class CfnInitMetadata(object):
             return self
 
     class Authentication(object):
+        __slots__ = ('name', 'type', 'value')
 
         def __init__(self, name: str, authentication_type: str):
             self.name = name
@@ -611,7 +1105,7 @@ class CfnInitMetadata(object):
 
             if authentication_type != 'basic' and authentication_type != 'S3':
                 raise ValueError('unknown authentication type. type: %r' % authentication_type)
-            self.value = OrderedDict({'type': authentication_type})
+            self.value = {'type': authentication_type}
 
         def access_key_id(self, value: str) -> 'CfnInitMetadata.Authentication':
             if self.type != 'S3':
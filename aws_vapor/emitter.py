@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Iterator, List, Tuple
+
+from aws_vapor import dsl
+
+import json
+import math
+import re
+
+INDENT = 2
+FLOW_WIDTH = 80
+
+SHORT_FORM_FUNCTIONS = frozenset([
+    'Ref', 'Fn::Base64', 'Fn::Cidr', 'Fn::FindInMap', 'Fn::GetAtt', 'Fn::GetAZs', 'Fn::ImportValue', 'Fn::Join',
+    'Fn::Select', 'Fn::Split', 'Fn::Sub', 'Fn::And', 'Fn::Equals', 'Fn::If', 'Fn::Not', 'Fn::Or',
+])
+
+_PLAIN = re.compile(r'^[A-Za-z_/][A-Za-z0-9_./:()\-]*(?: [A-Za-z0-9_./:()\-]+)*\Z')
+_RESERVED = frozenset(['y', 'yes', 'n', 'no', 'true', 'false', 'on', 'off', 'null'])
+# YAML 1.1 reads U+2028 and U+2029 as line breaks, so they are escaped rather than written as they are.
+_NON_PRINTABLE = re.compile('[^\x09\x0a\x20-\x7e\xa0-\u2027\u202a-\ud7ff\ue000-\ufefe\uff00-\ufffd'
+                            '\U00010000-\U0010ffff]')
+
+
+class YamlEncoding(object):
+    """This class holds a style of a YAML document, which is passed where :class:`aws_vapor.encoder.Encoding` is.
+
+    Intrinsic functions are written in short form, such as `!Ref` and `!GetAtt`,
+    unless their argument is another intrinsic function, since YAML doesn't allow a node to have two tags.
+    """
+
+    __slots__ = ()
+
+    key = ('yaml',)
+    minify = False
+
+    def iter_fragments(self, template: dsl.Template) -> Iterator[Tuple[str, dsl.Element, str]]:
+        return iter_fragments(template, self)
+
+
+DEFAULT_ENCODING = YamlEncoding()
+
+
+def _escape(match) -> str:
+    code = ord(match.group(0))
+    return '\\u%04x' % code if code <= 0xffff else '\\U%08x' % code
+
+
+def _quoted(text: str) -> str:
+    if not _NON_PRINTABLE.search(text) and '\n' not in text:
+        return "'%s'" % text.replace("'", "''")
+    return _NON_PRINTABLE.sub(_escape, json.dumps(text, ensure_ascii=False))
+
+
+def encode_string(text: str, flow: bool = False) -> str:
+    """Encode a string as a plain scalar if it is read back as the same string, or as a quoted scalar otherwise.
+
+    Args:
+        text: A string to be encoded.
+
+        flow: A flag whether or not the scalar is in a flow collection, where a colon is quoted as well.
+
+    Returns:
+        A YAML scalar.
+
+    """
+    if (_PLAIN.match(text) and text.lower() not in _RESERVED and not text.endswith(':') and ': ' not in text and
+            not (flow and ':' in text)):
+        return text
+    return _quoted(text)
+
+
+def encode_scalar(value: Any, flow: bool = False) -> str:
+    """Encode a string, a number, a boolean or `None` as a YAML scalar, which is read back as the same value."""
+    if isinstance(value, str):
+        return encode_string(value, flow)
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, int):
+        return str(int(value))
+    if isinstance(value, float):
+        if math.isnan(value):
+            return '.nan'
+        if math.isinf(value):
+            return '.inf' if value > 0 else '-.inf'
+        text = repr(value)
+        # YAML 1.1 reads a float only if it has a decimal point, such as `1.0e+16` instead of `1e+16`.
+        return text.replace('e', '.0e') if '.' not in text else text
+    raise TypeError('Object of type %s is not YAML serializable' % type(value).__name__)
+
+
+def _encode_key(key: Any) -> str:
+    return encode_string(key if isinstance(key, str) else json.dumps(key))
+
+
+def _is_scalar(value: Any) -> bool:
+    return not isinstance(value, (dict, list, tuple))
+
+
+def _is_literal(value: Any) -> bool:
+    if not isinstance(value, str) or '\n' not in value.rstrip('\n') or _NON_PRINTABLE.search(value):
+        return False
+    first_line = value.lstrip('\n')
+    return not first_line.startswith(' ')
+
+
+def _encode_literal(text: str, indent: int) -> str:
+    if text.endswith('\n\n'):
+        header = '|+'
+    elif text.endswith('\n'):
+        header = '|'
+    else:
+        header = '|-'
+    lines = (text[:-1] if text.endswith('\n') else text).split('\n')
+    padding = '\n' + ' ' * indent
+    return ' ' + header + ''.join([padding + line if line else '\n' for line in lines])
+
+
+def _intrinsic(value: Any) -> Tuple[str, Any]:
+    if isinstance(value, dict) and len(value) == 1:
+        name, argument = next(iter(value.items()))
+        if name in SHORT_FORM_FUNCTIONS and not _intrinsic(argument)[0]:
+            return name, argument
+    return None, None
+
+
+def _tag(name: str) -> str:
+    return '!' + name[4:] if name.startswith('Fn::') else '!' + name
+
+
+def _encode_inline(value: Any) -> str:
+    """Return a value encoded in one line, or `None` if it should be encoded as a block."""
+    name, argument = _intrinsic(value)
+    if name == 'Fn::GetAtt' and isinstance(argument, list) and len(argument) == 2 and \
+            all([isinstance(v, str) for v in argument]) and '.' not in argument[0]:
+        return '!GetAtt ' + encode_string('%s.%s' % tuple(argument), flow=True)
+    if name is not None and _is_scalar(argument) and not _is_literal(argument):
+        return _tag(name) + ' ' + encode_scalar(argument, flow=True)
+    if _is_scalar(value) and not _is_literal(value):
+        return encode_scalar(value, flow=True)
+    return None
+
+
+def _encode_flow_sequence(values: list, width: int) -> str:
+    items = []
+    for value in values:
+        item = _encode_inline(value)
+        if item is None:
+            return None
+        items.append(item)
+        width -= len(item) + 2
+        if width < 0:
+            return None
+    return '[' + ', '.join(items) + ']'
+
+
+def _encode_node(value: Any, indent: int, chunks: List[str], in_mapping: bool = False):
+    """Append a node following `key:` or `-` at a column of `indent` to `chunks`.
+
+    A sequence in a mapping is not indented, as most YAML emitters do.
+    """
+    name, argument = _intrinsic(value)
+    if name is not None:
+        inline = _encode_inline(value)
+        if inline is not None:
+            chunks.append(' ' + inline)
+            return
+        chunks.append(' ' + _tag(name))
+        if isinstance(argument, (list, tuple)):
+            _encode_sequence(argument, indent, chunks, in_mapping)
+        else:
+            _encode_node(argument, indent, chunks)
+        return
+
+    if isinstance(value, dict):
+        if not value:
+            chunks.append(' {}')
+            return
+        padding = '\n' + ' ' * indent
+        for key, item in list(value.items()):
+            chunks.append(padding + _encode_key(key) + ':')
+            _encode_node(item, indent + INDENT, chunks, in_mapping=True)
+    elif isinstance(value, (list, tuple)):
+        _encode_sequence(value, indent, chunks, in_mapping)
+    elif _is_literal(value):
+        chunks.append(_encode_literal(value, indent))
+    else:
+        chunks.append(' ' + encode_scalar(value))
+
+
+def _encode_sequence(values: list, indent: int, chunks: List[str], in_mapping: bool):
+    if not values:
+        chunks.append(' []')
+        return
+    if all([_is_scalar(v) or _intrinsic(v)[0] for v in values]):
+        flow = _encode_flow_sequence(values, FLOW_WIDTH - indent)
+        if flow is not None:
+            chunks.append(' ' + flow)
+            return
+
+    dash_indent = indent - INDENT if in_mapping else indent
+    padding = '\n' + ' ' * dash_indent + '-'
+    for value in values:
+        item = []
+        _encode_node(value, dash_indent + INDENT, item)
+        head = item[0] if item else ''
+        # the first entry of a mapping or a sequence follows the dash on the same line
+        compact = '\n' + ' ' * (dash_indent + INDENT)
+        if head.startswith(compact):
+            item[0] = ' ' + head[len(compact):]
+        chunks.append(padding)
+        chunks.extend(item)
+
+
+def encode_value(value: Any, level: int = 0) -> str:
+    """Encode a value as a YAML node following `key:` at the given depth.
+
+    Args:
+        value: A value to be encoded.
+
+        level: A depth of the key in the whole document.
+
+    Returns:
+        A YAML fragment, which begins with a space or a line break.
+
+    """
+    chunks = []  # type: List[str]
+    _encode_node(value, INDENT * (level + 1), chunks, in_mapping=True)
+    return ''.join(chunks)
+
+
+def _encode_entry(key: Any, value: Any, level: int) -> str:
+    return '\n' * (level > 0) + ' ' * (INDENT * level) + _encode_key(key) + ':' + encode_value(value, level)
+
+
+def encode_element(element: dsl.Element, encoding: YamlEncoding = DEFAULT_ENCODING) -> str:
+    """Encode entries that an element puts into a top level section.
+
+    The encoded entries are cached on the element, and reused until the element (or a value in it) is modified.
+
+    Args:
+        element: An element of a template.
+
+        encoding: A style of the document.
+
+    Returns:
+        A YAML fragment of the entries, each of which begins with a line break.
+
+    """
+    def encode(target: dsl.Element) -> str:
+        fragment = {}
+        target.to_template(fragment)
+        return ''.join([_encode_entry(name, attrs, 1) for name, attrs in list(fragment.items())])
+
+    return element.cached(encoding.key, encode)
+
+
+def iter_fragments(template: dsl.Template,
+                   encoding: YamlEncoding = DEFAULT_ENCODING) -> Iterator[Tuple[str, dsl.Element, str]]:
+    """Encode a template as a YAML document chunk by chunk, telling where each chunk comes from.
+
+    The document doesn't end with a line break, as :func:`aws_vapor.encoder.iter_fragments` doesn't.
+
+    Args:
+        template: A template builder.
+
+        encoding: A style of the document.
+
+    Returns:
+        An iterator of a section name or `None` for top level chunks,
+        an element or `None` for chunks other than elements, and a chunk of a YAML document.
+
+    """
+    yield None, None, _encode_entry('AWSTemplateFormatVersion', template.version, 0)
+    yield None, None, '\n' + _encode_entry('Description', template.description, 0)
+    for section_name, elements in list(template.elements.items()):
+        yield section_name, None, '\n' + _encode_key(section_name) + ':'
+        empty = True
+        for element in elements:
+            chunk = encode_element(element, encoding)
+            if chunk:
+                empty = False
+                yield section_name, element, chunk
+        if empty:
+            yield section_name, None, ' {}'
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Callable, Dict, Iterator, Tuple
+from io import TextIOBase
+
+from aws_vapor import dsl
+
+import json
+import math
+
+INDENT = 2
+ITEM_SEPARATOR = ','
+KEY_SEPARATOR = ': '
+MINIFIED_KEY_SEPARATOR = ':'
+AUTO_BACKEND = 'auto'
+
+
+class JsonBackend(object):
+    """This class encodes values with :mod:`json` of the standard library."""
+
+    name = 'json'
+
+    def dumps(self, value: Any, indent: int = None) -> str:
+        """Encode a value as a JSON document.
+
+        Args:
+            value: A value to be encoded.
+
+            indent: A number of spaces for each level of nesting, or `None` to encode the value in one line.
+
+        Returns:
+            A JSON document, non-ASCII characters of which are escaped.
+
+        """
+        if indent is None:
+            return json.dumps(value, separators=(ITEM_SEPARATOR, MINIFIED_KEY_SEPARATOR))
+        return json.dumps(value, indent=indent, separators=(ITEM_SEPARATOR, KEY_SEPARATOR))
+
+
+class OrjsonBackend(JsonBackend):
+    """This class encodes values with `orjson`, which is much faster than :mod:`json`.
+
+    A value which `orjson` can't encode as :mod:`json` does, such as an integer larger than 64 bits,
+    `NaN` and `Infinity` (which `orjson` writes as `null`), or which has non-ASCII characters,
+    is encoded with :mod:`json`, so that documents are the same except for exponents of floats,
+    which `orjson` writes as `1e16` instead of `1e+16`. Therefore, this backend is used only if chosen explicitly.
+    """
+
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+        self.options = {None: orjson.OPT_NON_STR_KEYS, INDENT: orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2}
+
+    def dumps(self, value: Any, indent: int = None) -> str:
+        option = self.options.get(indent)
+        if option is not None:
+            try:
+                document = self.orjson.dumps(value, option=option)
+                if b'null' not in document or not _has_non_finite_float(value):
+                    return document.decode('ascii')
+            except (TypeError, UnicodeDecodeError):
+                pass
+        return super(OrjsonBackend, self).dumps(value, indent)
+
+
+def _has_non_finite_float(value: Any) -> bool:
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any([_has_non_finite_float(item) for item in list(value.values())])
+    if isinstance(value, (list, tuple)):
+        return any([_has_non_finite_float(item) for item in value])
+    return False
+
+
+_backends = {
+    JsonBackend.name: JsonBackend,
+    OrjsonBackend.name: OrjsonBackend,
+}  # type: Dict[str, Callable[[], JsonBackend]]
+
+_preferred_backends = [OrjsonBackend.name, JsonBackend.name]
+
+
+def register_backend(name: str, factory: Callable[[], Any], preferred: bool = False):
+    """Register an encoder backend.
+
+    Args:
+        name: A name of the backend.
+
+        factory: A callable returning a backend, which has a `dumps(value, indent)` method
+            as :meth:`JsonBackend.dumps` does. It should raise `ImportError` if the backend is not available.
+
+        preferred: A flag whether or not the backend is used by `auto` prior to the others.
+
+    """
+    _backends[name] = factory
+    if name in _preferred_backends:
+        _preferred_backends.remove(name)
+    if preferred:
+        _preferred_backends.insert(0, name)
+
+
+def backend_names() -> list:
+    """Return names of registered encoder backends."""
+    return sorted(_backends)
+
+
+def get_backend(name: str = AUTO_BACKEND) -> JsonBackend:
+    """Return an encoder backend.
+
+    Args:
+        name: A name of a backend. If `auto`, the first available one of preferred backends is returned.
+
+    Returns:
+        A backend.
+
+    Raises:
+        ValueError: If the backend is not registered or not available.
+
+    """
+    if name == AUTO_BACKEND:
+        for preferred in _preferred_backends:
+            try:
+                return _backends[preferred]()
+            except ImportError:
+                continue
+        return JsonBackend()
+
+    if name not in _backends:
+        raise ValueError('unknown encoder backend. backend: %r, available: %r' % (name, backend_names()))
+    try:
+        return _backends[name]()
+    except ImportError as e:
+        raise ValueError('encoder backend is not available. backend: %r, reason: %s' % (name, e))
+
+
+class Encoding(object):
+    """This class holds a style of a JSON document and a backend encoding values.
+
+    Args:
+        backend: A backend, or a name of a backend as :func:`get_backend` takes.
+
+        minify: A flag whether or not a document is encoded without any whitespace.
+
+    """
+
+    __slots__ = ('backend', 'indent', 'key', 'newline')
+
+    def __init__(self, backend: Any = JsonBackend.name, minify: bool = False):
+        self.backend = get_backend(backend) if isinstance(backend, str) else backend
+        self.indent = None if minify else INDENT
+        self.key = ('json', self.backend.name, self.indent)
+        self.newline = '' if minify else '\n'
+
+    def pad(self, level: int) -> str:
+        """Return a line break and an indentation for a depth, or an empty string if minified."""
+        return self.newline + ' ' * (INDENT * level) if self.newline else ''
+
+    @property
+    def key_separator(self) -> str:
+        return MINIFIED_KEY_SEPARATOR if self.indent is None else KEY_SEPARATOR
+
+    @property
+    def minify(self) -> bool:
+        return self.indent is None
+
+    def iter_fragments(self, template: dsl.Template) -> Iterator[Tuple[str, dsl.Element, str]]:
+        """Encode a template chunk by chunk as :func:`iter_fragments` does.
+
+        :func:`iterencode` and :func:`dump` call this method, so that another kind of a document,
+        such as :class:`aws_vapor.emitter.YamlEncoding`, is written by passing an object having it.
+        """
+        return iter_fragments(template, self)
+
+    def __reduce__(self):
+        # a backend may hold a module, which can't be pickled, so that it is looked up by name in a worker process.
+        return Encoding, (self.backend.name, self.minify)
+
+
+DEFAULT_ENCODING = Encoding()
+
+
+def encode_value(value: Any, level: int = 0, encoding: Encoding = DEFAULT_ENCODING) -> str:
+    """Encode a value as a JSON document nested at the given depth.
+
+    Args:
+        value: A value to be encoded.
+
+        level: A depth of the value in the whole document.
+
+        encoding: A style of the document and a backend.
+
+    Returns:
+        A JSON document, continuation lines of which are indented for `level`.
+
+    """
+    chunk = encoding.backend.dumps(value, encoding.indent)
+    if level > 0 and encoding.indent is not None and '\n' in chunk:
+        chunk = chunk.replace('\n', encoding.pad(level))
+    return chunk
+
+
+def _encode_entry(key: str, value: Any, level: int, encoding: Encoding) -> str:
+    return (encoding.pad(level) + encoding.backend.dumps(key) + encoding.key_separator +
+            encode_value(value, level, encoding))
+
+
+def encode_element(element: dsl.Element, encoding: Encoding = DEFAULT_ENCODING) -> str:
+    """Encode entries that an element puts into a top level section.
+
+    The encoded entries are cached on the element for each style and backend, and reused until the element is modified.
+
+    Args:
+        element: An element of a template.
+
+        encoding: A style of the document and a backend.
+
+    Returns:
+        A JSON fragment of the entries, continuation lines of which are indented for a top level section.
+
+    """
+    def encode(target: dsl.Element) -> str:
+        fragment = {}
+        target.to_template(fragment)
+        return ITEM_SEPARATOR.join([_encode_entry(name, attrs, 2, encoding) for name, attrs in list(fragment.items())])
+
+    return element.cached(encoding.key, encode)
+
+
+def _iter_section(section_name: str, elements: list,
+                  encoding: Encoding) -> Iterator[Tuple[str, dsl.Element, str]]:
+    first = True
+    for element in elements:
+        chunk = encode_element(element, encoding)
+        if not chunk:
+            continue
+        yield section_name, None, '{' if first else ITEM_SEPARATOR
+        first = False
+        yield section_name, element, chunk
+    yield section_name, None, '{}' if first else encoding.pad(1) + '}'
+
+
+def iter_fragments(template: dsl.Template,
+                   encoding: Encoding = DEFAULT_ENCODING) -> Iterator[Tuple[str, dsl.Element, str]]:
+    """Encode a template as a JSON document chunk by chunk, telling where each chunk comes from.
+
+    Args:
+        template: A template builder.
+
+        encoding: A style of the document and a backend.
+
+    Returns:
+        An iterator of a section name or `None` for top level chunks,
+        an element or `None` for chunks other than elements, and a chunk of a JSON document.
+
+    """
+    yield None, None, '{'
+    yield None, None, _encode_entry('AWSTemplateFormatVersion', template.version, 1, encoding)
+    yield None, None, ITEM_SEPARATOR
+    yield None, None, _encode_entry('Description', template.description, 1, encoding)
+    for section_name, elements in list(template.elements.items()):
+        yield None, None, ITEM_SEPARATOR
+        yield section_name, None, encoding.pad(1) + encoding.backend.dumps(section_name) + encoding.key_separator
+        for fragment in _iter_section(section_name, elements, encoding):
+            yield fragment
+    yield None, None, encoding.pad(0) + '}'
+
+
+def iterencode(template: dsl.Template, encoding: Encoding = DEFAULT_ENCODING) -> Iterator[str]:
+    """Encode a template as a JSON document chunk by chunk.
+
+    The template is encoded element by element instead of being converted by `Template.to_template`,
+    and the concatenated chunks are identical to `json.dumps(template.to_template(), indent=2)`,
+    or to `json.dumps(template.to_template(), separators=(',', ':'))` if minified.
+
+    Args:
+        template: A template builder.
+
+        encoding: A style of the document and a backend.
+
+    Returns:
+        An iterator of chunks of a JSON document.
+
+    """
+    for _, _, chunk in encoding.iter_fragments(template):
+        yield chunk
+
+
+def dump(template: dsl.Template, output_file: TextIOBase, encoding: Encoding = DEFAULT_ENCODING):
+    """Write a template to a file as a JSON document without building the whole document in memory.
+
+    Args:
+        template: A template builder.
+
+        output_file: A file object to which the JSON document is written.
+
+        encoding: A style of the document and a backend.
+
+    """
+    for chunk in iterencode(template, encoding):
+        output_file.write(chunk)
@@ -1,50 +1,206 @@
 # -*- coding: utf-8 -*-
 
-from typing import Any, List, Tuple
+from typing import Any, Dict, Iterator, List, Set, Tuple
 from argparse import ArgumentParser
 
-from aws_vapor import dsl, utils
+from aws_vapor import analyzer, dsl, emitter, encoder, partitioner, utils, validator
 from cliff.command import Command
-from json import dumps
+from types import FunctionType, ModuleType
 
+import fnmatch
+import logging
 import os
 import sys
+import time
+import traceback
+
+DEFAULT_TASK_NAME = 'generate'
+OUTPUT_FORMATS = ['json', 'yaml']
+
+_vaporfile_paths = {}
 
 
 class Generator(Command):
     """This class generates an AWS CloudFormation template from Python objects."""
 
+    log = logging.getLogger(__name__)
+
     def get_parser(self, program_name: str) -> ArgumentParser:
         parser = super(Generator, self).get_parser(program_name)
         parser.add_argument('vaporfile',
                             help='a file path to vaporfile')
-        parser.add_argument('task', nargs='?',
-                            help='a task name defined in vaporfile')
+        parser.add_argument('task', nargs='*',
+                            help='task names or glob patterns of task names defined in vaporfile')
         parser.add_argument('--contrib',
                             help='a module search path of contrib recipes')
         parser.add_argument('--recipe', nargs='+',
                             help='a module name of contrib recipe')
         parser.add_argument('--output',
-                            help='an output file name')
+                            help='an output file name, which must include "{task}" if generating multiple tasks')
+        parser.add_argument('--jobs', type=int,
+                            help='a number of processes generating multiple tasks in parallel')
+        parser.add_argument('--watch', action='store_true', default=False,
+                            help='a flag whether or not templates are regenerated whenever files are modified')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='seconds between polls for modified files in watch mode')
+        parser.add_argument('--cache', action='store_true', default=False,
+                            help='a flag whether or not templates are reused from the build cache, which tracks '
+                                 'only files read through aws-vapor and modules imported from vaporfile')
+        parser.add_argument('--cache-dir',
+                            help='a directory of the build cache')
+        parser.add_argument('--cache-size', type=int,
+                            help='a maximum size of the build cache in megabytes')
+        parser.add_argument('--max-bytes', type=int, default=analyzer.DEFAULT_MAX_BYTES,
+                            help='a maximum size of a template in bytes, or 0 not to limit it')
+        parser.add_argument('--max-resources', type=int, default=analyzer.DEFAULT_MAX_RESOURCES,
+                            help='a maximum number of resources in a template, or 0 not to limit it')
+        parser.add_argument('--max-parameters', type=int, default=analyzer.DEFAULT_MAX_PARAMETERS,
+                            help='a maximum number of parameters in a template, or 0 not to limit it')
+        parser.add_argument('--max-outputs', type=int, default=analyzer.DEFAULT_MAX_OUTPUTS,
+                            help='a maximum number of outputs in a template, or 0 not to limit it')
+        parser.add_argument('--size-report', action='store_true', default=False,
+                            help='a flag whether or not sizes of sections and of the largest elements are reported')
+        parser.add_argument('--minify', action='store_true', default=False,
+                            help='a flag whether or not templates are written without any whitespace')
+        parser.add_argument('--encoder', default=encoder.JsonBackend.name,
+                            help='a name of an encoder backend, such as "json" (default) or "orjson", '
+                                 'or "auto" to use the fastest one available')
+        parser.add_argument('--format', choices=OUTPUT_FORMATS, default=OUTPUT_FORMATS[0],
+                            help='a format of templates')
+        parser.add_argument('--validate', action='store_true', default=False,
+                            help='a flag whether or not references between elements of templates are validated')
+        parser.add_argument('--nested-stack-url',
+                            help='a base URL of S3 where templates of nested stacks are uploaded. '
+                                 'a template exceeding limits is split into nested stacks written next to it')
         return parser
 
-    def take_action(self, args: Any):
-        file_path = args.vaporfile
-        task_name = args.task
-        (vaporfile, task, directory) = load_vaporfile(file_path, task_name)
-
-        os.chdir(directory)
-        template = task()
+    def take_action(self, args: Any) -> int:
+        file_path = os.path.abspath(args.vaporfile)
+        task_patterns = args.task or [DEFAULT_TASK_NAME]
 
+        contrib = None
         if args.recipe is not None:
             contrib = args.contrib or utils.get_property_from_config_file('defaults', 'contrib')
-            recipes = args.recipe
-            apply_recipes(template, contrib, recipes)
 
-        output_template(self, template, args.output)
+        encoding = encoding_of(args.format, args.encoder, args.minify)
+
+        if args.watch:
+            return self.watch(file_path, task_patterns, contrib, args, encoding)
+
+        cache = self.open_cache(args) if args.cache and args.nested_stack_url is None else None
+        limits = {'max_bytes': args.max_bytes, 'max_resources': args.max_resources,
+                  'max_parameters': args.max_parameters, 'max_outputs': args.max_outputs}
+        options = output_options(limits, encoding, args.validate)
+
+        task_names = task_patterns
+        if len(task_patterns) > 1 or has_glob_pattern(task_patterns[0]):
+            (vaporfile, _, _) = load_vaporfile(file_path, None, resolve_task=False)
+            task_names = find_tasks(vaporfile, task_patterns)
+
+        # a pattern matching one task, or a task given repeatedly, is written to stdout without --output as well
+        if len(task_names) == 1:
+            task_name = task_names[0]
+            relative_file_path = args.output
+            if relative_file_path is not None:
+                relative_file_path = relative_file_path.replace('{task}', task_name)
+
+            if cache is None:
+                (template, _) = build_template(file_path, task_name, contrib, args.recipe)
+                for part_path, part in prepare_templates(task_name, template, relative_file_path, limits,
+                                                         args.size_report, encoding, args.validate,
+                                                         args.nested_stack_url):
+                    output_template(self, part, part_path, encoding)
+                return 0
+
+            key = cache.key_of(file_path, task_name, contrib, args.recipe, options)
+            object_path = cache.lookup(key)
+            hits = 0 if object_path is None else 1
+            if object_path is None:
+                (template, dependencies) = build_template(file_path, task_name, contrib, args.recipe)
+                check_template(task_name, template, limits, args.size_report, encoding, args.validate)
+                object_path = cache.store(key, iter_template(template, encoding), dependencies)
+            output_stored_template(self, object_path, relative_file_path)
+            self.close_cache(cache, hits, 1 - hits)
+            return 0
+
+        check_output(args.output, task_names)
+
+        hits = 0
+        if cache is not None:
+            missed_task_names = []
+            for task_name in task_names:
+                object_path = cache.lookup(cache.key_of(file_path, task_name, contrib, args.recipe, options))
+                if object_path is None:
+                    missed_task_names.append(task_name)
+                else:
+                    output_stored_template(None, object_path, args.output.replace('{task}', task_name))
+                    self.log.info('restored %s from the build cache', task_name)
+            hits = len(task_names) - len(missed_task_names)
+            task_names = missed_task_names
+
+        failures = 0
+        for task_name, elapsed, error in generate_tasks(file_path, task_names, contrib, args.recipe, args.output,
+                                                        args.jobs, cache, limits, args.size_report, encoding,
+                                                        args.validate, args.nested_stack_url):
+            if error is None:
+                self.log.info('generated %s in %.3fs', task_name, elapsed)
+            else:
+                failures += 1
+                self.log.error('failed to generate %s in %.3fs\n%s', task_name, elapsed, error)
+
+        if cache is not None:
+            self.close_cache(cache, hits, len(task_names))
+        return 1 if failures > 0 else 0
+
+    def open_cache(self, args: Any) -> Any:
+        from aws_vapor.cache import BuildCache
 
+        cache_dir, cache_size = args.cache_dir, args.cache_size
+        if cache_dir is None or cache_size is None:
+            props = utils.get_properties_from_config_file('defaults', ['cache_dir', 'cache_size'])
+            cache_dir = cache_dir or props['cache_dir']
+            if cache_size is None and props['cache_size'] is not None:
+                cache_size = int(props['cache_size'])
+        return BuildCache(cache_dir, cache_size * 1024 * 1024 if cache_size is not None else None)
 
-def load_vaporfile(file_path: str, task_name: str) -> Tuple[object, any, str]:
+    def close_cache(self, cache: Any, hits: int, misses: int):
+        # hits and misses are counted here, where templates are looked up, rather than in worker processes.
+        evicted = cache.evict()
+        cache.save_stats(hits, misses)
+        stats = cache.stats()
+        self.log.info('build cache: %d hits, %d misses, %d entries, %d bytes, %d evicted',
+                      hits, misses, stats['entries'], stats['bytes'], evicted)
+
+    def watch(self, file_path: str, task_patterns: List[str], contrib: str, args: Any,
+              encoding: encoder.Encoding) -> int:
+        from aws_vapor.watcher import Watcher
+
+        (vaporfile, _, _) = load_vaporfile(file_path, None, resolve_task=False)
+        task_names = find_tasks(vaporfile, task_patterns)
+        check_output(args.output, task_names)
+
+        def output(task_name: str, template: dsl.Template):
+            relative_file_path = args.output.replace('{task}', task_name) if args.output is not None else None
+            if args.validate:
+                problems = validator.validate(template)
+                if problems:
+                    self.log.error('%s has invalid references. not written.\n%s', task_name, '\n'.join(problems))
+                    return
+            output_template(self, template, relative_file_path, encoding)
+
+        try:
+            Watcher(file_path, task_names, contrib, args.recipe, output, args.interval).watch()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+
+def check_output(relative_file_path: str, task_names: List[str]):
+    if len(task_names) > 1 and (relative_file_path is None or '{task}' not in relative_file_path):
+        raise ValueError('--output should include "{task}" to generate multiple tasks. tasks: %r' % task_names)
+
+
+def load_vaporfile(file_path: str, task_name: str, resolve_task: bool = True) -> Tuple[object, Any, str]:
     directory, filename = os.path.split(file_path)
 
     edited_module_search_path = False
@@ -52,17 +208,358 @@ def load_vaporfile(file_path: str, task_name: str) -> Tuple[object, any, str]:
         sys.path.insert(0, directory)
         edited_module_search_path = True
 
-    vaporfile = __import__(os.path.splitext(filename)[0])
+    module_name = os.path.splitext(filename)[0]
+    loaded = sys.modules.get(module_name)
+    if loaded is not None and module_name in _vaporfile_paths and _vaporfile_paths[module_name] != os.path.abspath(file_path):
+        # another vaporfile having the same name was loaded before, so that it should not be reused.
+        del sys.modules[module_name]
+
+    vaporfile = __import__(module_name)
+    _vaporfile_paths[module_name] = os.path.abspath(file_path)
 
     if edited_module_search_path:
         del sys.path[0]
 
-    task_name = task_name or 'generate'
+    if not resolve_task:
+        return vaporfile, None, directory
+
+    task_name = task_name or DEFAULT_TASK_NAME
     task = getattr(vaporfile, task_name)
 
     return vaporfile, task, directory
 
 
+def _module_file(module: ModuleType) -> str:
+    module_file = getattr(module, '__file__', None)
+    if not module_file or not module_file.endswith('.py'):
+        return None
+    return os.path.abspath(module_file)
+
+
+def _is_under(file_path: str, directories: List[str]) -> bool:
+    return any([file_path.startswith(directory + os.sep) for directory in directories])
+
+
+def project_modules(file_path: str, contrib: str) -> Dict[str, str]:
+    """Find modules loaded from a vaporfile, its directory and the contrib directory.
+
+    Args:
+        file_path: An absolute path to vaporfile.
+
+        contrib: A module search path of contrib recipes, or `None`.
+
+    Returns:
+        A mapping of a module name to an absolute path to its source file.
+
+    """
+    directories = [os.path.dirname(file_path)]
+    if contrib is not None:
+        directories.append(os.path.abspath(contrib))
+
+    modules = {}
+    for name, module in list(sys.modules.items()):
+        module_file = _module_file(module) if module is not None else None
+        if module_file is not None and (module_file == file_path or _is_under(module_file, directories)):
+            modules[name] = module_file
+    return modules
+
+
+def has_glob_pattern(task_pattern: str) -> bool:
+    return any([c in task_pattern for c in '*?['])
+
+
+def find_tasks(vaporfile: object, task_patterns: List[str]) -> List[str]:
+    """Find task names matching any of patterns in a vaporfile.
+
+    Args:
+        vaporfile: A module loaded from a vaporfile.
+
+        task_patterns: Task names or glob patterns of task names.
+            A glob pattern matches public functions defined in the vaporfile.
+
+    Returns:
+        Task names in order of `task_patterns` without duplication.
+
+    """
+    candidates = [name for name, value in list(vars(vaporfile).items())
+                  if isinstance(value, FunctionType) and value.__module__ == vaporfile.__name__ and not name.startswith('_')]
+
+    task_names = []
+    for task_pattern in task_patterns:
+        if has_glob_pattern(task_pattern):
+            matched = fnmatch.filter(candidates, task_pattern)
+            if not matched:
+                raise ValueError('no task matches pattern. pattern: %r' % task_pattern)
+        else:
+            if not callable(getattr(vaporfile, task_pattern, None)):
+                raise ValueError('missing task. task: %r' % task_pattern)
+            matched = [task_pattern]
+        for task_name in matched:
+            if task_name not in task_names:
+                task_names.append(task_name)
+    return task_names
+
+
+def build_template(file_path: str, task_name: str, contrib: str,
+                   recipes: List[str]) -> Tuple[dsl.Template, Set[str]]:
+    """Generate an AWS CloudFormation template from a task, recording files which the task depends on.
+
+    Args:
+        file_path: An absolute path to vaporfile.
+
+        task_name: A task name defined in vaporfile.
+
+        contrib: A module search path of contrib recipes.
+
+        recipes: Module names of contrib recipes, or `None`.
+
+    Returns:
+        The template, and absolute paths to the vaporfile, modules imported from its directory
+        and the contrib directory, and files read through :mod:`aws_vapor.utils`.
+
+    """
+    with utils.record_file_reads() as file_reads:
+        (vaporfile, task, directory) = load_vaporfile(file_path, task_name)
+
+        os.chdir(directory)
+        template = task()
+
+        if recipes is not None:
+            apply_recipes(template, contrib, recipes)
+
+    dependencies = {file_path} | file_reads | set(project_modules(file_path, contrib).values())
+    return template, dependencies
+
+
+def generate_task(file_path: str, task_name: str, contrib: str, recipes: List[str], relative_file_path: str,
+                  cache: Any = None, limits: Dict[str, int] = None, size_report: bool = False,
+                  encoding: encoder.Encoding = encoder.DEFAULT_ENCODING, validate: bool = False,
+                  nested_stack_url: str = None) -> Tuple[str, float, str]:
+    """Generate an AWS CloudFormation template from a task and write it to a file.
+
+    Args:
+        file_path: An absolute path to vaporfile.
+
+        task_name: A task name defined in vaporfile.
+
+        contrib: A module search path of contrib recipes.
+
+        recipes: Module names of contrib recipes, or `None`.
+
+        relative_file_path: An output file name, in which "{task}" is replaced with `task_name`.
+
+        cache: A :class:`aws_vapor.cache.BuildCache`, in which the template is stored, or `None`.
+
+        limits: Limits of the template as :func:`check_template` takes, or `None` not to limit it.
+
+        size_report: A flag whether or not sizes of the template are logged.
+
+        encoding: A style of the template and an encoder backend.
+
+        validate: A flag whether or not references between elements of the template are validated.
+
+        nested_stack_url: A base URL of templates of nested stacks as :func:`prepare_templates` takes,
+            which is ignored if `cache` is given.
+
+    Returns:
+        The task name, elapsed seconds and a formatted traceback if failed, otherwise `None`.
+
+    """
+    started = time.perf_counter()
+    try:
+        (template, dependencies) = build_template(file_path, task_name, contrib, recipes)
+
+        if cache is None:
+            output_path = relative_file_path.replace('{task}', task_name)
+            for part_path, part in prepare_templates(task_name, template, output_path, limits, size_report, encoding,
+                                                     validate, nested_stack_url):
+                output_template(None, part, part_path, encoding)
+        else:
+            check_template(task_name, template, limits, size_report, encoding, validate)
+            key = cache.key_of(file_path, task_name, contrib, recipes, output_options(limits, encoding, validate))
+            object_path = cache.store(key, iter_template(template, encoding), dependencies)
+            output_stored_template(None, object_path, relative_file_path.replace('{task}', task_name))
+    except (analyzer.LimitExceededError, validator.ValidationError) as e:
+        return task_name, time.perf_counter() - started, '%s' % e
+    except Exception:
+        return task_name, time.perf_counter() - started, traceback.format_exc()
+    return task_name, time.perf_counter() - started, None
+
+
+def generate_tasks(file_path: str, task_names: List[str], contrib: str, recipes: List[str],
+                   relative_file_path: str, jobs: int = None, cache: Any = None, limits: Dict[str, int] = None,
+                   size_report: bool = False, encoding: encoder.Encoding = encoder.DEFAULT_ENCODING,
+                   validate: bool = False, nested_stack_url: str = None) -> Iterator[Tuple[str, float, str]]:
+    """Generate AWS CloudFormation templates from tasks in parallel.
+
+    Args:
+        file_path: An absolute path to vaporfile.
+
+        task_names: Task names defined in vaporfile.
+
+        contrib: A module search path of contrib recipes.
+
+        recipes: Module names of contrib recipes, or `None`.
+
+        relative_file_path: An output file name, in which "{task}" is replaced with each task name.
+
+        jobs: A number of worker processes. If not specified, a number of CPUs is used.
+            If 1, tasks are generated one by one in the current process.
+
+        cache: A :class:`aws_vapor.cache.BuildCache`, in which templates are stored, or `None`.
+
+        limits: Limits of templates as :func:`check_template` takes, or `None` not to limit them.
+
+        size_report: A flag whether or not sizes of templates are logged.
+
+        encoding: A style of templates and an encoder backend.
+
+        validate: A flag whether or not references between elements of templates are validated.
+
+        nested_stack_url: A base URL of templates of nested stacks as :func:`prepare_templates` takes.
+
+    Returns:
+        An iterator of results of :func:`generate_task` in order of `task_names`.
+
+    """
+    if not task_names:
+        return
+
+    jobs = min(jobs or os.cpu_count() or 1, len(task_names))
+    if jobs <= 1:
+        current_directory = os.getcwd()
+        try:
+            for task_name in task_names:
+                yield generate_task(file_path, task_name, contrib, recipes, relative_file_path, cache, limits,
+                                    size_report, encoding, validate, nested_stack_url)
+        finally:
+            os.chdir(current_directory)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(generate_task, file_path, task_name, contrib, recipes, relative_file_path, cache,
+                                   limits, size_report, encoding, validate, nested_stack_url)
+                   for task_name in task_names]
+        for future in futures:
+            yield future.result()
+
+
+def check_template(task_name: str, template: dsl.Template, limits: Dict[str, int] = None,
+                   size_report: bool = False, encoding: encoder.Encoding = encoder.DEFAULT_ENCODING,
+                   validate: bool = False):
+    """Check that a template doesn't exceed limits of AWS CloudFormation before it is written.
+
+    Args:
+        task_name: A task name, from which the template is generated.
+
+        template: A template builder.
+
+        limits: A mapping of 'max_bytes', 'max_resources', 'max_parameters' and 'max_outputs' to limits
+            as :func:`aws_vapor.analyzer.check_limits` takes, or `None` not to limit the template.
+            Limits of parameters and outputs which are not given are those of AWS CloudFormation.
+
+        size_report: A flag whether or not sizes of the template are logged.
+
+        encoding: A style of the template and an encoder backend, with which sizes are measured.
+
+        validate: A flag whether or not references between elements of the template are validated
+            by :func:`aws_vapor.validator.validate`.
+
+    Raises:
+        aws_vapor.validator.ValidationError: If the template has dangling or circular references.
+
+        aws_vapor.analyzer.LimitExceededError: If the template exceeds any of limits.
+
+    """
+    if validate:
+        try:
+            validator.check_references(template)
+        except validator.ValidationError as e:
+            raise validator.ValidationError('%s has invalid references.\n%s' % (task_name, e))
+    if limits is None and not size_report:
+        return
+    limits = limits or {'max_bytes': 0, 'max_resources': 0, 'max_parameters': 0, 'max_outputs': 0}
+    try:
+        report = analyzer.check_limits(template, limits['max_bytes'], limits['max_resources'], encoding=encoding,
+                                       max_parameters=limits.get('max_parameters', analyzer.DEFAULT_MAX_PARAMETERS),
+                                       max_outputs=limits.get('max_outputs', analyzer.DEFAULT_MAX_OUTPUTS))
+    except analyzer.LimitExceededError as e:
+        raise analyzer.LimitExceededError('%s exceeds limits of AWS CloudFormation. %s' % (task_name, e))
+    if size_report:
+        logging.getLogger(__name__).info('size of %s\n%s', task_name, report.format())
+
+
+def prepare_templates(task_name: str, template: dsl.Template, relative_file_path: str, limits: Dict[str, int] = None,
+                      size_report: bool = False, encoding: encoder.Encoding = encoder.DEFAULT_ENCODING,
+                      validate: bool = False, nested_stack_url: str = None) -> List[Tuple[str, dsl.Template]]:
+    """Check a template as :func:`check_template` does, splitting it into nested stacks if it exceeds limits.
+
+    Templates of nested stacks are written next to the template, such as `web-Stack1.json` for `web.json`,
+    and are expected to be uploaded under `nested_stack_url`.
+
+    Args:
+        task_name: A task name, from which the template is generated.
+
+        template: A template builder.
+
+        relative_file_path: An output file name of the template, or `None` to write it to stdout.
+
+        limits: Limits of the template and of templates of nested stacks as :func:`check_template` takes.
+
+        size_report: A flag whether or not sizes of templates are logged.
+
+        encoding: A style of templates and an encoder backend.
+
+        validate: A flag whether or not references between elements of the template are validated.
+
+        nested_stack_url: A base URL of templates of nested stacks, or `None` not to split the template.
+
+    Returns:
+        A list of an output file name and a template, the first of which is the template or its parent template.
+
+    Raises:
+        ValueError: If the template is split but `relative_file_path` is not given.
+
+        aws_vapor.analyzer.LimitExceededError: If the template or a template of a nested stack still exceeds limits,
+            such as a child template referring to more values of other child templates than parameters allow.
+
+    """
+    if nested_stack_url is None or limits is None:
+        check_template(task_name, template, limits, size_report, encoding, validate)
+        return [(relative_file_path, template)]
+
+    check_template(task_name, template, None, False, encoding, validate)
+    max_parameters = limits.get('max_parameters', analyzer.DEFAULT_MAX_PARAMETERS)
+    max_outputs = limits.get('max_outputs', analyzer.DEFAULT_MAX_OUTPUTS)
+    report = analyzer.analyze(template, encoding)
+    if not report.violations(limits['max_bytes'], limits['max_resources'], max_parameters, max_outputs):
+        check_template(task_name, template, limits, size_report, encoding)
+        return [(relative_file_path, template)]
+    if relative_file_path is None:
+        raise ValueError('nested stacks must be written into files. task: %r' % task_name)
+
+    root, extension = os.path.splitext(relative_file_path)
+
+    def child_path(stack_name: str) -> str:
+        return '%s-%s%s' % (root, stack_name, extension)
+
+    def template_url(stack_name: str) -> str:
+        return '%s/%s' % (nested_stack_url.rstrip('/'), os.path.basename(child_path(stack_name)))
+
+    parent, children = partitioner.partition(template, template_url, limits['max_resources'], limits['max_bytes'],
+                                             report, encoding=encoding, max_parameters=max_parameters,
+                                             max_outputs=max_outputs)
+    logging.getLogger(__name__).info('split %s into %d nested stacks', task_name, len(children))
+
+    parts = [(relative_file_path, parent)]
+    parts.extend([(child_path(stack_name), child) for stack_name, child in children])
+    for part_path, part in parts:
+        check_template(os.path.basename(part_path), part, limits, size_report, encoding)
+    return parts
+
+
 def apply_recipes(template: dsl.Template, contrib: str, recipes: List[str]):
     edited_module_search_path = False
     if contrib is not None and contrib not in sys.path:
@@ -78,11 +575,66 @@ def apply_recipes(template: dsl.Template, contrib: str, recipes: List[str]):
         del sys.path[0]
 
 
-def output_template(command: Command, template: dsl.Template, relative_file_path: str = None):
-    json_document = dumps(template.to_template(), indent=2, separators=(',', ': '))
+def encoding_of(output_format: str, backend: str = encoder.JsonBackend.name,
+                minify: bool = False) -> encoder.Encoding:
+    """Return a style of templates.
+
+    Args:
+        output_format: A format of templates, `json` or `yaml`.
+
+        backend: A name of an encoder backend of JSON documents.
+
+        minify: A flag whether or not JSON documents are written without any whitespace.
+
+    Returns:
+        A style of templates.
+
+    Raises:
+        ValueError: If an unknown format is given, or `minify` is given for YAML documents.
 
+    """
+    if output_format == 'json':
+        return encoder.Encoding(backend, minify)
+    if output_format == 'yaml':
+        if minify:
+            raise ValueError('yaml templates can not be minified.')
+        return emitter.YamlEncoding()
+    raise ValueError('unknown output format. format: %r, available: %r' % (output_format, OUTPUT_FORMATS))
+
+
+def output_options(limits: Dict[str, int], encoding: encoder.Encoding, validate: bool = False) -> Dict[str, Any]:
+    """Return options affecting an output, which are a part of a key of the build cache."""
+    options = dict(limits or {})
+    options['encoding'] = list(encoding.key)
+    options['validate'] = validate
+    return options
+
+
+def output_template(command: Command, template: dsl.Template, relative_file_path: str = None,
+                    encoding: encoder.Encoding = encoder.DEFAULT_ENCODING):
     if relative_file_path is None:
-        command.app.stdout.write('{0}\n'.format(json_document))
+        encoder.dump(template, command.app.stdout, encoding)
+        command.app.stdout.write('\n')
     else:
         with utils.open_output_file(relative_file_path) as output_file:
-            output_file.write('{0}\n'.format(json_document))
+            encoder.dump(template, output_file, encoding)
+            output_file.write('\n')
+
+
+def iter_template(template: dsl.Template, encoding: encoder.Encoding = encoder.DEFAULT_ENCODING) -> Iterator[str]:
+    """Encode an AWS CloudFormation template chunk by chunk as :func:`output_template` writes it."""
+    for chunk in encoder.iterencode(template, encoding):
+        yield chunk
+    yield '\n'
+
+
+def output_stored_template(command: Command, object_path: str, relative_file_path: str = None):
+    """Copy a template stored in the build cache to an output file, or to stdout if it is not given."""
+    import shutil
+
+    with open(object_path, encoding='utf-8') as fh:
+        if relative_file_path is None:
+            shutil.copyfileobj(fh, command.app.stdout)
+        else:
+            with utils.open_output_file(relative_file_path) as output_file:
+                shutil.copyfileobj(fh, output_file)
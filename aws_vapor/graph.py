@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Dict, Iterator, List, Tuple
+
+from aws_vapor import dsl
+
+import re
+
+REFERENCES_KEY = ('references',)
+
+PSEUDO_PARAMETERS = frozenset([
+    'AWS::AccountId', 'AWS::NotificationARNs', 'AWS::NoValue', 'AWS::Partition', 'AWS::Region', 'AWS::StackId',
+    'AWS::StackName', 'AWS::URLSuffix',
+])
+
+# sections whose elements may refer to other elements
+REFERRING_SECTIONS = frozenset(['Conditions', 'Resources', 'Outputs'])
+
+# a kind of a reference and sections which its target is looked up in order
+TARGET_SECTIONS = {
+    'Ref': ('Parameters', 'Resources'),
+    'Fn::GetAtt': ('Resources',),
+    'Fn::FindInMap': ('Mappings',),
+    'Fn::Sub': ('Parameters', 'Resources'),
+    'Condition': ('Conditions',),
+    'DependsOn': ('Resources',),
+}
+
+_SUB_VARIABLE = re.compile(r'\$\{([^!}][^}]*)\}')
+
+Node = Tuple[str, str]
+Reference = Tuple[str, str, Tuple[Any, ...]]
+
+
+def _sub_references(argument: Any) -> Iterator[Tuple[str, str]]:
+    if isinstance(argument, list) and len(argument) == 2 and isinstance(argument[1], dict):
+        text, variables = argument
+    else:
+        text, variables = argument, {}
+    if not isinstance(text, str):
+        return
+    for name in _SUB_VARIABLE.findall(text):
+        name = name.strip()
+        if name in variables:
+            continue
+        if '.' in name and not name.startswith('AWS::'):
+            yield 'Fn::GetAtt', name.split('.', 1)[0]
+        else:
+            yield 'Fn::Sub', name
+
+
+def iter_references(attrs: Any, path: Tuple[Any, ...] = ()) -> Iterator[Reference]:
+    """Find references to other elements in attributes of an element.
+
+    `Ref`, `Fn::GetAtt`, `Fn::FindInMap`, `Fn::Sub` and conditions of `Fn::If` are found at any depth,
+    and `Condition` and `DependsOn` of resources and outputs at the top level.
+
+    Args:
+        attrs: Attributes of an element.
+
+        path: Keys and indexes from the top of a template to `attrs`.
+
+    Returns:
+        An iterator of a kind of a reference, a logical name of its target,
+        and keys and indexes to the intrinsic function or the attribute.
+
+    """
+    if isinstance(attrs, dict):
+        condition = attrs.get('Condition')
+        if isinstance(condition, str):
+            yield 'Condition', condition, path + ('Condition',)
+        depends_on = attrs.get('DependsOn')
+        for target in [depends_on] if isinstance(depends_on, str) else depends_on or []:
+            if isinstance(target, str):
+                yield 'DependsOn', target, path + ('DependsOn',)
+
+    # an entry is a value, its key and the entry of its parent, so that a path is built only for references.
+    stack = [(attrs, None, None)]
+    while stack:
+        entry = stack.pop()
+        value = entry[0]
+        if isinstance(value, dict):
+            if len(value) == 1:
+                name, argument = next(iter(value.items()))
+                found = []
+                if name == 'Ref' and isinstance(argument, str):
+                    found.append(('Ref', argument))
+                elif name == 'Condition' and isinstance(argument, str) and entry[2] is not None:
+                    found.append(('Condition', argument))
+                elif name == 'Fn::GetAtt':
+                    target = argument.split('.', 1)[0] if isinstance(argument, str) else \
+                        argument[0] if isinstance(argument, list) and argument else None
+                    if isinstance(target, str):
+                        found.append(('Fn::GetAtt', target))
+                elif name == 'Fn::FindInMap' and isinstance(argument, list) and argument and \
+                        isinstance(argument[0], str):
+                    found.append(('Fn::FindInMap', argument[0]))
+                elif name == 'Fn::If' and isinstance(argument, list) and argument and isinstance(argument[0], str):
+                    found.append(('Condition', argument[0]))
+                elif name == 'Fn::Sub':
+                    found.extend(_sub_references(argument))
+                if found:
+                    argument_path = _path_of(entry, path) + (name,)
+                    for kind, target in found:
+                        yield kind, target, argument_path
+            for key, item in reversed(list(value.items())):
+                if isinstance(item, (dict, list, tuple)):
+                    stack.append((item, key, entry))
+        elif isinstance(value, (list, tuple)):
+            for index in range(len(value) - 1, -1, -1):
+                if isinstance(value[index], (dict, list, tuple)):
+                    stack.append((value[index], index, entry))
+
+
+def _path_of(entry: Tuple[Any, Any, Any], path: Tuple[Any, ...]) -> Tuple[Any, ...]:
+    keys = []
+    while entry[2] is not None:
+        keys.append(entry[1])
+        entry = entry[2]
+    keys.reverse()
+    return path + tuple(keys)
+
+
+def element_references(section_name: str, element: dsl.Element) -> List[Reference]:
+    """Return references of an element to other elements.
+
+    The references are cached on the element, and reused until the element (or a value in it) is modified.
+
+    Args:
+        section_name: A name of a top level section of the element.
+
+        element: An element of a template.
+
+    Returns:
+        A list of references, paths of which begin with the section name.
+
+    """
+    def find(target: dsl.Element) -> List[Reference]:
+        fragment = {}
+        target.to_template(fragment)
+        references = []
+        for name, attrs in list(fragment.items()):
+            references.extend(iter_references(attrs, (section_name, name)))
+        return references
+
+    if section_name not in REFERRING_SECTIONS:
+        return []
+    return element.cached(REFERENCES_KEY, find)
+
+
+class ReferenceGraph(object):
+    """This class holds references between elements of a template, which are nodes identified by section and name.
+
+    The graph is built in one traversal of a template, and every query takes time linear in its size at most.
+    References to pseudo parameters are not edges, and references whose target is not declared are kept
+    in `unresolved`, as well as all references in `references`.
+
+    Args:
+        template: A template builder.
+
+    """
+
+    def __init__(self, template: dsl.Template):
+        self.nodes = []  # type: List[Node]
+        self.references = []  # type: List[Tuple[Node, str, str, Tuple[Any, ...]]]
+        self.unresolved = []  # type: List[Tuple[Node, str, str, Tuple[Any, ...]]]
+        self._dependencies = {}  # type: Dict[Node, Dict[Node, None]]
+        self._dependents = {}  # type: Dict[Node, Dict[Node, None]]
+
+        names = {}  # type: Dict[str, Dict[str, None]]
+        entries = []
+        for section_name, elements in list(template.elements.items()):
+            declared = names.setdefault(section_name, {})
+            for element in elements:
+                declared[element.name] = None
+                node = (section_name, element.name)
+                if node not in self._dependencies:
+                    self.nodes.append(node)
+                    self._dependencies[node] = {}
+                    self._dependents[node] = {}
+                entries.append((section_name, element))
+
+        for section_name, element in entries:
+            for kind, target_name, path in element_references(section_name, element):
+                source = (path[0], path[1])
+                self.references.append((source, kind, target_name, path))
+                if kind in ('Ref', 'Fn::Sub') and target_name in PSEUDO_PARAMETERS:
+                    continue
+                target = self.resolve(kind, target_name, names)
+                if target is None:
+                    self.unresolved.append((source, kind, target_name, path))
+                else:
+                    self._dependencies[source][target] = None
+                    self._dependents[target][source] = None
+
+    @staticmethod
+    def resolve(kind: str, target_name: str, names: Dict[str, Dict[str, None]]) -> Node:
+        """Return a node which a reference of `kind` to `target_name` refers to, or `None` if not declared."""
+        for section_name in TARGET_SECTIONS[kind]:
+            if target_name in names.get(section_name, ()):
+                return section_name, target_name
+        return None
+
+    def dependencies(self, node: Node) -> List[Node]:
+        """Return nodes which a node refers to."""
+        return list(self._dependencies[node])
+
+    def dependents(self, node: Node) -> List[Node]:
+        """Return nodes which refer to a node."""
+        return list(self._dependents[node])
+
+    def edges(self) -> Iterator[Tuple[Node, Node]]:
+        """Return an iterator of pairs of a node and a node which it refers to."""
+        for source in self.nodes:
+            for target in self._dependencies[source]:
+                yield source, target
+
+    def topological_order(self) -> List[Node]:
+        """Return nodes in order where every node comes after nodes which it refers to, by Kahn's algorithm.
+
+        Raises:
+            ValueError: If nodes refer to each other cyclically.
+
+        """
+        in_degrees = {node: len(self._dependencies[node]) for node in self.nodes}
+        ready = [node for node in self.nodes if in_degrees[node] == 0]
+        ready.reverse()
+        order = []
+        while ready:
+            node = ready.pop()
+            order.append(node)
+            for dependent in self._dependents[node]:
+                in_degrees[dependent] -= 1
+                if in_degrees[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(order) < len(self.nodes):
+            raise ValueError('elements refer to each other cyclically. cycles: %s' % ', '.join(
+                ['[%s]' % ', '.join(['/'.join(node) for node in cycle]) for cycle in self.cycles()]))
+        return order
+
+    def cycles(self) -> List[List[Node]]:
+        """Return groups of nodes which refer to each other, which are strongly connected components of the graph.
+
+        The components are found by Tarjan's algorithm without recursion, so that long chains are handled as well.
+
+        Returns:
+            A list of groups, each of which has more than one node or a node referring to itself.
+
+        """
+        indices = {}  # type: Dict[Node, int]
+        low_links = {}  # type: Dict[Node, int]
+        on_stack = set()
+        stack = []  # type: List[Node]
+        components = []  # type: List[List[Node]]
+
+        for root in self.nodes:
+            if root in indices:
+                continue
+            work = [(root, iter(self._dependencies[root]))]
+            indices[root] = low_links[root] = len(indices)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, targets = work[-1]
+                advanced = False
+                for target in targets:
+                    if target not in indices:
+                        indices[target] = low_links[target] = len(indices)
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(self._dependencies[target])))
+                        advanced = True
+                        break
+                    if target in on_stack:
+                        low_links[node] = min(low_links[node], indices[target])
+                if advanced:
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low_links[parent] = min(low_links[parent], low_links[node])
+                if low_links[node] == indices[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    component.reverse()
+                    if len(component) > 1 or node in self._dependencies[node]:
+                        components.append(component)
+        return components
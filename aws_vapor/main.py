@@ -8,12 +8,33 @@ import sys
 import aws_vapor.meta as meta
 
 
+class LazyCommandManager(CommandManager):
+    """This class finds commands without importing their modules until one of them is run.
+
+    :class:`cliff.commandmanager.CommandManager` imports the modules of all commands on startup,
+    so that running a command pays for the imports of all other commands.
+    """
+
+    def load_commands(self, namespace: str):
+        try:
+            from importlib.metadata import entry_points
+        except ImportError:
+            return super(LazyCommandManager, self).load_commands(namespace)
+
+        self.group_list.append(namespace)
+        found = entry_points()
+        found = found.select(group=namespace) if hasattr(found, 'select') else found.get(namespace, [])
+        for entry_point in found:
+            cmd_name = entry_point.name.replace('_', ' ') if self.convert_underscores else entry_point.name
+            self.commands[cmd_name] = entry_point
+
+
 class CliApp(App):
     def __init__(self):
         super(CliApp, self).__init__(
             description='Generates AWS CloudFormation template from python object',
             version=meta.version,
-            command_manager=CommandManager('aws_vapor.command'),
+            command_manager=LazyCommandManager('aws_vapor.command'),
         )
 
 
@@ -0,0 +1,568 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Callable, Dict, List, Tuple
+
+from aws_vapor import analyzer, dsl, encoder, graph
+
+import re
+
+STACK_TYPE = 'AWS::CloudFormation::Stack'
+STACK_PREFIX = 'Stack'
+DEFAULT_FILL = 0.8
+
+_SUB_VARIABLE = re.compile(r'\$\{([^!}][^}]*)\}')
+_NON_ALPHANUMERIC = re.compile(r'[^A-Za-z0-9]')
+
+NestedStack = Tuple[str, dsl.Template]
+Value = Tuple[str, str]
+
+
+def _postorder(names: List[str], dependencies: Callable[[str], List[str]]) -> List[str]:
+    """Return names in depth-first postorder of their dependencies, so that every name comes after its dependencies."""
+    visited = set()
+    order = []
+    for root in names:
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, iter(dependencies(root)))]
+        while stack:
+            name, targets = stack[-1]
+            for target in targets:
+                if target not in visited:
+                    visited.add(target)
+                    stack.append((target, iter(dependencies(target))))
+                    break
+            else:
+                stack.pop()
+                order.append(name)
+    return order
+
+
+def assign_resources(reference_graph: graph.ReferenceGraph, sizes: Dict[str, int],
+                     max_resources: int = analyzer.DEFAULT_MAX_RESOURCES, max_bytes: int = analyzer.DEFAULT_MAX_BYTES,
+                     fill: float = DEFAULT_FILL, values: Dict[graph.Node, Dict[Value, None]] = None,
+                     max_parameters: int = analyzer.DEFAULT_MAX_PARAMETERS,
+                     max_outputs: int = analyzer.DEFAULT_MAX_OUTPUTS) -> List[List[str]]:
+    """Assign resources to groups within limits, cutting as few references between groups as possible.
+
+    Resources connected by references are kept in a group if they fit in it, and groups are filled first-fit.
+    A set of connected resources exceeding limits is cut in depth-first postorder of references,
+    so that a resource refers only to resources in the same group or in former groups.
+
+    Parameters of a group are parameters of the template which its resources refer to, directly or through
+    conditions, and values of resources in other groups, which are passed as parameters.
+    Outputs of a group are values of its resources referred to from other groups or from outputs of the template.
+    Since resources are assigned in order, outputs of a group count values referred to by resources
+    which are not assigned to it yet, so that a group is closed before resources referring to it overflow its outputs.
+
+    Args:
+        reference_graph: A graph of a template.
+
+        sizes: A mapping of a logical name of a resource to its encoded size in bytes.
+
+        max_resources: A maximum number of resources in a group. If 0, the number is not limited.
+
+        max_bytes: A maximum size of a template of a group in bytes. If 0, the size is not limited.
+
+        fill: A ratio of `max_bytes` filled with resources, leaving the rest to parameters, conditions and outputs.
+
+        values: Values of resources which resources and outputs refer to, as :func:`referred_values` returns.
+            If `None`, every resource referred to is counted as one value.
+
+        max_parameters: A maximum number of parameters of a group. If 0, the number is not limited.
+
+        max_outputs: A maximum number of outputs of a group. If 0, the number is not limited.
+
+    Returns:
+        Groups of logical names of resources.
+
+    """
+    resources = [name for section_name, name in reference_graph.nodes if section_name == 'Resources']
+    positions = {name: position for position, name in enumerate(resources)}
+
+    # union-find, whose root is the first declared resource of each set
+    roots = {name: name for name in resources}
+
+    def find(name: str) -> str:
+        root = name
+        while roots[root] != root:
+            root = roots[root]
+        while roots[name] != root:
+            roots[name], name = root, roots[name]
+        return root
+
+    for source, target in reference_graph.edges():
+        if source[0] == 'Resources' and target[0] == 'Resources':
+            root_1, root_2 = find(source[1]), find(target[1])
+            if root_1 != root_2:
+                if positions[root_1] > positions[root_2]:
+                    root_1, root_2 = root_2, root_1
+                roots[root_2] = root_1
+
+    components = {}  # type: Dict[str, List[str]]
+    for name in resources:
+        components.setdefault(find(name), []).append(name)
+
+    if values is None:
+        values = {node: {(target[1], None): None for target in reference_graph.dependencies(node)
+                         if target[0] == 'Resources'}
+                  for node in reference_graph.nodes if node[0] in ('Resources', 'Outputs')}
+
+    # values which each resource refers to, resources referring to each value, and values each resource owns
+    referred = {}  # type: Dict[str, List[Value]]
+    referrers = {}  # type: Dict[Value, List[str]]
+    owned = {}  # type: Dict[str, Dict[Value, None]]
+    exported = {}  # type: Dict[Value, None]
+    for (section_name, name), found in list(values.items()):
+        for value in found:
+            if value[0] not in roots or (section_name, value[0]) == ('Resources', name):
+                continue
+            owned.setdefault(value[0], {})[value] = None
+            if section_name == 'Outputs':
+                exported[value] = None
+            else:
+                referred.setdefault(name, []).append(value)
+                referrers.setdefault(value, []).append(name)
+
+    def parameters_of(name: str) -> Dict[str, None]:
+        parameters = {}
+        visited = set()
+        pending = [('Resources', name)]
+        while pending:
+            for dependency in reference_graph.dependencies(pending.pop()):
+                if dependency[0] == 'Parameters':
+                    parameters[dependency[1]] = None
+                elif dependency[0] == 'Conditions' and dependency not in visited:
+                    visited.add(dependency)
+                    pending.append(dependency)
+        return parameters
+
+    byte_budget = int(max_bytes * fill)
+    # a group is logical names, a number and a size of its resources, its parameters,
+    # and its outputs mapped to numbers of resources outside of it and outputs of the template referring to them
+    group_of = {}  # type: Dict[str, List[Any]]
+
+    def fits(group: List[Any], count: int, size: int, parameters: int, outputs: int) -> bool:
+        return (not max_resources or group[1] + count <= max_resources) and \
+            (not byte_budget or group[2] + size <= byte_budget) and \
+            (not max_parameters or len(group[3]) + parameters <= max_parameters) and \
+            (not max_outputs or outputs <= max_outputs)
+
+    def dependencies(name: str) -> List[str]:
+        return [target for section_name, target in reference_graph.dependencies(('Resources', name))
+                if section_name == 'Resources']
+
+    groups = []  # type: List[List[Any]]
+    for members in list(components.values()):
+        size = sum([sizes.get(name, 0) for name in members])
+        # every value referred to by a resource of the set is owned by the set
+        parameters = {}  # type: Dict[Any, None]
+        outputs = {}  # type: Dict[Value, int]
+        for name in members:
+            parameters.update(parameters_of(name))
+            outputs.update({value: 1 for value in owned.get(name, ()) if value in exported})
+
+        def fits_members(group: List[Any]) -> bool:
+            return fits(group, len(members), size, len([key for key in parameters if key not in group[3]]),
+                        len(group[4]) + len(outputs))
+
+        if fits_members([None, 0, 0, {}, {}]):
+            for group in groups:
+                if fits_members(group):
+                    break
+            else:
+                group = [[], 0, 0, {}, {}]
+                groups.append(group)
+            group[0].extend(members)
+            group[1] += len(members)
+            group[2] += size
+            group[3].update(parameters)
+            group[4].update(outputs)
+            for name in members:
+                group_of[name] = group
+            continue
+
+        group = None
+        for name in _postorder(members, dependencies):
+            candidates = [group, [[], 0, 0, {}, {}]] if group is not None else [[[], 0, 0, {}, {}]]
+            for candidate in candidates:
+                parameters = {key: None for key in parameters_of(name) if key not in candidate[3]}
+                parameters.update({value: None for value in referred.get(name, ())
+                                   if group_of.get(value[0]) is not candidate and value not in candidate[3]})
+                # values of the group which the resource refers to are no longer referred to from outside of it,
+                # and values of the resource are referred to from resources outside of the group and outputs
+                released = [value for value in referred.get(name, ())
+                            if group_of.get(value[0]) is candidate and candidate[4].get(value) == 1]
+                outputs = {}  # type: Dict[Value, int]
+                for value in owned.get(name, ()):
+                    count = len([referrer for referrer in referrers.get(value, ())
+                                 if referrer != name and group_of.get(referrer) is not candidate])
+                    count += 1 if value in exported else 0
+                    if count:
+                        outputs[value] = count
+                if candidate[1] == 0 or fits(candidate, 1, sizes.get(name, 0), len(parameters),
+                                             len(candidate[4]) + len(outputs) - len(released)):
+                    break
+            if candidate is not group:
+                group = candidate
+                groups.append(group)
+            group[0].append(name)
+            group[1] += 1
+            group[2] += sizes.get(name, 0)
+            group[3].update(parameters)
+            for value in referred.get(name, ()):
+                if group_of.get(value[0]) is group and value in group[4]:
+                    group[4][value] -= 1
+                    if not group[4][value]:
+                        del group[4][value]
+            group[4].update(outputs)
+            group_of[name] = group
+    return [group[0] for group in groups]
+
+
+def _update(root: Dict[str, Any], keys: Tuple[Any, ...], function: Callable[[Any], Any], copied: Dict[int, Any]):
+    """Replace a value at `keys` in `root` with a return value of `function`, copying containers on the way.
+
+    Containers in `copied` are already copies, which are modified in place.
+    """
+    container = root
+    for key in keys[:-1]:
+        item = container[key]
+        if id(item) not in copied:
+            item = list(item) if isinstance(item, (list, tuple)) else dict(item)
+            copied[id(item)] = item
+            container[key] = item
+        container = item
+    container[keys[-1]] = function(container[keys[-1]])
+
+
+def _rewrite_sub(intrinsic: Dict[str, Any], replace: Callable[[str, str], str]) -> Dict[str, Any]:
+    argument = intrinsic['Fn::Sub']
+    if isinstance(argument, (list, tuple)) and len(argument) == 2 and isinstance(argument[1], dict):
+        text, variables = argument
+    else:
+        text, variables = argument, None
+    if not isinstance(text, str):
+        return intrinsic
+
+    def substitute(match) -> str:
+        name = match.group(1).strip()
+        if name in (variables or {}) or name.startswith('AWS::'):
+            return match.group(0)
+        resource, _, attribute = name.partition('.')
+        replaced = replace(resource, attribute or None)
+        return match.group(0) if replaced is None else '${%s}' % replaced
+
+    text = _SUB_VARIABLE.sub(substitute, text)
+    return {'Fn::Sub': text if variables is None else [text, variables]}
+
+
+def _get_att(argument: Any) -> Tuple[str, str]:
+    if isinstance(argument, str):
+        resource, _, attribute = argument.partition('.')
+    else:
+        resource, attribute = argument[0], argument[1] if len(argument) > 1 else None
+    if not isinstance(attribute, str):
+        raise ValueError('an attribute given by a function can not be referred to from another stack. '
+                         'resource: %r' % resource)
+    return resource, attribute
+
+
+def _passed_value(parameter: dsl.Element) -> Dict[str, Any]:
+    """Return a value passing a parameter of a parent stack to a nested stack, which takes lists as strings."""
+    parameter_type = parameter.attrs.get('Type', '')
+    if parameter_type == 'CommaDelimitedList' or parameter_type.startswith('List<'):
+        return {'Fn::Join': [',', {'Ref': parameter.name}]}
+    return {'Ref': parameter.name}
+
+
+def _value_at(attrs: Any, keys: Tuple[Any, ...]) -> Any:
+    for key in keys:
+        attrs = attrs[key]
+    return attrs
+
+
+def referred_values(template: dsl.Template) -> Dict[graph.Node, Dict[Value, None]]:
+    """Return values of resources which each resource and output of a template refers to.
+
+    A value is a pair of a logical name of a resource and a name of its attribute, or `None` for `Ref`,
+    each of which is passed through an output and a parameter if it is referred to from another child template.
+
+    Args:
+        template: A template builder.
+
+    Returns:
+        A mapping of a node of a resource or an output to values which it refers to.
+
+    """
+    names = {}  # type: Dict[str, Dict[str, None]]
+    for section_name, section in list(template.elements.items()):
+        names[section_name] = {element.name: None for element in section}
+
+    def is_resource(kind: str, target_name: str) -> bool:
+        if kind in ('Ref', 'Fn::Sub') and target_name in graph.PSEUDO_PARAMETERS:
+            return False
+        target = graph.ReferenceGraph.resolve(kind, target_name, names)
+        return target is not None and target[0] == 'Resources'
+
+    values = {}  # type: Dict[graph.Node, Dict[Value, None]]
+    for section_name in ('Resources', 'Outputs'):
+        for element in template.elements.get(section_name, []):
+            found = values.setdefault((section_name, element.name), {})
+
+            def add(resource: str, attribute: str) -> str:
+                if is_resource('Ref' if attribute is None else 'Fn::GetAtt', resource):
+                    found[(resource, attribute)] = None
+                return None
+
+            for kind, target_name, path in graph.element_references(section_name, element):
+                if kind not in ('Ref', 'Fn::GetAtt', 'Fn::Sub') or not is_resource(kind, target_name):
+                    continue
+                if path[-1] == 'Fn::Sub':
+                    _rewrite_sub(_value_at(element.attrs, path[2:-1]), add)
+                elif kind == 'Ref':
+                    found[(target_name, None)] = None
+                else:
+                    try:
+                        found[_get_att(_value_at(element.attrs, path[2:]))] = None
+                    except ValueError:
+                        pass  # which :func:`partition` raises if the resource is in another child template
+    return values
+
+
+def partition(template: dsl.Template, template_url: Callable[[str], str],
+              max_resources: int = analyzer.DEFAULT_MAX_RESOURCES, max_bytes: int = analyzer.DEFAULT_MAX_BYTES,
+              report: analyzer.SizeReport = None, fill: float = DEFAULT_FILL,
+              encoding: encoder.Encoding = encoder.DEFAULT_ENCODING,
+              max_parameters: int = analyzer.DEFAULT_MAX_PARAMETERS,
+              max_outputs: int = analyzer.DEFAULT_MAX_OUTPUTS) -> Tuple[dsl.Template, List[NestedStack]]:
+    """Split resources of a template into nested stacks, each of which is within limits.
+
+    Resources are assigned to child templates by :func:`assign_resources`. Each child template has parameters,
+    mappings and conditions which its resources refer to, and a reference to a resource in another child template
+    is passed through an output of the child template and a parameter of the referring one.
+    A parent template has `AWS::CloudFormation::Stack` resources of the child templates instead of the resources,
+    and parameters, mappings, conditions and outputs of the template, outputs of which refer to the child templates.
+    Pseudo parameters such as `AWS::StackName` in the child templates refer to the nested stacks.
+
+    Elements which are not modified are shared with the template, so that their encoded forms are reused.
+
+    Args:
+        template: A template builder.
+
+        template_url: A function which takes a logical name of a nested stack and returns a URL of its template.
+
+        max_resources: A maximum number of resources in a child template. If 0, the number is not limited.
+
+        max_bytes: A maximum size of a child template in bytes. If 0, the size is not limited.
+
+        report: A report of sizes of the template by :func:`aws_vapor.analyzer.analyze`, which is measured if `None`.
+
+        fill: A ratio of `max_bytes` filled with resources, as :func:`assign_resources` takes.
+
+        encoding: A style of templates, with which sizes are measured.
+
+        max_parameters: A maximum number of parameters of a child template. If 0, the number is not limited.
+
+        max_outputs: A maximum number of outputs of a child template. If 0, the number is not limited.
+
+    Returns:
+        A parent template, and a list of a logical name of a nested stack and its child template.
+
+    Raises:
+        ValueError: If an attribute given by an intrinsic function is referred to from another child template.
+
+    """
+    if report is None:
+        report = analyzer.analyze(template, encoding)
+    sizes = {name: size for section_name, name, size in report.elements if section_name == 'Resources'}
+    reference_graph = graph.ReferenceGraph(template)
+    groups = assign_resources(reference_graph, sizes, max_resources, max_bytes, fill, referred_values(template),
+                              max_parameters, max_outputs)
+
+    names = {}  # type: Dict[str, Dict[str, None]]
+    elements = {}  # type: Dict[graph.Node, dsl.Element]
+    taken = set()
+    for section_name, section in list(template.elements.items()):
+        for element in section:
+            names.setdefault(section_name, {})[element.name] = None
+            elements[(section_name, element.name)] = element
+            taken.add(element.name)
+
+    def unique(name: str) -> str:
+        candidate, suffix = name, 2
+        while candidate in taken:
+            candidate, suffix = '%s%d' % (name, suffix), suffix + 1
+        taken.add(candidate)
+        return candidate
+
+    stack_names = [unique('%s%d' % (STACK_PREFIX, index + 1)) for index in range(len(groups))]
+    stack_of = {name: stack_name for stack_name, group in zip(stack_names, groups) for name in group}
+    exports = {}  # type: Dict[Tuple[str, str], str]
+    child_outputs = {stack_name: {} for stack_name in stack_names}  # type: Dict[str, Dict[str, Any]]
+
+    def export(resource: str, attribute: str) -> str:
+        key = (resource, attribute)
+        if key not in exports:
+            if attribute is None:
+                exports[key] = resource
+                value = {'Ref': resource}
+            else:
+                exports[key] = unique(resource + _NON_ALPHANUMERIC.sub('', attribute))
+                value = {'Fn::GetAtt': [resource, attribute]}
+            child_outputs[stack_of[resource]][exports[key]] = value
+        return exports[key]
+
+    def resolve(kind: str, target_name: str) -> graph.Node:
+        if kind in ('Ref', 'Fn::Sub') and target_name in graph.PSEUDO_PARAMETERS:
+            return None
+        return reference_graph.resolve(kind, target_name, names)
+
+    children = []
+    stacks = []
+    for stack_name, group in zip(stack_names, groups):
+        needed = {}  # type: Dict[graph.Node, None]
+        imports = {}  # type: Dict[str, Any]
+        depends_on = {}  # type: Dict[str, None]
+        resources = []
+
+        def import_value(resource: str, attribute: str) -> str:
+            name = export(resource, attribute)
+            imports[name] = {'Fn::GetAtt': [stack_of[resource], 'Outputs.%s' % name]}
+            return name
+
+        def replace_in_sub(resource: str, attribute: str) -> str:
+            if stack_of.get(resource, stack_name) == stack_name:
+                return None
+            name = import_value(resource, attribute)
+            return None if attribute is None else name
+
+        def replace_get_att(intrinsic: Dict[str, Any]) -> Dict[str, Any]:
+            return {'Ref': import_value(*_get_att(intrinsic['Fn::GetAtt']))}
+
+        for name in group:
+            element = elements[('Resources', name)]
+            rewrites = []
+            remote_dependencies = {}  # type: Dict[str, None]
+            for kind, target_name, path in graph.element_references('Resources', element):
+                target = resolve(kind, target_name)
+                if target is None:
+                    continue
+                if target[0] != 'Resources':
+                    needed[target] = None
+                    continue
+                if stack_of[target_name] == stack_name:
+                    continue
+                if kind == 'DependsOn':
+                    remote_dependencies[target_name] = None
+                    depends_on[stack_of[target_name]] = None
+                elif path[-1] == 'Fn::Sub':
+                    rewrites.append((path[2:-1], lambda intrinsic: _rewrite_sub(intrinsic, replace_in_sub)))
+                elif kind == 'Ref':
+                    import_value(target_name, None)
+                else:
+                    rewrites.append((path[2:-1], replace_get_att))
+
+            if not rewrites and not remote_dependencies:
+                resources.append(element)
+                continue
+            attrs = dict(element.attrs)
+            copied = {id(attrs): attrs}
+            done = set()
+            for keys, function in rewrites:
+                if keys not in done:
+                    done.add(keys)
+                    _update(attrs, keys, function, copied)
+            if remote_dependencies:
+                dependencies = attrs['DependsOn']
+                dependencies = [dependencies] if isinstance(dependencies, str) else dependencies
+                dependencies = [target for target in dependencies if target not in remote_dependencies]
+                if dependencies:
+                    attrs['DependsOn'] = dependencies if len(dependencies) > 1 else dependencies[0]
+                else:
+                    del attrs['DependsOn']
+            resource = dsl.Resource(name)
+            resource.attrs = attrs
+            resources.append(resource)
+
+        # conditions may refer to parameters, mappings and other conditions
+        pending = [node for node in needed if node[0] == 'Conditions']
+        while pending:
+            for dependency in reference_graph.dependencies(pending.pop()):
+                if dependency not in needed:
+                    needed[dependency] = None
+                    if dependency[0] == 'Conditions':
+                        pending.append(dependency)
+
+        child = dsl.Template(template.version, template.description)
+        parameters = {}
+        for section_name in ('Parameters', 'Mappings', 'Conditions'):
+            section = [element for element in template.elements.get(section_name, [])
+                       if (section_name, element.name) in needed]
+            if section_name == 'Parameters':
+                for element in section:
+                    parameters[element.name] = _passed_value(element)
+                for name in imports:
+                    section.append(dsl.Parameter(name).type('String'))
+                parameters.update(imports)
+            if section:
+                child.elements[section_name] = section
+        child.elements['Resources'] = resources
+        children.append((stack_name, child))
+
+        stack = dsl.Resource(stack_name).type(STACK_TYPE).add_property({'TemplateURL': template_url(stack_name)})
+        if parameters:
+            stack.add_property({'Parameters': parameters})
+        if depends_on:
+            stack.attributes('DependsOn', list(depends_on))
+        stacks.append(stack)
+
+    def replace_in_output_sub(resource: str, attribute: str) -> str:
+        if resource not in stack_of:
+            return None
+        return '%s.Outputs.%s' % (stack_of[resource], export(resource, attribute))
+
+    def replace_in_output(intrinsic: Dict[str, Any]) -> Dict[str, Any]:
+        if 'Ref' in intrinsic:
+            resource, attribute = intrinsic['Ref'], None
+        else:
+            resource, attribute = _get_att(intrinsic['Fn::GetAtt'])
+        return {'Fn::GetAtt': [stack_of[resource], 'Outputs.%s' % export(resource, attribute)]}
+
+    outputs = []
+    for element in template.elements.get('Outputs', []):
+        rewrites = {}
+        for kind, target_name, path in graph.element_references('Outputs', element):
+            target = resolve(kind, target_name)
+            if target is None or target[0] != 'Resources':
+                continue
+            if path[-1] == 'Fn::Sub':
+                rewrites[path[2:-1]] = lambda intrinsic: _rewrite_sub(intrinsic, replace_in_output_sub)
+            else:
+                rewrites[path[2:-1]] = replace_in_output
+        if not rewrites:
+            outputs.append(element)
+            continue
+        attrs = dict(element.attrs)
+        copied = {id(attrs): attrs}
+        for keys, function in list(rewrites.items()):
+            _update(attrs, keys, function, copied)
+        output = dsl.Output(element.name)
+        output.attrs = attrs
+        outputs.append(output)
+
+    for stack_name, child in children:
+        if child_outputs[stack_name]:
+            child.elements['Outputs'] = [dsl.Output(name).value(value)
+                                         for name, value in list(child_outputs[stack_name].items())]
+
+    parent = dsl.Template(template.version, template.description)
+    for section_name, section in list(template.elements.items()):
+        if section_name == 'Resources':
+            parent.elements[section_name] = stacks
+        elif section_name == 'Outputs':
+            parent.elements[section_name] = outputs
+        else:
+            parent.elements[section_name] = list(section)
+    return parent, children
@@ -1,23 +1,69 @@
 # -*- coding: utf-8 -*-
 
-from typing import List, Tuple
-from io import TextIOBase
+from typing import Any, Callable, Iterator, List, Pattern, Set, Tuple
+from io import StringIO, TextIOBase
 
+from collections import OrderedDict
 from contextlib import contextmanager
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-import configparser
+from functools import lru_cache
 
+import builtins
+import importlib.util
 import os
+import re
+import sys
 
 LOCAL_CONFIG_DIRECTORY = CURRENT_DIRECTORY = os.getcwd()
 GLOBAL_CONFIG_DIRECTORY = os.path.expanduser('~/.aws-vapor')
 CONFIG_FILE_NAME = 'config'
+FILE_CACHE_SIZE = 128
+TOKEN_CACHE_SIZE = 256
+
+_config_cache = {}
+_file_cache = OrderedDict()
+_token_cache = OrderedDict()
+_file_recorders = []
+_import_recorders = []
+_builtin_import = None
+
+
+def _config_stamp(config_file: str) -> Tuple[str, int, int]:
+    try:
+        stat = os.stat(config_file)
+    except OSError:
+        return config_file, -1, -1
+    return config_file, stat.st_mtime_ns, stat.st_size
+
+
+def _load_config_files(config_files: Tuple[str, ...]) -> dict:
+    stamps = tuple([_config_stamp(config_file) for config_file in config_files])
+    cached = _config_cache.get(config_files)
+    if cached is not None and cached[0] == stamps:
+        return cached[1]
+
+    props = {}
+
+    import configparser
+    config = configparser.RawConfigParser()
+    config.read(config_files)
+
+    for section in config.sections():
+        for key, value in config.items(section):
+            if section not in props:
+                props[section] = {}
+            props[section][key] = value
+
+    _config_cache[config_files] = (stamps, props)
+    return props
 
 
 def load_from_config_file(config_directories: List[str] = None) -> dict:
     """Load properties from a config file.
 
+    Config files are parsed once and the result is cached in the process until one of them is modified.
+    When config files define the same property, the one in the latter directory takes precedence,
+    that is, `LOCAL_CONFIG_DIRECTORY` overrides `GLOBAL_CONFIG_DIRECTORY` by default.
+
     Args:
         config_directories: A path to config directory having 'config'.
             If not specified, locating 'config' on `GLOBAL_CONFIG_DIRECTORY` and `LOCAL_CONFIG_DIRECTORY`.
@@ -37,18 +83,10 @@ def load_from_config_file(config_directories: List[str] = None) -> dict:
     """
     if config_directories is None:
         config_directories = [GLOBAL_CONFIG_DIRECTORY, LOCAL_CONFIG_DIRECTORY]
-    props = {}
+    config_files = tuple([os.path.join(config_directory, CONFIG_FILE_NAME) for config_directory in config_directories])
 
-    config = configparser.RawConfigParser()
-    config.read([os.path.join(config_directory, CONFIG_FILE_NAME) for config_directory in config_directories])
-
-    for section in config.sections():
-        for key, value in config.items(section):
-            if section not in props:
-                props[section] = {}
-            props[section][key] = value
-
-    return props
+    props = _load_config_files(config_files)
+    return {section: dict(entries) for section, entries in list(props.items())}
 
 
 def get_property_from_config_file(section: str, key: str, default_value: str = None) -> str:
@@ -66,19 +104,33 @@ def get_property_from_config_file(section: str, key: str, default_value: str = N
         or `default_value` if the `section` is not defined or the `key` is not defined.
 
     """
-    props = load_from_config_file()
-    if section not in props:
-        return default_value
+    return get_properties_from_config_file(section, [key], default_value)[key]
 
-    section = props[section]
-    if key not in section:
-        return default_value
 
-    value = section[key]
-    if value is None:
-        return default_value
+def get_properties_from_config_file(section: str, keys: List[str], default_value: str = None) -> dict:
+    """Get property values from a config file at once.
+
+    Args:
+        section: A name of a section.
+
+        keys: Names of properties.
+
+        default_value: A value will be used when a property is not defined.
+
+    Returns:
+        A mapping of each of `keys` to a property value in the `section`,
+        or to `default_value` if the `section` is not defined or the key is not defined.
+
+    """
+    config_files = tuple([os.path.join(config_directory, CONFIG_FILE_NAME)
+                          for config_directory in [GLOBAL_CONFIG_DIRECTORY, LOCAL_CONFIG_DIRECTORY]])
+    entries = _load_config_files(config_files).get(section, {})
 
-    return value
+    values = {}
+    for key in keys:
+        value = entries.get(key)
+        values[key] = default_value if value is None else value
+    return values
 
 
 def save_to_config_file(props: dict, save_on_global: bool = False):
@@ -90,6 +142,7 @@ def save_to_config_file(props: dict, save_on_global: bool = False):
         save_on_global: A flag whether or not a new configuration will be saved globally.
 
     """
+    import configparser
     config = configparser.RawConfigParser()
 
     for section, entries in list(props.items()):
@@ -108,6 +161,195 @@ def save_to_config_file(props: dict, save_on_global: bool = False):
         with open(os.path.join(LOCAL_CONFIG_DIRECTORY, CONFIG_FILE_NAME), mode='wt') as configfile:
             config.write(configfile)
 
+    _config_cache.clear()
+
+
+def _file_stamp(file_path: str) -> Tuple[str, int, int]:
+    absolute_path = os.path.abspath(file_path)
+    for recorder in _file_recorders:
+        recorder.add(absolute_path)
+    stat = os.stat(file_path)
+    return absolute_path, stat.st_mtime_ns, stat.st_size
+
+
+@contextmanager
+def record_file_reads() -> Iterator[Set[str]]:
+    """Record absolute paths of files read by :func:`read_file` and its friends within a `with` block.
+
+    Returns:
+        A context manager yielding a set, to which the paths are added.
+
+    """
+    recorder = set()
+    _file_recorders.append(recorder)
+    try:
+        yield recorder
+    finally:
+        _file_recorders.pop()
+
+
+def _recording_import(name: str, globals: dict = None, locals: dict = None, fromlist: Tuple[str, ...] = (),
+                      level: int = 0):
+    module = _builtin_import(name, globals, locals, fromlist, level)
+    if level > 0:
+        try:
+            name = importlib.util.resolve_name('.' * level + name, (globals or {}).get('__package__') or '')
+        except ValueError:
+            return module
+    parts = name.split('.')
+    names = ['.'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+    names.extend(['%s.%s' % (name, item) for item in fromlist or () if item != '*'])
+    for recorder in _import_recorders:
+        recorder.update(names)
+    return module
+
+
+@contextmanager
+def record_imports() -> Iterator[Set[str]]:
+    """Record names of modules imported within a `with` block, whether or not they have been imported before.
+
+    Names of attributes imported by `from ... import ...` are recorded as if they were submodules.
+
+    Returns:
+        A context manager yielding a set, to which the names are added.
+
+    """
+    global _builtin_import
+    recorder = set()
+    if not _import_recorders:
+        _builtin_import = builtins.__import__
+        builtins.__import__ = _recording_import
+    _import_recorders.append(recorder)
+    try:
+        yield recorder
+    finally:
+        _import_recorders.pop()
+        if not _import_recorders:
+            builtins.__import__ = _builtin_import
+
+
+@contextmanager
+def unload_modules_from(directory: str) -> Iterator[None]:
+    """Unload modules imported from a directory within a `with` block, when the block exits.
+
+    Args:
+        directory: An absolute path to a directory, such as the one of a vaporfile.
+
+    """
+    loaded_modules = set(sys.modules)
+    try:
+        yield
+    finally:
+        for module_name in set(sys.modules) - loaded_modules:
+            module_file = getattr(sys.modules[module_name], '__file__', None) or ''
+            if os.path.dirname(os.path.abspath(module_file)) == directory:
+                del sys.modules[module_name]
+
+
+def _get_from_cache(cache: OrderedDict, key: Any) -> Any:
+    if key not in cache:
+        return None
+    cache.move_to_end(key)
+    return cache[key]
+
+
+def _put_into_cache(cache: OrderedDict, key: Any, value: Any, max_size: int):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_size:
+        cache.popitem(last=False)
+
+
+def read_file(file_path: str) -> str:
+    """Read a file content through a process-wide cache.
+
+    A cached content is used as long as the path, the modification time and the size of the file are not changed.
+    At most `FILE_CACHE_SIZE` file contents are cached, and the least recently used one is evicted first.
+
+    Args:
+        file_path: A path to a file.
+
+    Returns:
+        A file content.
+
+    """
+    stamp = _file_stamp(file_path)
+    content = _get_from_cache(_file_cache, stamp)
+    if content is None:
+        with open(file_path) as fh:
+            content = fh.read()
+        _put_into_cache(_file_cache, stamp, content, FILE_CACHE_SIZE)
+    return content
+
+
+def open_input_file(file_path: str, newline: str = None) -> TextIOBase:
+    """Open an input file, recording it as :func:`read_file` does, so that the build cache notices its modifications.
+
+    Args:
+        file_path: A path to an input file.
+
+        newline: How line endings are translated, as :func:`open` takes.
+
+    Returns:
+        A file descriptor of an input file.
+
+    """
+    _file_stamp(file_path)
+    return open(file_path, newline=newline)
+
+
+def clear_file_cache():
+    """Discard all file contents and tokens cached by :func:`read_file` and its friends."""
+    _file_cache.clear()
+    _token_cache.clear()
+
+
+def _params_key(params: dict) -> str:
+    return repr(sorted([('%s' % k, v) for k, v in list(params.items())], key=lambda item: item[0]))
+
+
+def _get_tokens(key: Any, tokenize: Callable[[], Iterator[Any]]) -> List[Any]:
+    tokens = _get_from_cache(_token_cache, key)
+    if tokens is None:
+        tokens = list(tokenize())
+        _put_into_cache(_token_cache, key, tokens, TOKEN_CACHE_SIZE)
+    return list(tokens)
+
+
+def inject_params_from_file(file_path: str, params: dict) -> List[Any]:
+    """Replace placeholders in a file with parameters through a process-wide cache.
+
+    Args:
+        file_path: A path to a file including placeholders (`{{ ... }}`).
+
+        params: A mapping a name of placeholders to a value.
+
+    Returns:
+        Tokens of a file content replaced placeholders with parameters, as :func:`iter_inject_params` returns.
+
+    """
+    key = ('file', _file_stamp(file_path), _params_key(params))
+    return _get_tokens(key, lambda: iter_inject_params(StringIO(read_file(file_path)), params))
+
+
+def inject_params_to_user_data(files: List[Tuple[str, str]], params: dict) -> List[Any]:
+    """Make a multipart/* message from file contents and replace placeholders in it through a process-wide cache.
+
+    Args:
+        files: Paths to a file and its MIME subtype, as :func:`combine_user_data` takes.
+
+        params: A mapping a name of placeholders to a value.
+
+    Returns:
+        Tokens of a multipart/* message replaced placeholders with parameters,
+        as :func:`iter_inject_params` returns.
+
+    """
+    # a file name as passed is written to a header of the message, so that it is a part of the key as well
+    stamps = tuple([(filename, _file_stamp(filename), format_type) for filename, format_type in files])
+    key = ('user_data', stamps, _params_key(params))
+    return _get_tokens(key, lambda: iter_inject_params(StringIO(combine_user_data(files)), params))
+
 
 def combine_user_data(files: List[Tuple[str, str]]) -> str:
     """Make a multipart/* message from a file content.
@@ -119,11 +361,13 @@ def combine_user_data(files: List[Tuple[str, str]]) -> str:
         A multipart/* message attached a file content to.
 
     """
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
     combined_message = MIMEMultipart()
 
     for filename, format_type in files:
-        with open(filename) as fh:
-            contents = fh.read()
+        contents = read_file(filename)
         sub_message = MIMEText(contents, format_type, 'ascii')
         sub_message.add_header('Content-Disposition', 'attachment; filename="%s"' % filename)
         combined_message.attach(sub_message)
@@ -131,15 +375,16 @@ def combine_user_data(files: List[Tuple[str, str]]) -> str:
     return str(combined_message)
 
 
-def _replace_params(line: str, params: dict) -> List[str]:
-    for k, v in list(params.items()):
-        key = '{{ %s }}' % k
-        if line.find(key) != -1:
-            pos = line.index(key)
-            l_line = line[:pos]
-            r_line = line[pos + len(key):]
-            return _replace_params(l_line, params) + [v] + _replace_params(r_line, params)
-    return [line]
+@lru_cache(maxsize=128)
+def _compile_placeholders(names: Tuple[str, ...]) -> Pattern:
+    alternatives = '|'.join([re.escape(name) for name in names])
+    return re.compile(re.escape('{{ ') + '(' + alternatives + ')' + re.escape(' }}'))
+
+
+def _replace_params(line: str, pattern: Pattern, values: dict) -> List[Any]:
+    tokens = pattern.split(line)
+    tokens[1::2] = [values[name] for name in tokens[1::2]]
+    return tokens
 
 
 def inject_params(lines: str, params: dict) -> List[str]:
@@ -155,13 +400,73 @@ def inject_params(lines: str, params: dict) -> List[str]:
 
     """
     tokens = []
+    if not params:
+        for line in lines.split('\n'):
+            tokens.append(line + '\n')
+        return tokens
+
+    values = {'%s' % k: v for k, v in list(params.items())}
+    pattern = _compile_placeholders(tuple(values))
     for line in lines.split('\n'):
-        line += '\n'
-        for token in _replace_params(line, params):
-            tokens.append(token)
+        tokens.extend(_replace_params(line + '\n', pattern, values))
     return tokens
 
 
+def _iter_lines(input_file: TextIOBase, chunk_size: int) -> Iterator[str]:
+    rest = []
+    while True:
+        chunk = input_file.read(chunk_size)
+        if not chunk:
+            break
+        end = chunk.rfind('\n') + 1
+        if end == 0:
+            rest.append(chunk)
+            continue
+        rest.append(chunk[:end])
+        yield ''.join(rest)
+        rest = [chunk[end:]]
+    rest.append('\n')
+    yield ''.join(rest)
+
+
+def iter_inject_params(input_file: TextIOBase, params: dict, chunk_size: int = 65536) -> Iterator[Any]:
+    """Replace placeholders with parameters while reading a file chunk by chunk.
+
+    Unlike :func:`inject_params`, adjacent strings are coalesced into one,
+    so that tokens are strings and parameter values alternately.
+    The concatenated tokens are the same as those of :func:`inject_params`.
+
+    Args:
+        input_file: A file object of a file content including placeholders (`{{ ... }}`).
+
+        params: A mapping a name of placeholders to a value.
+
+        chunk_size: A number of characters read from `input_file` at once.
+
+    Returns:
+        An iterator of tokens of a file content replaced placeholders with parameters.
+
+    """
+    values = {'%s' % k: v for k, v in list(params.items()) if '\n' not in '%s' % k}
+    pattern = _compile_placeholders(tuple(values)) if values else None
+
+    literals = []
+    for lines in _iter_lines(input_file, chunk_size):
+        for token in (_replace_params(lines, pattern, values) if pattern else [lines]):
+            if isinstance(token, str):
+                if token:
+                    literals.append(token)
+                continue
+            if literals:
+                yield ''.join(literals)
+                literals = []
+            yield token
+
+    literals = ''.join(literals)
+    if literals:
+        yield literals
+
+
 def open_output_file(relative_file_path: str) -> TextIOBase:
     """Open an output file.
 
@@ -188,3 +493,57 @@ def _open_output_file(absolute_file_path: str) -> TextIOBase:
             yield output_file
         finally:
             pass
+
+
+@contextmanager
+def lock_file(file_path: str) -> Iterator[None]:
+    """Hold an exclusive lock of a file within a `with` block, so that other processes wait until it is released.
+
+    Args:
+        file_path: A path to a lock file. It is made with its directory if it doesn't exist.
+
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    with open(file_path, mode='ab') as fh:
+        if os.name == 'nt':
+            import msvcrt
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def write_file_atomically(file_path: str, data: bytes, mode: int = 0o644):
+    """Write data to a file, so that the file is replaced at once and never left half-written.
+
+    Args:
+        file_path: A path to a file. Its directory is made if it doesn't exist.
+
+        data: A file content.
+
+        mode: A permission of the file.
+
+    """
+    import tempfile
+
+    directory = os.path.dirname(os.path.abspath(file_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, mode='wb') as fh:
+            fh.write(data)
+        os.chmod(temporary_path, mode)
+        os.replace(temporary_path, file_path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+from typing import List
+
+from aws_vapor import dsl, graph
+
+# a kind of a reference and what its target should be
+TARGET_KINDS = {
+    'Ref': 'parameter or resource',
+    'Fn::GetAtt': 'resource',
+    'Fn::FindInMap': 'mapping',
+    'Fn::Sub': 'parameter or resource',
+    'Condition': 'condition',
+    'DependsOn': 'resource',
+}
+
+
+class ValidationError(ValueError):
+    """This error is raised when a template has references which AWS CloudFormation would reject."""
+
+
+def validate(template: dsl.Template) -> List[str]:
+    """Find references to undeclared elements and circular references in a template.
+
+    Targets of `Ref`, `Fn::GetAtt`, `Fn::FindInMap`, `Fn::Sub`, `Condition` and `DependsOn` are looked up
+    in indexes of declared parameters, pseudo parameters, mappings, conditions and resources,
+    which :class:`aws_vapor.graph.ReferenceGraph` builds in one traversal of the template.
+
+    Args:
+        template: A template builder.
+
+    Returns:
+        Descriptions of all problems in order of the template, each of which begins with a path to the reference.
+
+    """
+    reference_graph = graph.ReferenceGraph(template)
+
+    problems = []
+    for _, kind, target_name, path in reference_graph.unresolved:
+        problems.append('%s: %s refers to undeclared %s %r' % (
+            '/'.join([str(key) for key in path]), kind, TARGET_KINDS[kind], target_name))
+    for cycle in reference_graph.cycles():
+        problems.append('%s: elements refer to each other cyclically' % ', '.join(['/'.join(node) for node in cycle]))
+    return problems
+
+
+def check_references(template: dsl.Template):
+    """Validate a template and raise an error with all problems if any.
+
+    Args:
+        template: A template builder.
+
+    Raises:
+        ValidationError: If the template has any problem.
+
+    """
+    problems = validate(template)
+    if problems:
+        raise ValidationError('\n'.join(problems))
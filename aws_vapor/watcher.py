@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Callable, Dict, List, Set, Tuple
+from types import CodeType, FunctionType, ModuleType
+
+from aws_vapor import dsl, generator, utils
+
+import logging
+import os
+import sys
+import time
+import traceback
+
+FileStamp = Tuple[int, int]
+
+
+def stamp_of(file_path: str) -> FileStamp:
+    """Return a modification time and a size of a file, or `None` if the file doesn't exist."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def referred_modules(module: ModuleType) -> Set[str]:
+    """Return names of modules which a module refers to, or from which its global values come."""
+    names = set()
+    for value in list(vars(module).values()):
+        if isinstance(value, ModuleType):
+            referred = value.__name__
+        else:
+            referred = getattr(value, '__module__', None)
+        if isinstance(referred, str):
+            names.add(referred)
+    return names
+
+
+def _code_names(code: CodeType) -> Set[str]:
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names |= _code_names(const)
+    return names
+
+
+def code_modules(function: FunctionType) -> Set[str]:
+    """Return names of modules which a function refers to by global names.
+
+    Functions and classes of the function's module which it refers to are followed as well.
+    """
+    names = set()
+    visited = set()
+    pending = [function]
+    while pending:
+        value = pending.pop()
+        if id(value) in visited:
+            continue
+        visited.add(id(value))
+        if isinstance(value, type):
+            pending.extend([getattr(item, '__func__', item) for item in list(vars(value).values())])
+            continue
+        if not isinstance(value, FunctionType):
+            continue
+        global_values = value.__globals__
+        for name in _code_names(value.__code__):
+            if name not in global_values:
+                continue
+            referred = global_values[name]
+            if isinstance(referred, ModuleType):
+                names.add(referred.__name__)
+                continue
+            module_name = getattr(referred, '__module__', None)
+            if not isinstance(module_name, str):
+                continue
+            names.add(module_name)
+            if module_name == value.__module__:
+                pending.append(referred)
+    return names
+
+
+class Watcher(object):
+    """This class regenerates AWS CloudFormation templates whenever files which tasks depend on are modified.
+
+    Dependencies of each task are recorded while generating it. They consist of the vaporfile,
+    modules from the vaporfile's directory and the contrib directory which the task imports or refers to,
+    including recipes, and files read through :mod:`aws_vapor.utils` such as those of `UserData.from_files` and
+    `CfnInitMetadata.Config.files(local_file_path=...)`.
+    When a file is modified, only modules loaded from modified files and modules referring to them are re-imported,
+    and only tasks depending on modified files are regenerated.
+    """
+
+    log = logging.getLogger(__name__)
+
+    def __init__(self, file_path: str, task_names: List[str], contrib: str, recipes: List[str],
+                 output: Callable[[str, dsl.Template], Any], interval: float = 1.0):
+        self.file_path = os.path.abspath(file_path)
+        self.task_names = task_names
+        self.contrib = contrib
+        self.recipes = recipes
+        self.output = output
+        self.interval = interval
+
+        self.dependencies = {}  # type: Dict[str, Set[str]]
+        self.stamps = {}  # type: Dict[str, FileStamp]
+
+    def _project_modules(self) -> Dict[str, str]:
+        return generator.project_modules(self.file_path, self.contrib)
+
+    def generate(self, task_name: str) -> bool:
+        """Generate a template from a task, recording files which the task depends on.
+
+        Returns:
+            `True` if succeeded, otherwise `False`.
+
+        """
+        current_directory = os.getcwd()
+        succeeded = False
+        task = None
+        imports = set()
+        with utils.record_file_reads() as file_reads:
+            try:
+                (vaporfile, task, directory) = generator.load_vaporfile(self.file_path, task_name)
+                os.chdir(directory)
+                with utils.record_imports() as imports:
+                    template = task()
+                    if self.recipes is not None:
+                        generator.apply_recipes(template, self.contrib, self.recipes)
+                self.output(task_name, template)
+                succeeded = True
+            except Exception:
+                self.log.error('failed to generate %s\n%s', task_name, traceback.format_exc())
+            finally:
+                os.chdir(current_directory)
+
+        modules = self._project_modules()
+        dependencies = {self.file_path} | file_reads
+        dependencies |= set([modules[name] for name in self.task_modules(task, imports, modules)])
+        if not succeeded:
+            # keep watching files which the task depended on, so that fixing any of them regenerates the task.
+            dependencies |= self.dependencies.get(task_name, set())
+        self.dependencies[task_name] = dependencies
+        for file_path in dependencies:
+            if file_path not in self.stamps:
+                self.stamps[file_path] = stamp_of(file_path)
+        return succeeded
+
+    def task_modules(self, task: Any, imports: Set[str], modules: Dict[str, str]) -> Set[str]:
+        """Return names of project modules which a task depends on.
+
+        They are modules imported while the task runs, modules which the task refers to by global names,
+        and modules which any of them refers to. The vaporfile, which refers to modules of all tasks, is not followed.
+
+        Args:
+            task: A task, or `None` if the vaporfile failed to be loaded.
+
+            imports: Names of modules imported while the task runs, as :func:`aws_vapor.utils.record_imports` records.
+
+            modules: A mapping of a name of a project module to its source file.
+
+        Returns:
+            Names of project modules.
+
+        """
+        if task is not None and not isinstance(task, FunctionType):
+            return set(modules)
+        vaporfiles = set([name for name, module_file in list(modules.items()) if module_file == self.file_path])
+        referred = imports | (code_modules(task) if task is not None else set())
+        names = set([name for name in referred if name in modules]) - vaporfiles
+        pending = list(names)
+        while pending:
+            for name in referred_modules(sys.modules[pending.pop()]):
+                if name in modules and name not in names and name not in vaporfiles:
+                    names.add(name)
+                    pending.append(name)
+        return names
+
+    def poll(self) -> Set[str]:
+        """Return files modified since the last poll."""
+        modified = set()
+        watched = set()
+        for dependencies in list(self.dependencies.values()):
+            watched.update(dependencies)
+        for file_path in watched:
+            stamp = stamp_of(file_path)
+            if self.stamps.get(file_path) != stamp:
+                self.stamps[file_path] = stamp
+                modified.add(file_path)
+        for file_path in set(self.stamps) - watched:
+            del self.stamps[file_path]
+        return modified
+
+    def unload_modules(self, modified: Set[str]) -> List[str]:
+        """Unload modules loaded from modified files and modules referring to them, so that they are re-imported.
+
+        Returns:
+            Names of unloaded modules.
+
+        """
+        modules = self._project_modules()
+        stale = set([name for name, module_file in list(modules.items()) if module_file in modified])
+
+        changed = True
+        while changed:
+            changed = False
+            for name in set(modules) - stale:
+                if referred_modules(sys.modules[name]) & stale:
+                    stale.add(name)
+                    changed = True
+
+        for name in stale:
+            del sys.modules[name]
+        return sorted(stale)
+
+    def affected_tasks(self, modified: Set[str]) -> List[str]:
+        """Return tasks depending on any of modified files."""
+        return [task_name for task_name in self.task_names if self.dependencies.get(task_name, set()) & modified]
+
+    def regenerate(self, modified: Set[str]) -> List[str]:
+        """Re-import modules and regenerate tasks affected by modified files.
+
+        Returns:
+            Regenerated task names.
+
+        """
+        unloaded = self.unload_modules(modified)
+        if unloaded:
+            self.log.info('re-importing %s', ', '.join(unloaded))
+
+        task_names = self.affected_tasks(modified)
+        for task_name in task_names:
+            started = time.perf_counter()
+            if self.generate(task_name):
+                self.log.info('regenerated %s in %.3fs', task_name, time.perf_counter() - started)
+        return task_names
+
+    def watch(self, cycles: int = None):
+        """Generate all tasks, then poll files and regenerate affected tasks until interrupted.
+
+        Args:
+            cycles: A number of polls before returning. If not specified, polls forever.
+
+        """
+        for task_name in self.task_names:
+            started = time.perf_counter()
+            if self.generate(task_name):
+                self.log.info('generated %s in %.3fs', task_name, time.perf_counter() - started)
+        self.log.info('watching %d files', len(self.stamps))
+
+        while cycles is None or cycles > 0:
+            time.sleep(self.interval)
+            modified = self.poll()
+            if modified:
+                self.log.info('modified %s', ', '.join(sorted(modified)))
+                self.regenerate(modified)
+            if cycles is not None:
+                cycles -= 1
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""Measure structural diffs of synthetic templates by Merkle hashes.
+
+usage: python -m benchmarks.bench_diff [--sizes SIZES ...] [--output FILE]
+
+Every result is written as one JSON object per line. Phases are `file` comparing a generated file with a template,
+`first` comparing two templates, and `again` comparing them after one resource is modified,
+where hashes of the other elements are reused.
+"""
+
+from argparse import ArgumentParser
+from typing import Any, Dict, List
+
+from aws_vapor import differ, generator
+from benchmarks import synthetic
+from json import dumps
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+DEFAULT_SIZES = [1000, 10000]
+
+
+def _diff(old: Any, new: Any) -> int:
+    memo = {}  # type: Dict[int, bytes]
+    if not isinstance(old, dict):
+        old = differ.template_tree(old, memo)
+    new = differ.template_tree(new, memo)
+    return len(list(differ.diff_templates(old, new, memo)))
+
+
+def measure(size: int, heavy_every: int, script_lines: int, work_directory: str) -> List[Dict[str, Any]]:
+    """Compare templates of `size`, one resource of which is modified, and return the results."""
+    output_path = os.path.join(work_directory, 'template-%d.json' % size)
+    old = synthetic.synthesize(size, heavy_every, script_lines)
+    generator.output_template(None, old, output_path)
+    new = synthetic.synthesize(size, heavy_every, script_lines)
+    resource = new.elements['Resources'][size // 2]
+    resource.attributes('Type', 'AWS::EC2::Modified')
+
+    results = []
+    started = time.perf_counter()
+    with open(output_path) as fh:
+        changes = _diff(json.load(fh), new)
+    results.append(('file', time.perf_counter() - started, changes))
+
+    started = time.perf_counter()
+    changes = _diff(old, new)
+    results.append(('first', time.perf_counter() - started, changes))
+
+    resource.attributes('Type', 'AWS::EC2::ModifiedAgain')
+    started = time.perf_counter()
+    changes = _diff(old, new)
+    results.append(('again', time.perf_counter() - started, changes))
+
+    return [{'benchmark': 'diff', 'phase': phase, 'size': size, 'seconds': round(elapsed, 6), 'changes': changes}
+            for phase, elapsed, changes in results]
+
+
+def main(argv=sys.argv[1:]) -> int:
+    parser = ArgumentParser(description='measures structural diffs of synthetic templates')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='numbers of resources, mapping categories and outputs')
+    parser.add_argument('--heavy-every', type=int, default=10,
+                        help='every n-th resource has UserData and cfn-init metadata')
+    parser.add_argument('--script-lines', type=int, default=20,
+                        help='a number of lines of UserData and cfn-init files')
+    parser.add_argument('--output',
+                        help='a file name to which results are written instead of stdout')
+    args = parser.parse_args(argv)
+
+    work_directory = tempfile.mkdtemp(prefix='aws-vapor-bench-')
+    try:
+        results = []
+        for size in args.sizes:
+            results.extend(measure(size, args.heavy_every, args.script_lines, work_directory))
+    finally:
+        shutil.rmtree(work_directory)
+
+    lines = ''.join(['{0}\n'.format(dumps(result)) for result in results])
+    if args.output is None:
+        sys.stdout.write(lines)
+    else:
+        with open(args.output, mode='wt') as fh:
+            fh.write(lines)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
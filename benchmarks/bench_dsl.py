@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+"""Measure build time, serialization time and peak memory of synthetic templates.
+
+usage: python -m benchmarks.bench_dsl [--sizes SIZES ...] [--output FILE] [--baseline FILE]
+
+Every result is written as one JSON object per line. With `--baseline`, results are compared with
+a previous run and the process exits with 1 if a phase got slower or bigger than `--tolerance` allows.
+"""
+
+from typing import Any, Callable, Dict, List, Tuple
+from argparse import ArgumentParser
+
+from aws_vapor import generator, graph, partitioner, validator
+from benchmarks import synthetic
+from json import dumps, loads
+
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+DEFAULT_SIZES = [10, 1000, 10000, 100000]
+
+
+def _run(phase: Callable[[], Any], trace: bool) -> Tuple[Any, float, int]:
+    gc.collect()
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = phase()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace else 0
+    finally:
+        if trace:
+            tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def measure(size: int, heavy_every: int, script_lines: int, work_directory: str) -> List[Dict[str, Any]]:
+    """Run every phase for a template of `size` and return the results.
+
+    Each phase runs twice: once to measure elapsed time, and once under `tracemalloc` to measure
+    a peak of memory allocated during the phase.
+    """
+    output_path = os.path.join(work_directory, 'template-%d.json' % size)
+    phases = [
+        ('intrinsics', lambda _: synthetic.intrinsic_calls(size)),
+        ('cfn_init', lambda _: synthetic.cfn_init_calls(max(size // max(heavy_every, 1), 1), script_lines)),
+        ('build', lambda _: synthetic.synthesize(size, heavy_every, script_lines)),
+        ('to_template', lambda template: template.to_template()),
+        ('graph', lambda template: graph.ReferenceGraph(template).topological_order()),
+        ('validate', lambda template: validator.validate(template)),
+        ('partition', lambda template: partitioner.partition(template, lambda stack_name: stack_name + '.json')),
+        ('serialize', lambda template: generator.output_template(None, template, output_path)),
+        ('reserialize', lambda template: generator.output_template(None, template, output_path)),
+    ]  # type: List[Tuple[str, Callable[[Any], Any]]]
+
+    results = []
+    for trace in (False, True):
+        template = None
+        for index, (name, phase) in enumerate(phases):
+            value, elapsed, peak = _run(lambda: phase(template), trace)
+            if name == 'build':
+                template = value
+            if trace:
+                results[index]['peak_bytes'] = peak
+            else:
+                results.append({'benchmark': 'dsl', 'phase': name, 'size': size, 'seconds': round(elapsed, 6)})
+        results[-1]['output_bytes'] = os.path.getsize(output_path)
+        del template
+    return results
+
+
+def compare(baseline: List[Dict[str, Any]], current: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Return descriptions of phases which got slower or bigger than `tolerance` allows."""
+    previous = {(r['phase'], r['size']): r for r in baseline}
+    regressions = []
+    for result in current:
+        key = (result['phase'], result['size'])
+        if key not in previous:
+            continue
+        for metric in ('seconds', 'peak_bytes'):
+            before, after = previous[key].get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            if after > before * (1 + tolerance):
+                regressions.append('%s/%d: %s %s -> %s (+%.0f%%)' % (
+                    key[0], key[1], metric, before, after, (after / before - 1) * 100))
+    return regressions
+
+
+def main(argv=sys.argv[1:]) -> int:
+    parser = ArgumentParser(description='measures build and serialization of synthetic templates')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='numbers of resources, mapping categories and outputs')
+    parser.add_argument('--heavy-every', type=int, default=10,
+                        help='every n-th resource has UserData and cfn-init metadata')
+    parser.add_argument('--script-lines', type=int, default=20,
+                        help='a number of lines of UserData and cfn-init files')
+    parser.add_argument('--output',
+                        help='a file name to which results are written instead of stdout')
+    parser.add_argument('--baseline',
+                        help='a file name of previous results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='an allowed ratio of regression against the baseline')
+    args = parser.parse_args(argv)
+
+    work_directory = tempfile.mkdtemp(prefix='aws-vapor-bench-')
+    try:
+        results = []
+        for size in args.sizes:
+            results.extend(measure(size, args.heavy_every, args.script_lines, work_directory))
+    finally:
+        shutil.rmtree(work_directory)
+
+    lines = ''.join(['{0}\n'.format(dumps(result)) for result in results])
+    if args.output is None:
+        sys.stdout.write(lines)
+    else:
+        with open(args.output, mode='wt') as fh:
+            fh.write(lines)
+
+    if args.baseline is not None:
+        with open(args.baseline) as fh:
+            baseline = [loads(line) for line in fh if line.strip()]
+        regressions = compare(baseline, results, args.tolerance)
+        for regression in regressions:
+            sys.stderr.write('regression: {0}\n'.format(regression))
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""Measure throughput and output size of encoder backends for pretty-printed and minified templates, and of YAML.
+
+usage: python -m benchmarks.bench_encoder [--sizes SIZES ...] [--backends BACKENDS ...] [--no-yaml] [--repeat N]
+                                         [--output FILE]
+
+Every result is written as one JSON object per line. Backends which are not installed are skipped.
+"""
+
+from typing import Any, Dict, List
+from argparse import ArgumentParser
+
+from aws_vapor import emitter, encoder
+from benchmarks import synthetic
+from json import dumps
+
+import gc
+import sys
+import time
+
+DEFAULT_SIZES = [1000, 10000]
+DEFAULT_REPEAT = 3
+
+
+def available_backends(names: List[str]) -> List[str]:
+    """Return names of backends which can be used."""
+    backends = []
+    for name in names:
+        try:
+            encoder.get_backend(name)
+        except ValueError as e:
+            sys.stderr.write('skipped: {0}\n'.format(e))
+            continue
+        backends.append(name)
+    return backends
+
+
+def measure(size: int, backend: str, minify: bool, repeat: int, heavy_every: int,
+            script_lines: int) -> Dict[str, Any]:
+    """Encode a freshly built template of `size` `repeat` times and return the fastest result.
+
+    A template is built for each run, since encoded elements are cached on the template.
+    A backend `yaml` writes YAML documents instead of JSON ones.
+    """
+    encoding = emitter.YamlEncoding() if backend == 'yaml' else encoder.Encoding(backend, minify)
+    best = None
+    output_bytes = 0
+    for _ in range(repeat):
+        template = synthetic.synthesize(size, heavy_every, script_lines)
+        gc.collect()
+        started = time.perf_counter()
+        document = ''.join(encoder.iterencode(template, encoding))
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        output_bytes = len(document.encode('utf-8'))
+        del template, document
+    return {
+        'benchmark': 'encoder',
+        'backend': backend,
+        'minify': minify,
+        'size': size,
+        'seconds': round(best, 6),
+        'output_bytes': output_bytes,
+        'megabytes_per_second': round(output_bytes / best / 1024 / 1024, 2),
+    }
+
+
+def main(argv=sys.argv[1:]) -> int:
+    parser = ArgumentParser(description='measures throughput and output size of encoder backends')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='numbers of resources, mapping categories and outputs')
+    parser.add_argument('--backends', nargs='+', default=encoder.backend_names(),
+                        help='names of encoder backends')
+    parser.add_argument('--no-yaml', dest='yaml', action='store_false', default=True,
+                        help='a flag whether or not YAML documents are skipped')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help='a number of runs, the fastest of which is reported')
+    parser.add_argument('--heavy-every', type=int, default=10,
+                        help='every n-th resource has UserData and cfn-init metadata')
+    parser.add_argument('--script-lines', type=int, default=20,
+                        help='a number of lines of UserData and cfn-init files')
+    parser.add_argument('--output',
+                        help='a file name to which results are written instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        baseline = None
+        for backend in available_backends(args.backends):
+            for minify in (False, True):
+                result = measure(size, backend, minify, args.repeat, args.heavy_every, args.script_lines)
+                if baseline is None:
+                    baseline = result
+                result['speedup'] = round(baseline['seconds'] / result['seconds'], 2)
+                result['size_ratio'] = round(result['output_bytes'] / baseline['output_bytes'], 3)
+                results.append(result)
+        if args.yaml:
+            result = measure(size, 'yaml', False, args.repeat, args.heavy_every, args.script_lines)
+            result['speedup'] = round(baseline['seconds'] / result['seconds'], 2)
+            result['size_ratio'] = round(result['output_bytes'] / baseline['output_bytes'], 3)
+            results.append(result)
+
+    lines = ''.join(['{0}\n'.format(dumps(result)) for result in results])
+    if args.output is None:
+        sys.stdout.write(lines)
+    else:
+        with open(args.output, mode='wt') as fh:
+            fh.write(lines)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+"""Measure build time, retained memory and encoding time of large mappings built item by item and loaded in bulk.
+
+usage: python -m benchmarks.bench_mapping [--rows ROWS ...] [--columns COLUMNS] [--output FILE]
+
+Every result is written as one JSON object per line.
+"""
+
+from typing import Any, Callable, Dict, List
+from argparse import ArgumentParser
+
+from aws_vapor import encoder
+from aws_vapor.dsl import Mapping
+from aws_vapor.dsl import Template
+from json import dumps
+
+import gc
+import io
+import sys
+import time
+import tracemalloc
+
+DEFAULT_ROWS = [500, 10000]
+DEFAULT_COLUMNS = 40
+
+
+def _key(row: int) -> str:
+    return 'region-%d' % row
+
+
+def _column(column: int) -> str:
+    return 'Key%d' % column
+
+
+def _value(row: int, column: int) -> str:
+    return 'ami-%08x' % (row * 1000 + column)
+
+
+def csv_text(rows: int, columns: int) -> str:
+    lines = [','.join(['Region'] + [_column(c) for c in range(columns)])]
+    for r in range(rows):
+        lines.append(','.join([_key(r)] + [_value(r, c) for c in range(columns)]))
+    return '\n'.join(lines) + '\n'
+
+
+def json_lines_text(rows: int, columns: int) -> str:
+    lines = []
+    for r in range(rows):
+        values = {'Region': _key(r)}
+        for c in range(columns):
+            values[_column(c)] = _value(r, c)
+        lines.append(dumps(values))
+    return '\n'.join(lines) + '\n'
+
+
+def build_items(rows: int, columns: int) -> Mapping:
+    mapping = Mapping('AMI')
+    for r in range(rows):
+        mapping.add_category(_key(r))
+        for c in range(columns):
+            mapping.add_item(_column(c), _value(r, c))
+    return mapping
+
+
+def measure(method: str, build: Callable[[], Mapping], rows: int, columns: int) -> Dict[str, Any]:
+    """Build a mapping, then look up every cell with `find_in_map` and encode it in a template."""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    mapping = build()
+    elapsed = time.perf_counter() - started
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for r in range(rows):
+        mapping.find_in_map(_key(r), _column(r % columns))
+    lookup = time.perf_counter() - started
+
+    template = Template()
+    template.mappings(mapping)
+    started = time.perf_counter()
+    document = ''.join(encoder.iterencode(template, encoder.Encoding('json')))
+    encode = time.perf_counter() - started
+    return {
+        'benchmark': 'mapping',
+        'method': method,
+        'rows': rows,
+        'columns': columns,
+        'seconds': round(elapsed, 6),
+        'retained_bytes': retained,
+        'lookup_seconds': round(lookup, 6),
+        'encode_seconds': round(encode, 6),
+        'output_bytes': len(document),
+    }
+
+
+def main(argv=sys.argv[1:]) -> int:
+    parser = ArgumentParser(description='measures mappings built item by item and loaded in bulk')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS,
+                        help='numbers of top level keys')
+    parser.add_argument('--columns', type=int, default=DEFAULT_COLUMNS,
+                        help='a number of second level keys')
+    parser.add_argument('--output',
+                        help='a file name to which results are written instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = []  # type: List[Dict[str, Any]]
+    for rows in args.rows:
+        csv_source = csv_text(rows, args.columns)
+        json_source = json_lines_text(rows, args.columns)
+        methods = [
+            ('add_item', lambda: build_items(rows, args.columns)),
+            ('from_csv', lambda: Mapping.from_csv('AMI', io.StringIO(csv_source))),
+            ('from_json_lines', lambda: Mapping.from_json_lines('AMI', io.StringIO(json_source))),
+        ]
+        baseline = None
+        for method, build in methods:
+            result = measure(method, build, rows, args.columns)
+            if baseline is None:
+                baseline = result
+            result['speedup'] = round(baseline['seconds'] / result['seconds'], 2)
+            result['memory_ratio'] = round(result['retained_bytes'] / baseline['retained_bytes'], 3)
+            results.append(result)
+
+    lines = ''.join(['{0}\n'.format(dumps(result)) for result in results])
+    if args.output is None:
+        sys.stdout.write(lines)
+    else:
+        with open(args.output, mode='wt') as fh:
+            fh.write(lines)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
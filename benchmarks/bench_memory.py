@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""Measure how many bytes each kind of DSL object occupies.
+
+usage: python -m benchmarks.bench_memory [--count COUNT]
+"""
+
+from typing import Any, Callable, Dict
+from argparse import ArgumentParser
+
+from aws_vapor.dsl import Parameter
+from aws_vapor.dsl import Mapping
+from aws_vapor.dsl import Condition
+from aws_vapor.dsl import Resource
+from aws_vapor.dsl import Output
+from aws_vapor.dsl import Intrinsics
+from aws_vapor.dsl import CfnInitMetadata
+from json import dumps
+
+import gc
+import sys
+import tracemalloc
+
+
+def _parameter(i: int) -> Any:
+    return Parameter('Param%d' % i).type('String').default('value').description('description')
+
+
+def _mapping(i: int) -> Any:
+    return Mapping('Map%d' % i) \
+        .add_category('us-east-1').add_item('AMI', 'ami-00000000').add_item('AZ', 'us-east-1a') \
+        .add_category('us-west-2').add_item('AMI', 'ami-11111111').add_item('AZ', 'us-west-2a')
+
+
+def _condition(i: int) -> Any:
+    return Condition('Cond%d' % i).expression(Intrinsics.fn_equals(Intrinsics.ref('Param'), 'prod'))
+
+
+def _resource(i: int) -> Any:
+    return Resource('Res%d' % i).type('AWS::EC2::Instance').properties([
+        {'ImageId': 'ami-00000000'},
+        {'InstanceType': 't2.micro'},
+        {'SubnetId': Intrinsics.ref('Subnet')}
+    ])
+
+
+def _output(i: int) -> Any:
+    return Output('Out%d' % i).description('description').value(Intrinsics.get_att('Res', 'PublicIp'))
+
+
+def _config(i: int) -> Any:
+    return CfnInitMetadata.Config('config%d' % i) \
+        .packages('yum', 'httpd') \
+        .commands('start', 'service httpd start') \
+        .services('sysvinit', 'httpd', ensure_running=True, enabled=True)
+
+
+FACTORIES = {
+    'Parameter': _parameter,
+    'Mapping': _mapping,
+    'Condition': _condition,
+    'Resource': _resource,
+    'Output': _output,
+    'CfnInitMetadata.Config': _config,
+}  # type: Dict[str, Callable[[int], Any]]
+
+
+def measure(factory: Callable[[int], Any], count: int) -> float:
+    """Return an average number of bytes allocated for an object built by `factory`."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        objects = [factory(i) for i in range(count)]
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del objects
+    return (after - before) / count
+
+
+def main(argv=sys.argv[1:]) -> int:
+    parser = ArgumentParser(description='measures bytes per DSL object')
+    parser.add_argument('--count', type=int, default=10000,
+                        help='a number of objects to build per kind')
+    args = parser.parse_args(argv)
+
+    for kind, factory in list(FACTORIES.items()):
+        result = {'benchmark': 'memory', 'kind': kind, 'count': args.count,
+                  'bytes_per_object': round(measure(factory, args.count), 1)}
+        sys.stdout.write('{0}\n'.format(dumps(result)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+"""Measure cold-start time of each subcommand of the aws-vapor CLI.
+
+usage: python -m benchmarks.bench_startup [--commands NAME ...] [--repeat N] [--budget-ms MS] [--output FILE]
+
+Each subcommand runs in a fresh interpreter under `python -X importtime`. Every result is written as
+one JSON object per line, and the process exits with 1 if a subcommand took longer than `--budget-ms`
+to import its modules or imported a module which it does not use.
+"""
+
+from typing import Any, Dict, List, Tuple
+from argparse import ArgumentParser
+
+from json import dumps, loads
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+VAPORFILE = '''# -*- coding: utf-8 -*-
+
+from aws_vapor.dsl import Template, Parameter, Resource, Intrinsics
+
+
+def generate():
+    t = Template(description='startup benchmark')
+    name = t.parameters(Parameter('Name').type('String'))
+    t.resources(Resource('Bucket').type('AWS::S3::Bucket').properties([
+        {'BucketName': Intrinsics.ref(name)},
+    ]))
+    return t
+'''
+
+# A subcommand, its arguments, its module and modules which it must not import.
+COMMANDS = [
+    ('generate', ['generate', '{work}/vaporfile.py', '--cache-dir', '{work}/cache'], 'aws_vapor.generator',
+     ['concurrent.futures', 'email.mime', 'urllib.request']),
+    ('batch', ['batch', '{work}', '--output-dir', '{work}/output'], 'aws_vapor.batch',
+     ['concurrent.futures', 'email.mime', 'urllib.request']),
+    ('config', ['config', 'list'], 'aws_vapor.configure',
+     ['concurrent.futures', 'email.mime', 'urllib.request']),
+    ('get', ['get', '--help'], 'aws_vapor.downloader',
+     ['concurrent.futures', 'email.mime', 'urllib.request']),
+]  # type: List[Tuple[str, List[str], str, List[str]]]
+
+# A command module is imported explicitly, because `-X importtime` does not report modules
+# imported by `importlib.import_module`, which loads entry points.
+SCRIPT = '''
+import json, sys
+import aws_vapor.main
+import {module}
+try:
+    aws_vapor.main.main({argv!r})
+except SystemExit:
+    pass
+with open({modules_file!r}, mode='wt') as fh:
+    json.dump(sorted(sys.modules), fh)
+'''
+
+DEFAULT_BUDGET_MS = 250.0
+
+
+def parse_import_time(stderr: str) -> int:
+    """Return microseconds spent on importing modules from an output of `python -X importtime`."""
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|', 2)
+        if not cumulative.strip().isdigit() or name.startswith('  '):
+            continue
+        total += int(cumulative)
+    return total
+
+
+def unexpected_modules(modules: List[str], unused: List[str]) -> List[str]:
+    """Return names in `modules` which are any of `unused` or their submodules."""
+    return [module for module in modules
+            if any([module == name or module.startswith(name + '.') for name in unused])]
+
+
+def run_command(argv: List[str], module: str, work_directory: str) -> Tuple[float, int, List[str]]:
+    """Run the aws-vapor CLI with `argv` in a fresh interpreter.
+
+    Returns:
+        Elapsed seconds, microseconds spent on imports and names of imported modules.
+
+    """
+    modules_file = os.path.join(work_directory, 'modules.json')
+    script = SCRIPT.format(module=module, argv=argv, modules_file=modules_file)
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', script], cwd=work_directory,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    elapsed = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError('failed to run %s: %s' % (' '.join(argv), completed.stderr[-1000:]))
+    with open(modules_file) as fh:
+        modules = loads(fh.read())
+    return elapsed, parse_import_time(completed.stderr), modules
+
+
+def measure(name: str, argv: List[str], module: str, unused: List[str], repeat: int,
+            work_directory: str) -> Dict[str, Any]:
+    """Run a subcommand `repeat` times and return the fastest run."""
+    argv = [arg.format(work=work_directory) for arg in argv]
+    runs = [run_command(argv, module, work_directory) for _ in range(repeat)]
+    elapsed, import_us, modules = min(runs, key=lambda run: run[1])
+    return {
+        'benchmark': 'startup',
+        'command': name,
+        'seconds': round(min([run[0] for run in runs]), 6),
+        'import_seconds': round(import_us / 1000000, 6),
+        'modules': len(modules),
+        'unexpected_modules': unexpected_modules(modules, unused),
+    }
+
+
+def check(result: Dict[str, Any], budget_ms: float) -> List[str]:
+    """Return descriptions of why a subcommand starts up too slowly."""
+    problems = []
+    if result['import_seconds'] * 1000 > budget_ms:
+        problems.append('%s: imports took %.1f ms (budget %.1f ms)' % (
+            result['command'], result['import_seconds'] * 1000, budget_ms))
+    if result['unexpected_modules']:
+        problems.append('%s: imported unused modules %s' % (
+            result['command'], ', '.join(result['unexpected_modules'])))
+    return problems
+
+
+def main(argv=sys.argv[1:]) -> int:
+    parser = ArgumentParser(description='measures cold-start time of each subcommand')
+    parser.add_argument('--commands', nargs='+', default=[name for name, _, _, _ in COMMANDS],
+                        choices=[name for name, _, _, _ in COMMANDS],
+                        help='names of subcommands to measure')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='a number of runs of each subcommand, the fastest of which is reported')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help='an allowed time in milliseconds to import modules of each subcommand')
+    parser.add_argument('--output',
+                        help='a file name to which results are written instead of stdout')
+    args = parser.parse_args(argv)
+
+    work_directory = tempfile.mkdtemp(prefix='aws-vapor-bench-')
+    try:
+        with open(os.path.join(work_directory, 'vaporfile.py'), mode='wt') as fh:
+            fh.write(VAPORFILE)
+        results = [measure(name, command_argv, module, unused, args.repeat, work_directory)
+                   for name, command_argv, module, unused in COMMANDS if name in args.commands]
+    finally:
+        shutil.rmtree(work_directory)
+
+    lines = ''.join(['{0}\n'.format(dumps(result)) for result in results])
+    if args.output is None:
+        sys.stdout.write(lines)
+    else:
+        with open(args.output, mode='wt') as fh:
+            fh.write(lines)
+
+    problems = [problem for result in results for problem in check(result, args.budget_ms)]
+    for problem in problems:
+        sys.stderr.write('regression: {0}\n'.format(problem))
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
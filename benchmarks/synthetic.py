@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""Synthesize AWS CloudFormation templates of arbitrary size for benchmarks."""
+
+from typing import Any, Dict, List
+
+from aws_vapor import utils
+from aws_vapor.dsl import Template
+from aws_vapor.dsl import Parameter
+from aws_vapor.dsl import Mapping
+from aws_vapor.dsl import Condition
+from aws_vapor.dsl import Resource
+from aws_vapor.dsl import Output
+from aws_vapor.dsl import Attributes
+from aws_vapor.dsl import Intrinsics
+from aws_vapor.dsl import Pseudos
+from aws_vapor.dsl import UserData
+from aws_vapor.dsl import CfnInitMetadata
+
+REGIONS = ['us-east-1', 'us-east-2', 'us-west-1', 'us-west-2', 'eu-west-1', 'eu-central-1',
+           'ap-northeast-1', 'ap-southeast-1', 'ap-southeast-2', 'sa-east-1']
+
+SCRIPT_LINE = 'echo "{{ name }} in {{ region }} at {{ stack }}" >> /var/log/{{ name }}.log\n'
+
+
+def user_data_script(lines: int) -> str:
+    """Return a shell script with `lines` lines, each of which has three placeholders."""
+    return '#!/bin/bash\n' + SCRIPT_LINE * lines
+
+
+def user_data_params(name: str) -> Dict[str, Any]:
+    return {
+        'name': name,
+        'region': Pseudos.region(),
+        'stack': Pseudos.stack_name(),
+    }
+
+
+def cfn_init_metadata(name: str, script: str) -> Dict[str, Any]:
+    """Return cfn-init metadata having a config set with two configs."""
+    install = CfnInitMetadata.Config('install') \
+        .packages('yum', 'httpd') \
+        .packages('yum', 'php') \
+        .groups('apache', gid=48) \
+        .users('apache', 48, ['apache'], '/var/www') \
+        .sources('/var/www/html', 'https://example.com/%s.tar.gz' % name)
+    configure = CfnInitMetadata.Config('configure') \
+        .files('/etc/%s.sh' % name, content=Intrinsics.join('', utils.inject_params(script, user_data_params(name))),
+               mode='000755', owner='root', group='root') \
+        .commands('01_run', '/etc/%s.sh' % name, cwd='/', ignore_errors=False) \
+        .services('sysvinit', 'httpd', ensure_running=True, enabled=True, files=['/etc/%s.sh' % name])
+    return CfnInitMetadata.of([
+        CfnInitMetadata.Init([CfnInitMetadata.ConfigSet('default', [install, configure])]),
+        CfnInitMetadata.Authentication('S3Access', 'S3').role_name(Intrinsics.ref('InstanceRole')),
+    ])
+
+
+def synthesize(size: int, heavy_every: int = 10, script_lines: int = 50) -> Template:
+    """Build a template with `size` resources, `size` mapping categories and `size` outputs.
+
+    Args:
+        size: A number of resources, of mapping categories and of outputs.
+
+        heavy_every: Every `heavy_every`-th resource gets 'UserData' and cfn-init metadata.
+            If 0, no resource gets them.
+
+        script_lines: A number of lines of a shell script used for 'UserData' and cfn-init metadata.
+
+    Returns:
+        A template builder.
+
+    """
+    t = Template(description='synthetic template having %d resources' % size)
+    script = user_data_script(script_lines)
+
+    env = t.parameters(Parameter('EnvType').type('String').default('test').allowed_values(['prod', 'test']))
+    t.parameters(Parameter('InstanceType').type('String').default('t2.micro'))
+    prod = t.conditions(Condition('IsProd').expression(Intrinsics.fn_equals(Intrinsics.ref(env), 'prod')))
+
+    amis = Mapping('AMI')
+    for i in range(size):
+        amis.add_category('%s-%d' % (REGIONS[i % len(REGIONS)], i)) \
+            .add_item('HVM64', 'ami-%08x' % i) \
+            .add_item('HVMG2', 'ami-%08x' % (i + size))
+    t.mappings(amis)
+
+    for i in range(size):
+        name = 'Instance%d' % i
+        r = t.resources(Resource(name).type('AWS::EC2::Instance').properties([
+            Attributes.of('ImageId', Intrinsics.find_in_map('AMI', Pseudos.region(), 'HVM64')),
+            Attributes.of('InstanceType', Intrinsics.ref('InstanceType')),
+            Attributes.of('SubnetId', Intrinsics.fn_if(prod.name, 'subnet-prod', Pseudos.no_value())),
+            Attributes.of('Tags', [{'Key': 'Name', 'Value': Intrinsics.sub('${AWS::StackName}-%s' % name)}]),
+        ]))
+        if heavy_every and i % heavy_every == 0:
+            r.properties([UserData.of(utils.inject_params(script, user_data_params(name)))])
+            r.metadata(cfn_init_metadata(name, script))
+        if i > 0:
+            r.depends_on(Resource('Instance%d' % (i - 1)))
+
+        t.outputs(Output('%sIp' % name)
+                  .description('public ip of %s' % name)
+                  .value(Intrinsics.get_att(name, 'PublicIp'))
+                  .export(Intrinsics.sub('${AWS::StackName}-%s-ip' % name)))
+
+    return t
+
+
+def intrinsic_calls(size: int) -> List[Any]:
+    """Call every kind of intrinsic function `size` times and return the results."""
+    results = []
+    for i in range(size):
+        name = 'Resource%d' % i
+        results.append(Intrinsics.ref(name))
+        results.append(Intrinsics.get_att(name, 'Arn'))
+        results.append(Intrinsics.find_in_map('AMI', Pseudos.region(), 'HVM64'))
+        results.append(Intrinsics.join('', ['a', Pseudos.stack_name(), 'b']))
+        results.append(Intrinsics.sub('${AWS::StackName}-%s' % name))
+        results.append(Intrinsics.fn_if('IsProd', Pseudos.account_id(), Pseudos.no_value()))
+        results.append(Intrinsics.base64(Intrinsics.select(0, Intrinsics.get_azs(''))))
+    return results
+
+
+def cfn_init_calls(size: int, script_lines: int = 50) -> List[Dict[str, Any]]:
+    """Build cfn-init metadata `size` times and return the results."""
+    script = user_data_script(script_lines)
+    return [cfn_init_metadata('Instance%d' % i, script) for i in range(size)]
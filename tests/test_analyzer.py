@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import nose
+from nose.tools import assert_equal
+from nose.tools import nottest
+from nose.tools import raises
+
+from json import dumps
+
+from aws_vapor.analyzer import LimitExceededError
+from aws_vapor.analyzer import analyze
+from aws_vapor.analyzer import check_limits
+from aws_vapor.dsl import Template
+from aws_vapor.dsl import Parameter
+from aws_vapor.dsl import Resource
+from aws_vapor.dsl import Output
+from aws_vapor.dsl import Intrinsics
+from aws_vapor.encoder import encode_element
+
+
+@nottest
+def new_template(resources=3):
+    t = Template(description='analyzer')
+    t.parameters(Parameter('Name').type('String'))
+    for i in range(resources):
+        t.resources(Resource('Bucket%d' % i).type('AWS::S3::Bucket').properties([
+            {'BucketName': 'x' * (i * 100)},
+        ]))
+    t.outputs(Output('BucketArn').value(Intrinsics.get_att('Bucket0', 'Arn')))
+    return t
+
+
+def test_analyze():
+    t = new_template()
+    report = analyze(t)
+    assert_equal(report.total_bytes, len(dumps(t.to_template(), indent=2, separators=(',', ': '))))
+    assert_equal(report.counts, {'Parameters': 1, 'Resources': 3, 'Outputs': 1})
+    assert_equal(report.largest(2), [
+        ('Resources', 'Bucket2', len(encode_element(t.elements['Resources'][2]))),
+        ('Resources', 'Bucket1', len(encode_element(t.elements['Resources'][1]))),
+    ])
+    assert_equal(sum(report.sections.values()) < report.total_bytes, True)
+    assert_equal(sum([size for section_name, _, size in report.elements if section_name == 'Resources'])
+                 < report.sections['Resources'], True)
+
+
+def test_analyze__empty_section():
+    t = Template()
+    t.resources(Resource('Empty'))
+    report = analyze(t)
+    assert_equal(report.counts, {'Resources': 1})
+    section = '\n  "Resources": {' + encode_element(t.elements['Resources'][0]) + '\n  }'
+    assert_equal(report.sections['Resources'], len(section))
+
+
+def test_violations():
+    report = analyze(new_template())
+    assert_equal(report.violations(0, 0), [])
+    assert_equal(report.violations(report.total_bytes, 3), [])
+    assert_equal(report.violations(100, 2), [
+        'template size %s bytes exceeds 100 bytes' % '{:,}'.format(report.total_bytes),
+        '3 resources exceed 2 resources',
+    ])
+
+
+def test_violations__parameters_and_outputs():
+    report = analyze(new_template())
+    assert_equal(report.violations(0, 0, 1, 1), [])
+    report.counts.update({'Parameters': 201, 'Outputs': 300})
+    assert_equal(report.violations(0, 0), [
+        '201 parameters exceed 200 parameters',
+        '300 outputs exceed 200 outputs',
+    ])
+    assert_equal(report.violations(0, 0, 0, 0), [])
+
+
+def test_format():
+    lines = analyze(new_template()).format(top=1).split('\n')
+    assert_equal(lines[0].startswith('template: '), True)
+    assert_equal(lines[0].endswith(' bytes, 3 resources'), True)
+    assert_equal(lines[1].startswith('  Resources: '), True)
+    assert_equal(lines[-2:][0], 'largest elements:')
+    assert_equal(lines[-1].startswith('  Resources/Bucket2: '), True)
+
+
+@raises(LimitExceededError)
+def test_check_limits__exceeded():
+    check_limits(new_template(), max_resources=2)
+
+
+@raises(LimitExceededError)
+def test_check_limits__outputs_exceeded():
+    t = new_template()
+    t.outputs(Output('BucketName').value(Intrinsics.ref('Bucket0')))
+    check_limits(t, max_outputs=1)
+
+
+def test_check_limits__report_in_error():
+    try:
+        check_limits(new_template(), max_bytes=100)
+    except LimitExceededError as e:
+        assert_equal('largest elements:' in '%s' % e, True)
+        assert_equal('Resources/Bucket2' in '%s' % e, True)
+    else:
+        raise AssertionError('LimitExceededError not raised')
+
+
+if __name__ == '__main__':
+    nose.main(argv=['nosetests', '-s', '-v'], defaultTest=__file__)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+import nose
+from nose.tools import assert_equal
+from nose.tools import nottest
+from nose.tools import raises
+
+import json
+import os
+import shutil
+
+from argparse import Namespace
+
+from aws_vapor.batch import Batch
+from aws_vapor.batch import find_vaporfiles
+from aws_vapor.batch import output_file_path
+from aws_vapor.batch import generate_vaporfiles
+from aws_vapor.utils import CURRENT_DIRECTORY
+
+TOX_TMP_DIR = '.tox/tmp_batch'
+SOURCE_DIR = os.path.join(TOX_TMP_DIR, 'src')
+OUTPUT_DIR = os.path.join(TOX_TMP_DIR, 'out')
+VAPORFILE = '''
+from aws_vapor.dsl import Template
+import common
+
+
+def generate():
+    return Template(description=common.NAME)
+'''
+COMMON = '''
+NAME = %r
+'''
+OTHER_VAPORFILE = '''
+from aws_vapor.dsl import Template
+
+
+def generate():
+    return Template()
+'''
+BROKEN_VAPORFILE = '''
+def generate():
+    raise RuntimeError('broken vaporfile')
+'''
+
+
+def setup():
+    def _(file_path, content):
+        directory = os.path.dirname(file_path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(file_path, mode='wt') as fh:
+            fh.write(content)
+
+    _(os.path.join(SOURCE_DIR, 'a', 'main.py'), VAPORFILE)
+    _(os.path.join(SOURCE_DIR, 'a', 'common.py'), COMMON % 'a')
+    _(os.path.join(SOURCE_DIR, 'b', 'main.py'), VAPORFILE)
+    _(os.path.join(SOURCE_DIR, 'b', 'common.py'), COMMON % 'b')
+    _(os.path.join(SOURCE_DIR, 'b', 'c', 'other.py'), OTHER_VAPORFILE)
+    _(os.path.join(SOURCE_DIR, 'helper.py'), 'def generate_all():\n    pass\n')
+
+
+def teardown():
+    shutil.rmtree(TOX_TMP_DIR)
+
+
+@nottest
+def read_description(*path):
+    with open(os.path.join(OUTPUT_DIR, *path)) as fh:
+        return json.load(fh)['Description']
+
+
+@nottest
+def jobs():
+    directory = os.path.abspath(SOURCE_DIR)
+    return [(file_path, output_file_path(directory, file_path, os.path.abspath(OUTPUT_DIR)))
+            for file_path in find_vaporfiles(directory, 'main.py', 'generate')]
+
+
+def test_find_vaporfiles():
+    directory = os.path.abspath(SOURCE_DIR)
+    assert_equal(
+        find_vaporfiles(directory, '*.py', 'generate'),
+        [os.path.join(directory, 'a', 'main.py'),
+         os.path.join(directory, 'b', 'c', 'other.py'),
+         os.path.join(directory, 'b', 'main.py')]
+    )
+
+
+def test_output_file_path():
+    assert_equal(output_file_path('/src', '/src/a/main.py', '/out'), '/out/a/main.json')
+
+
+def test_generate_vaporfiles__same_module_names_in_one_process():
+    results = list(generate_vaporfiles(jobs(), 'generate', None, None, max_workers=1))
+    assert_equal([error for _, _, error in results], [None, None])
+    assert_equal(read_description('a', 'main.json'), 'a')
+    assert_equal(read_description('b', 'main.json'), 'b')
+    assert_equal(os.getcwd(), CURRENT_DIRECTORY)
+
+
+def test_generate_vaporfiles__worker_processes():
+    results = list(generate_vaporfiles(jobs(), 'generate', None, None, max_workers=2))
+    assert_equal([error for _, _, error in results], [None, None])
+    assert_equal(read_description('a', 'main.json'), 'a')
+    assert_equal(read_description('b', 'main.json'), 'b')
+
+
+def test_batch__failure_reported():
+    broken_file = os.path.join(SOURCE_DIR, 'b', 'broken.py')
+    with open(broken_file, mode='wt') as fh:
+        fh.write(BROKEN_VAPORFILE)
+    try:
+        command = Batch(None, None)
+        args = Namespace(directory=SOURCE_DIR, pattern='*.py', task='generate', contrib=None, recipe=[],
+                         output_dir=OUTPUT_DIR, jobs=1)
+        assert_equal(command.take_action(args), 1)
+        assert_equal(read_description('b', 'c', 'other.json'), '')
+    finally:
+        os.remove(broken_file)
+
+
+if __name__ == '__main__':
+    nose.main(argv=['nosetests', '-s', '-v'], defaultTest=__file__)
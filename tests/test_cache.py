@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+import nose
+from nose.tools import assert_equal
+from nose.tools import assert_not_equal
+from nose.tools import nottest
+
+import json
+import os
+import shutil
+import sys
+
+from argparse import Namespace
+from io import StringIO
+
+from aws_vapor.cache import BuildCache
+from aws_vapor.generator import Generator
+from aws_vapor.utils import CURRENT_DIRECTORY
+
+TOX_TMP_DIR = '.tox/tmp_cache'
+CACHE_DIR = os.path.join(TOX_TMP_DIR, 'cache')
+VAPORFILE_NAME = os.path.join(TOX_TMP_DIR, 'vaporfile_for_cache.py')
+DATA_NAME = os.path.join(TOX_TMP_DIR, 'data.txt')
+VAPORFILE = '''
+from aws_vapor.dsl import Template, Resource, CfnInitMetadata
+
+CALLS = []
+
+
+def generate():
+    CALLS.append('generate')
+    config = CfnInitMetadata.Config('config').files('/etc/data', local_file_path='data.txt')
+    t = Template(description='cached')
+    t.resources(Resource('Instance').metadata(CfnInitMetadata.of([CfnInitMetadata.Init([config])])))
+    return t
+
+
+def generate_other():
+    return Template(description='other')
+'''
+
+
+class App(object):
+    def __init__(self):
+        self.stdout = StringIO()
+
+
+@nottest
+def write_text_file(file_path, content):
+    with open(file_path, mode='wt') as fh:
+        fh.write(content)
+
+
+def setup():
+    if not os.path.exists(TOX_TMP_DIR):
+        os.mkdir(TOX_TMP_DIR)
+    write_text_file(VAPORFILE_NAME, VAPORFILE)
+
+
+def teardown():
+    os.chdir(CURRENT_DIRECTORY)
+    shutil.rmtree(TOX_TMP_DIR)
+    sys.modules.pop('vaporfile_for_cache', None)
+
+
+@nottest
+def new_cache(max_bytes=None):
+    cache = BuildCache(CACHE_DIR, max_bytes)
+    cache.clear()
+    return cache
+
+
+@nottest
+def read_text_file(file_path):
+    if file_path is None:
+        return None
+    with open(file_path) as fh:
+        return fh.read()
+
+
+@nottest
+def run_generator(cache=True, task=None, output=None, jobs=None):
+    app = App()
+    command = Generator(app, None)
+    args = Namespace(vaporfile=VAPORFILE_NAME, task=task or [], contrib=None, recipe=None, output=output, jobs=jobs,
+                     watch=False, interval=1.0, cache=cache, cache_dir=CACHE_DIR, cache_size=None,
+                     max_bytes=0, max_resources=0, max_parameters=0, max_outputs=0, size_report=False, minify=False,
+                     encoder='json', format='json', validate=False, nested_stack_url=None)
+    try:
+        return command.take_action(args), app.stdout.getvalue()
+    finally:
+        os.chdir(CURRENT_DIRECTORY)
+
+
+def test_key_of():
+    cache = new_cache()
+    key = cache.key_of(VAPORFILE_NAME, 'generate', None, None)
+    assert_equal(cache.key_of(VAPORFILE_NAME, 'generate', None, None), key)
+    assert_not_equal(cache.key_of(VAPORFILE_NAME, 'task_dev', None, None), key)
+    assert_not_equal(cache.key_of(VAPORFILE_NAME, 'generate', None, ['add_mapping']), key)
+    assert_not_equal(cache.key_of(VAPORFILE_NAME, 'generate', None, None, {'minify': True}), key)
+
+
+def test_lookup__dependency_modified():
+    cache = new_cache()
+    write_text_file(DATA_NAME, 'a')
+    object_path = cache.store('key', iter(['{', '}', '\n']), [os.path.abspath(DATA_NAME)])
+    assert_equal(cache.lookup('key'), object_path)
+    assert_equal(read_text_file(object_path), '{}\n')
+    assert_equal(cache.lookup('missing'), None)
+
+    write_text_file(DATA_NAME, 'b')
+    assert_equal(cache.lookup('key'), None)
+
+
+def test_evict__least_recently_used():
+    cache = new_cache()
+    for index, key in enumerate(['a', 'b', 'c']):
+        cache.store(key, ['x' * 1000, key], [])
+        os.utime(cache._manifest_path(key), (index, index))
+    os.utime(cache._manifest_path('a'), (10, 10))
+
+    cache.max_bytes = cache.stats()['bytes'] - 1
+    assert_equal(cache.evict(), 1)
+    assert_equal(cache.lookup('b'), None)
+    assert_equal(read_text_file(cache.lookup('a')), 'x' * 1000 + 'a')
+    assert_equal(read_text_file(cache.lookup('c')), 'x' * 1000 + 'c')
+    assert_equal(sum([len(filenames) for _, _, filenames in os.walk(os.path.join(CACHE_DIR, 'objects'))]), 2)
+
+
+def test_evict__shared_object_kept():
+    cache = new_cache()
+    cache.store('a', ['same'], [])
+    cache.store('b', ['same'], [])
+    os.utime(cache._manifest_path('a'), (0, 0))
+
+    cache.max_bytes = cache.stats()['bytes'] - 1
+    assert_equal(cache.evict(), 1)
+    assert_equal(read_text_file(cache.lookup('b')), 'same')
+
+
+def test_save_stats():
+    cache = new_cache()
+    cache.save_stats(0, 1)
+    cache.save_stats(2, 1)
+    stats = cache.stats()
+    assert_equal((stats['hits'], stats['misses']), (2, 2))
+
+
+def test_generator__cached():
+    new_cache()
+    write_text_file(DATA_NAME, 'a')
+    status, first = run_generator()
+    assert_equal(status, 0)
+    status, second = run_generator()
+    assert_equal(status, 0)
+    assert_equal(second, first)
+
+    calls = sys.modules['vaporfile_for_cache'].CALLS
+    assert_equal(len(calls), 1)
+    stats = BuildCache(CACHE_DIR).stats()
+    assert_equal((stats['hits'], stats['misses']), (1, 1))
+
+    write_text_file(DATA_NAME, 'b')
+    status, third = run_generator()
+    assert_equal(len(calls), 2)
+    assert_equal(json.loads(third)['Resources']['Instance']['Metadata']['AWS::CloudFormation::Init']['config']
+                 ['files']['/etc/data']['content']['Fn::Join'][1], ['b\n'])
+
+    run_generator(cache=False)
+    assert_equal(len(calls), 3)
+
+
+def test_generator__cached_pattern_matching_one_task_to_stdout():
+    new_cache()
+    status, first = run_generator(task=['generate_o*'])
+    assert_equal(status, 0)
+    status, second = run_generator(task=['generate_o*'])
+    assert_equal(status, 0)
+    assert_equal(json.loads(second)['Description'], 'other')
+    assert_equal(second, first)
+
+
+def test_generator__cached_in_parallel():
+    new_cache()
+    write_text_file(DATA_NAME, 'a')
+    output = os.path.join(TOX_TMP_DIR, '{task}.json')
+    assert_equal(run_generator(task=['generate*'], output=output, jobs=2)[0], 0)
+    first = read_text_file(output.replace('{task}', 'generate_other'))
+    assert_equal(json.loads(first)['Description'], 'other')
+    os.remove(output.replace('{task}', 'generate_other'))
+
+    assert_equal(run_generator(task=['generate*'], output=output, jobs=2)[0], 0)
+    assert_equal(read_text_file(output.replace('{task}', 'generate_other')), first)
+    stats = BuildCache(CACHE_DIR).stats()
+    assert_equal((stats['hits'], stats['misses'], stats['entries']), (2, 2, 2))
+
+
+def test_generator__not_cached_by_default():
+    new_cache()
+    write_text_file(DATA_NAME, 'a')
+    status, _ = run_generator(cache=False)
+    assert_equal(status, 0)
+    assert_equal(os.path.exists(CACHE_DIR), False)
+
+
+if __name__ == '__main__':
+    nose.main(argv=['nosetests', '-s', '-v'], defaultTest=__file__)
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+import nose
+from nose.tools import assert_equal
+from nose.tools import assert_not_equal
+from nose.tools import nottest
+from nose.tools import raises
+
+import json
+import os
+
+from argparse import Namespace
+from io import StringIO
+
+from aws_vapor.differ import Differ
+from aws_vapor.differ import diff_templates
+from aws_vapor.differ import diff_values
+from aws_vapor.differ import digest_element
+from aws_vapor.differ import digest_template
+from aws_vapor.differ import digest_tree
+from aws_vapor.differ import digest_value
+from aws_vapor.differ import format_change
+from aws_vapor.dsl import Template
+from aws_vapor.dsl import Resource
+from aws_vapor.dsl import Intrinsics
+from aws_vapor.utils import CURRENT_DIRECTORY
+
+TOX_TMP_DIR = '.tox/tmp_differ'
+VAPORFILE_NAME = os.path.join(TOX_TMP_DIR, 'vaporfile_for_differ.py')
+OUTPUT_FILE_NAME = os.path.join(TOX_TMP_DIR, 'generated.json')
+VAPORFILE = '''
+from aws_vapor.dsl import Template, Resource, Intrinsics
+
+
+def generate():
+    t = Template(description='Default')
+    t.resources(Resource('res_1').type('type_1').add_property({'key_1': Intrinsics.ref('param_1')}))
+    t.resources(Resource('res_2').type('type_2'))
+    return t
+'''
+HELPER_VAPORFILE = '''
+from aws_vapor.dsl import Template, Resource
+from helper import T
+
+
+def generate():
+    t = Template()
+    t.resources(Resource('res_1').type(T))
+    return t
+'''
+
+
+class App(object):
+    def __init__(self):
+        self.stdout = StringIO()
+
+
+def setup():
+    if not os.path.exists(TOX_TMP_DIR):
+        os.mkdir(TOX_TMP_DIR)
+
+    with open(VAPORFILE_NAME, mode='wt') as fh:
+        fh.write(VAPORFILE)
+
+
+def teardown():
+    os.chdir(CURRENT_DIRECTORY)
+    if os.path.exists(OUTPUT_FILE_NAME):
+        os.remove(OUTPUT_FILE_NAME)
+
+
+@nottest
+def run_differ(old, new, names_only=False):
+    app = App()
+    command = Differ(app, None)
+    args = Namespace(old=old, new=new, task='generate', contrib=None, recipe=None, names_only=names_only)
+    try:
+        return command.take_action(args), app.stdout.getvalue()
+    finally:
+        os.chdir(CURRENT_DIRECTORY)
+
+
+@nottest
+def write_output(document):
+    with open(OUTPUT_FILE_NAME, mode='wt') as fh:
+        json.dump(document, fh, indent=2)
+
+
+def test_digest_value__order_of_keys():
+    assert_equal(digest_value({'a': 1, 'b': [1, '2']}), digest_value({'b': [1, '2'], 'a': 1}))
+    assert_not_equal(digest_value([1]), digest_value(['1']))
+    assert_not_equal(digest_value({'a': [1, 2]}), digest_value({'a': [2, 1]}))
+    assert_not_equal(digest_value({'a': True}), digest_value({'a': 'true'}))
+
+
+def test_digest_element__cached_until_modified():
+    resource = Resource('res_1').type('type_1')
+    digest = digest_element(resource)['res_1']
+    assert_equal(digest, digest_value({'Type': 'type_1'}))
+
+    assert digest_element(resource) is digest_element(resource)
+
+    resource.attrs['Type'] = 'type_X'
+    assert_equal(digest_element(resource)['res_1'], digest_value({'Type': 'type_X'}))
+
+
+def test_digest_template__same_as_document():
+    template = Template()
+    template.resources(Resource('res_1').type('type_1').add_property({'key_1': Intrinsics.ref('param_1')}))
+    assert_equal(digest_template(template), digest_tree(json.loads(json.dumps(template.to_template()))))
+
+
+def test_diff_values():
+    old = {'a': {'b': [1, 2, 3], 'c': 'x'}, 'd': 1}
+    new = {'a': {'b': [1, 5], 'c': 'x'}, 'e': 2}
+    assert_equal(list(diff_values(old, new)), [
+        ('changed', ('a', 'b', 1), 2, 5),
+        ('removed', ('a', 'b', 2), 3, None),
+        ('removed', ('d',), 1, None),
+        ('added', ('e',), None, 2),
+    ])
+
+
+def test_diff_values__hashes_each_value_once():
+    memo = {}
+    old = {'a': {'b': 1}, 'c': {'d': 2}}
+    new = {'a': {'b': 1}, 'c': {'d': 3}}
+    assert_equal(list(diff_values(old, new, memo)), [('changed', ('c', 'd'), 2, 3)])
+    assert_equal(sorted(memo), sorted([id(old), id(new), id(old['a']), id(new['a']), id(old['c']), id(new['c'])]))
+
+
+def test_diff_templates__elements_by_cached_hashes():
+    old = {'Resources': {'res_1': {'Type': 'type_1'}}}
+    new = {'Resources': {'res_1': {'Type': 'type_2'}}}
+    memo = {id(old['Resources']['res_1']): b'same', id(new['Resources']['res_1']): b'same'}
+    assert_equal(list(diff_templates(old, new, memo)), [])
+    assert_equal(list(diff_templates(old, new)), [('changed', ('Resources', 'res_1', 'Type'), 'type_1', 'type_2')])
+
+
+def test_format_change():
+    assert_equal(format_change(('changed', ('Resources', 'res_1', 'Type'), 'a', 'b')),
+                 '~ Resources/res_1/Type: "a" -> "b"')
+    assert_equal(format_change(('added', ('Tags', 0), None, {'Key': 'k'})), '+ Tags/0: {"Key": "k"}')
+    assert_equal(format_change(('removed', ('Tags', 0), {'Key': 'k'}, None), names_only=True), '- Tags/0')
+
+
+def test_differ__same_template():
+    status, stdout = run_differ(VAPORFILE_NAME, VAPORFILE_NAME)
+    assert_equal(status, 0)
+    assert_equal(stdout, '')
+
+
+def test_differ__vaporfile_and_generated_file():
+    write_output({
+        'AWSTemplateFormatVersion': '2010-09-09',
+        'Description': 'Default',
+        'Resources': {
+            'res_1': {'Type': 'type_1', 'Properties': {'key_1': {'Ref': 'param_X'}}},
+            'res_3': {'Type': 'type_3'},
+        },
+    })
+    status, stdout = run_differ(OUTPUT_FILE_NAME, VAPORFILE_NAME)
+    assert_equal(status, 1)
+    assert_equal(stdout.splitlines(), [
+        '~ Resources/res_1/Properties/key_1/Ref: "param_X" -> "param_1"',
+        '- Resources/res_3: {"Type": "type_3"}',
+        '+ Resources/res_2: {"Type": "type_2"}',
+    ])
+
+
+def test_differ__same_named_modules():
+    vaporfiles = []
+    for name in ['a', 'b']:
+        directory = os.path.join(TOX_TMP_DIR, name)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'helper.py'), mode='wt') as fh:
+            fh.write('T = %r\n' % name.upper())
+        vaporfiles.append(os.path.join(directory, 'vaporfile.py'))
+        with open(vaporfiles[-1], mode='wt') as fh:
+            fh.write(HELPER_VAPORFILE)
+    status, stdout = run_differ(*vaporfiles)
+    assert_equal(status, 1)
+    assert_equal(stdout.splitlines(), ['~ Resources/res_1/Type: "A" -> "B"'])
+
+
+@raises(ValueError)
+def test_differ__yaml():
+    run_differ(VAPORFILE_NAME, os.path.join(TOX_TMP_DIR, 'generated.yaml'))
+
+
+if __name__ == '__main__':
+    nose.main(argv=['nosetests', '-s', '-v'], defaultTest=__file__)
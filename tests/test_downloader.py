@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+import nose
+from nose.tools import assert_equal
+from nose.tools import nottest
+from nose.tools import raises
+
+import hashlib
+import multiprocessing
+import os
+import shutil
+import threading
+
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from urllib import parse
+
+from aws_vapor.downloader import ConnectionPool
+from aws_vapor.downloader import DownloadCache
+from aws_vapor.downloader import download_recipe
+from aws_vapor.downloader import install_recipes
+from aws_vapor.downloader import parse_manifest
+
+TOX_TMP_DIR = '.tox/tmp_downloader'
+SERVER_DIR = os.path.join(TOX_TMP_DIR, 'server')
+CONTRIB_DIR = os.path.join(TOX_TMP_DIR, 'contrib')
+CACHE_DIR = os.path.join(TOX_TMP_DIR, 'cache')
+RECIPES = {'recipe_%d.py' % i: 'def recipe(template):\n    pass  # %d\n' % i for i in range(6)}
+
+server = None
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    connections = 0
+    statuses = []
+    proxied = []
+
+
+class Handler(SimpleHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def translate_path(self, path):
+        if parse.urlsplit(path).netloc:
+            # serves a request to a proxy as if the request were sent to the origin server
+            self.server.proxied.append(path)
+            path = parse.urlsplit(path).path
+        # serves files under SERVER_DIR instead of the current directory, as `directory` does since python 3.7
+        relative_path = os.path.relpath(super(Handler, self).translate_path(path), os.getcwd())
+        return os.path.join(os.path.abspath(SERVER_DIR), relative_path)
+
+    def setup(self):
+        super(Handler, self).setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        if self.path.startswith('/moved/'):
+            self.send_response(301)
+            self.send_header('Location', self.path[len('/moved'):])
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path.startswith('/etag/'):
+            with open(os.path.join(SERVER_DIR, self.path[len('/etag/'):]), mode='rb') as fh:
+                body = fh.read()
+            etag = '"%s"' % hashlib.sha256(body).hexdigest()
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '%d' % len(body))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        super(Handler, self).do_GET()
+
+    def send_response(self, code, message=None):
+        self.server.statuses.append(code)
+        super(Handler, self).send_response(code, message)
+
+    def log_message(self, *args):
+        pass
+
+
+@nottest
+def url_of(filename):
+    return 'http://127.0.0.1:%d/%s' % (server.server_address[1], filename)
+
+
+@nottest
+def sha256_of(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+@nottest
+def read_recipe(filename):
+    with open(os.path.join(CONTRIB_DIR, filename)) as fh:
+        return fh.read()
+
+
+def setup():
+    global server
+    os.makedirs(SERVER_DIR, exist_ok=True)
+    for filename, content in list(RECIPES.items()):
+        with open(os.path.join(SERVER_DIR, filename), mode='wt') as fh:
+            fh.write(content)
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+
+def teardown():
+    server.shutdown()
+    server.server_close()
+    shutil.rmtree(TOX_TMP_DIR)
+
+
+def test_parse_manifest():
+    manifest = '''
+# comment
+https://example.com/recipes/add_mapping.py sha256=ABCD
+https://example.com/recipes/v2/replace.py replace_parameter.py  # renamed
+http://example.com/recipes/plain.py
+'''
+    assert_equal(parse_manifest(manifest), [
+        ('https://example.com/recipes/add_mapping.py', 'add_mapping.py', 'abcd'),
+        ('https://example.com/recipes/v2/replace.py', 'replace_parameter.py', None),
+        ('http://example.com/recipes/plain.py', 'plain.py', None),
+    ])
+
+
+@raises(ValueError)
+def test_parse_manifest__unsafe_file_name():
+    parse_manifest('https://example.com/recipe.py ../recipe.py')
+
+
+@raises(ValueError)
+def test_parse_manifest__duplicate_file_name():
+    parse_manifest('https://example.com/a/recipe.py\nhttps://example.com/b/recipe.py')
+
+
+def test_install_recipes__pooled_connections():
+    shutil.rmtree(CONTRIB_DIR, ignore_errors=True)
+    server.connections = 0
+    recipes = [(url_of(filename), filename, sha256_of(content)) for filename, content in sorted(RECIPES.items())]
+
+    results = list(install_recipes(recipes, CONTRIB_DIR, jobs=2))
+    assert_equal([error for _, _, _, _, error in results], [None] * len(RECIPES))
+    for filename, content in list(RECIPES.items()):
+        assert_equal(read_recipe(filename), content)
+    assert_equal(server.connections <= 2, True)
+
+
+def test_install_recipes__hash_mismatch():
+    shutil.rmtree(CONTRIB_DIR, ignore_errors=True)
+    os.makedirs(CONTRIB_DIR)
+    with open(os.path.join(CONTRIB_DIR, 'recipe_0.py'), mode='wt') as fh:
+        fh.write('previous')
+
+    results = list(install_recipes([(url_of('recipe_0.py'), 'recipe_0.py', sha256_of('tampered'))], CONTRIB_DIR))
+    assert_equal('hash mismatch' in results[0][4], True)
+    assert_equal(read_recipe('recipe_0.py'), 'previous')
+    assert_equal(os.listdir(CONTRIB_DIR), ['recipe_0.py'])
+
+
+def test_install_recipes__not_found():
+    results = list(install_recipes([(url_of('missing.py'), 'missing.py', None)], CONTRIB_DIR))
+    assert_equal('unexpected status 404' in results[0][4], True)
+
+
+def test_connection_pool__redirect():
+    pool = ConnectionPool()
+    try:
+        status, headers, body = pool.request('GET', url_of('moved/recipe_1.py'))
+    finally:
+        pool.close()
+    assert_equal(status, 200)
+    assert_equal(body.decode('utf-8'), RECIPES['recipe_1.py'])
+    assert_equal(pool.connections, 1)
+
+
+@nottest
+def install_with_cache(filename, offline=False):
+    cache = DownloadCache(CACHE_DIR)
+    [(_, _, state, _, error)] = list(install_recipes([(url_of(filename), 'recipe.py', None)], CONTRIB_DIR,
+                                                     cache=cache, offline=offline))
+    return state, error
+
+
+def test_install_recipes__conditional_requests():
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    shutil.rmtree(CONTRIB_DIR, ignore_errors=True)
+    for filename in ['recipe_3.py', 'etag/recipe_3.py']:
+        server.statuses = []
+        assert_equal(install_with_cache(filename), ('downloaded', None))
+        assert_equal(install_with_cache(filename), ('not modified', None))
+        assert_equal(server.statuses, [200, 304])
+        assert_equal(read_recipe('recipe.py'), RECIPES['recipe_3.py'])
+
+    stamp = os.stat(os.path.join(CONTRIB_DIR, 'recipe.py')).st_mtime_ns
+    assert_equal(install_with_cache('recipe_3.py'), ('not modified', None))
+    assert_equal(os.stat(os.path.join(CONTRIB_DIR, 'recipe.py')).st_mtime_ns, stamp)
+
+
+@nottest
+def put_entries(worker):
+    cache = DownloadCache(CACHE_DIR)
+    for i in range(20):
+        cache.put('http://example.com/%d/%d.py' % (worker, i), {}, b'pass  # %d\n' % i)
+
+
+def test_download_cache__shared_by_processes():
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    workers = [multiprocessing.Process(target=put_entries, args=(worker,)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    cache = DownloadCache(CACHE_DIR)
+    for worker in range(4):
+        for i in range(20):
+            entry, body = cache.get('http://example.com/%d/%d.py' % (worker, i))
+            assert_equal(body, b'pass  # %d\n' % i)
+
+
+def test_install_recipes__offline():
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    shutil.rmtree(CONTRIB_DIR, ignore_errors=True)
+    state, error = install_with_cache('recipe_4.py', offline=True)
+    assert_equal('not in the download cache' in error, True)
+
+    install_with_cache('recipe_4.py')
+    shutil.rmtree(CONTRIB_DIR)
+    server.statuses = []
+    assert_equal(install_with_cache('recipe_4.py', offline=True), ('offline', None))
+    assert_equal(server.statuses, [])
+    assert_equal(read_recipe('recipe.py'), RECIPES['recipe_4.py'])
+
+
+def test_download_recipe():
+    shutil.rmtree(CONTRIB_DIR, ignore_errors=True)
+    download_recipe(url_of('recipe_2.py'), 'renamed.py', CONTRIB_DIR)
+    assert_equal(read_recipe('renamed.py'), RECIPES['recipe_2.py'])
+
+
+def test_download_recipe__through_proxy():
+    shutil.rmtree(CONTRIB_DIR, ignore_errors=True)
+    server.proxied = []
+    environ = dict(os.environ)
+    try:
+        for name in ['no_proxy', 'NO_PROXY', 'HTTP_PROXY']:
+            os.environ.pop(name, None)
+        os.environ['http_proxy'] = 'http://127.0.0.1:%d' % server.server_address[1]
+        download_recipe('http://recipes.invalid/recipe_3.py', 'recipe_3.py', CONTRIB_DIR)
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+    assert_equal(server.proxied, ['http://recipes.invalid/recipe_3.py'])
+    assert_equal(read_recipe('recipe_3.py'), RECIPES['recipe_3.py'])
+
+
+def test_download_recipe__file_url():
+    shutil.rmtree(CONTRIB_DIR, ignore_errors=True)
+    file_url = parse.urljoin('file:', os.path.abspath(os.path.join(SERVER_DIR, 'recipe_5.py')))
+    download_recipe(file_url, 'recipe_5.py', CONTRIB_DIR)
+    assert_equal(read_recipe('recipe_5.py'), RECIPES['recipe_5.py'])
+
+
+if __name__ == '__main__':
+    nose.main(argv=['nosetests', '-s', '-v'], defaultTest=__file__)
@@ -5,7 +5,12 @@ from nose.tools import assert_equal
 from nose.tools import nottest
 from nose.tools import raises
 
+import copy
+import json
 import os
+import pickle
+
+from io import StringIO
 
 from aws_vapor.dsl import Template
 from aws_vapor.dsl import Element
@@ -20,9 +25,12 @@ from aws_vapor.dsl import Intrinsics
 from aws_vapor.dsl import Pseudos
 from aws_vapor.dsl import UserData
 from aws_vapor.dsl import CfnInitMetadata
+from aws_vapor.dsl import intrinsic
+from aws_vapor.utils import record_file_reads
 
 TOX_TMP_DIR = '.tox/tmp'
 X_SHELL_SCRIPT_FILE_NAME = os.path.join(TOX_TMP_DIR, 'x-shellscript.txt')
+MAPPING_CSV_FILE_NAME = os.path.join(TOX_TMP_DIR, 'mapping.csv')
 X_SHELL_SCRIPT_PARAMS = {
     'param_1': 'value_1',
     'param_2': 'value_2'
@@ -37,10 +45,70 @@ def setup():
         fh.write('ABCDE {{ param_1 }}\n')
         fh.write('abcde {{ param_2 }}\n')
 
+    with open(MAPPING_CSV_FILE_NAME, mode='wt') as fh:
+        fh.write('category,key_1\n')
+        fh.write('category_1,value_1\n')
+
 
 def teardown():
-    if os.path.exists(X_SHELL_SCRIPT_FILE_NAME):
-        os.remove(X_SHELL_SCRIPT_FILE_NAME)
+    for file_name in (X_SHELL_SCRIPT_FILE_NAME, MAPPING_CSV_FILE_NAME):
+        if os.path.exists(file_name):
+            os.remove(file_name)
+
+
+def test_template__add_elements():
+    template = Template(description='description')
+    template.resources(Resource('res_1').type('type_1'))
+    template.resources(Resource('res_2').type('type_2'))
+    template.outputs(Output('out_1').value('value_1'))
+    assert_equal(
+        template.to_template(),
+        {
+            'AWSTemplateFormatVersion': '2010-09-09',
+            'Description': 'description',
+            'Resources': {'res_1': {'Type': 'type_1'}, 'res_2': {'Type': 'type_2'}},
+            'Outputs': {'out_1': {'Value': 'value_1'}}
+        }
+    )
+
+
+def test_template__replace_element():
+    template = Template()
+    template.resources(Resource('res_1').type('type_1'))
+    template.resources(Resource('res_2').type('type_2'))
+    template.resources(Resource('res_1').type('type_X'))
+    assert_equal(
+        [(element.name, element.attrs) for element in template.elements['Resources']],
+        [('res_1', {'Type': 'type_X'}), ('res_2', {'Type': 'type_2'})]
+    )
+
+
+def test_template__merge_element():
+    template = Template()
+    template.resources(Resource('res_1').type('type_1').attributes('key_1', 'value_1'))
+    template.resources(Resource('res_2').type('type_2'))
+    template.resources(Resource('res_1').type('type_X'), merge=True)
+    assert_equal(
+        [(element.name, element.attrs) for element in template.elements['Resources']],
+        [('res_1', {'Type': 'type_X', 'key_1': 'value_1'}), ('res_2', {'Type': 'type_2'})]
+    )
+
+
+def test_template__get():
+    template = Template()
+    resource = template.resources(Resource('res_1').type('type_1'))
+    assert_equal(template.get('Resources', 'res_1'), resource)
+    assert_equal(template.get('Resources', 'res_X'), None)
+    assert_equal(template.get('Outputs', 'res_1'), None)
+
+
+def test_template__get__elements_edited_directly():
+    template = Template()
+    template.resources(Resource('res_1').type('type_1'))
+    resource = template.resources(Resource('res_2').type('type_2'))
+    del template.elements['Resources'][0]
+    assert_equal(template.get('Resources', 'res_2'), resource)
+    assert_equal(template.get('Resources', 'res_1'), None)
 
 
 def test_element():
@@ -52,6 +120,46 @@ def test_element():
     )
 
 
+def test_element__attrs_allocated_on_first_write():
+    template = {}
+    element = Element('abcde')
+    element.to_template(template)
+    assert_equal(element._attrs, None)
+    assert_equal(template, {'abcde': {}})
+
+    element.attributes('key_1', 'value_1')
+    assert_equal(element._attrs, {'key_1': 'value_1'})
+
+
+def test_element__attrs_modified_in_place():
+    element = Element('abcde').attributes('key_1', 'value_1')
+    for modify in [lambda attrs: attrs.update(key_2='value_2'), lambda attrs: attrs.pop('key_2'),
+                   lambda attrs: attrs.setdefault('key_3', {}), lambda attrs: attrs.__delitem__('key_3')]:
+        element.cached(('test',), lambda target: 'cached')
+        assert_equal(element.dirty, False)
+        modify(element.attrs)
+        assert_equal(element.dirty, True)
+    assert_equal(element.attrs, {'key_1': 'value_1'})
+    assert_equal(type(copy.deepcopy(element.attrs)), dict)
+    assert_equal(type(pickle.loads(pickle.dumps(element)).attrs['key_1']), str)
+
+
+@raises(AttributeError)
+def test_element__no_instance_dict():
+    Resource('abcde').undefined_attribute = 'value'
+
+
+def test_element__subclass_without_slots():
+    class NamedElement(Element):
+        def __init__(self, name):
+            super(NamedElement, self).__init__(name)
+            self.extra = 'extra'
+
+    template = {}
+    NamedElement('abcde').attributes('key_1', 'value_1').to_template(template)
+    assert_equal(template, {'abcde': {'key_1': 'value_1'}})
+
+
 def test_metadata():
     template = {}
     Metadatum('abcde').attributes('key_1', 'value_1').attributes('key_2', 'value_2').to_template(template)
@@ -154,6 +262,102 @@ def test_mapping__find_in_map__missing_second_level_key():
     mapping.find_in_map('category_1', 'key_X'),
 
 
+def test_mapping__from_csv():
+    template = {}
+    mapping = Mapping.from_csv('abcde', StringIO(
+        'category,key_1,key_2\n'
+        'category_1,value_1,value_2\n'
+        'category_2,,value_4\n'
+        '\n'
+        'category_1,value_5\n'
+    ))
+    mapping.to_template(template)
+    assert_equal(
+        template,
+        {'abcde': {
+            'category_1': {'key_1': 'value_5', 'key_2': 'value_2'},
+            'category_2': {'key_2': 'value_4'}
+        }}
+    )
+
+
+def test_mapping__from_csv__file():
+    template = {}
+    with record_file_reads() as file_reads:
+        Mapping.from_csv('abcde', MAPPING_CSV_FILE_NAME).to_template(template)
+    assert_equal(template, {'abcde': {'category_1': {'key_1': 'value_1'}}})
+    assert_equal(file_reads, {os.path.abspath(MAPPING_CSV_FILE_NAME)})
+
+
+def test_mapping__from_csv__key_column():
+    template = {}
+    Mapping.from_csv('abcde', ['key_1;category;key_2', 'value_1;category_1;value_2'],
+                     key_column='category', delimiter=';').to_template(template)
+    assert_equal(template, {'abcde': {'category_1': {'key_1': 'value_1', 'key_2': 'value_2'}}})
+
+
+@raises(ValueError)
+def test_mapping__from_csv__missing_key_column():
+    Mapping.from_csv('abcde', ['key_1,key_2'], key_column='category')
+
+
+def test_mapping__from_json_lines():
+    template = {}
+    mapping = Mapping.from_json_lines('abcde', StringIO(
+        '{"category": "category_1", "key_1": "value_1", "key_2": ["value_2", "value_3"]}\n'
+        '\n'
+        '{"key_3": "value_4", "category": "category_2"}\n'
+    ), key_field='category')
+    mapping.to_template(template)
+    assert_equal(
+        template,
+        {'abcde': {
+            'category_1': {'key_1': 'value_1', 'key_2': ['value_2', 'value_3']},
+            'category_2': {'key_3': 'value_4'}
+        }}
+    )
+
+
+@raises(ValueError)
+def test_mapping__from_json_lines__not_object():
+    Mapping.from_json_lines('abcde', ['["category_1", "value_1"]'])
+
+
+def test_mapping__bulk_loaded__find_in_map():
+    mapping = Mapping.from_rows('abcde', [('category_1', {'key_1': 'value_1'}), ('category_2', {'key_2': 'value_2'})])
+    assert_equal(
+        mapping.find_in_map('category_2', 'key_2'),
+        {'Fn::FindInMap': ['abcde', 'category_2', 'key_2']}
+    )
+    assert_equal(mapping.find_in_map(Pseudos.region(), 'key_X')['Fn::FindInMap'][2], 'key_X')
+
+
+@raises(ValueError)
+def test_mapping__bulk_loaded__find_in_map__missing_top_level_key():
+    Mapping.from_rows('abcde', [('category_1', {'key_1': 'value_1'})]).find_in_map('category_X', 'key_1')
+
+
+@raises(ValueError)
+def test_mapping__bulk_loaded__find_in_map__missing_second_level_key():
+    mapping = Mapping.from_rows('abcde', [('category_1', {'key_1': 'value_1'}), ('category_2', {'key_2': 'value_2'})])
+    mapping.find_in_map('category_1', 'key_2')
+
+
+def test_mapping__bulk_loaded__add_item():
+    template = {}
+    mapping = Mapping.from_rows('abcde', [('category_1', {'key_1': 'value_1'})])
+    mapping.add_category('category_1').add_item('key_2', 'value_2')
+    mapping.to_template(template)
+    assert_equal(template, {'abcde': {'category_1': {'key_1': 'value_1', 'key_2': 'value_2'}}})
+
+
+def test_mapping__bulk_loaded__pickle():
+    template = {}
+    mapping = Mapping.from_rows('abcde', [('category_1', {'key_1': 'value_1'}), ('category_2', {'key_2': 'value_2'})])
+    pickle.loads(pickle.dumps(mapping)).to_template(template)
+    assert_equal(template, {'abcde': {'category_1': {'key_1': 'value_1'}, 'category_2': {'key_2': 'value_2'}}})
+
+
 def test_condition():
     template = {}
     Condition('abcde').expression(Intrinsics.fn_equals('value_1', 'value_2')).to_template(template)
@@ -496,6 +700,63 @@ def test_pseudos_stack_name():
     assert_equal(Pseudos.stack_name(), {'Ref': 'AWS::StackName'})
 
 
+def test_intrinsic__interned():
+    assert Pseudos.region() is Pseudos.region()
+    assert Intrinsics.ref('res_1') is Intrinsics.ref(Resource('res_1'))
+    assert Intrinsics.get_att('res_1', 'Arn') is Intrinsics.get_att('res_1', 'Arn')
+    assert Intrinsics.fn_if('cond_1', Pseudos.region(), 'a') is Intrinsics.fn_if('cond_1', Pseudos.region(), 'a')
+    assert Intrinsics.ref('res_1') is not Intrinsics.ref('res_2')
+    assert_equal({Pseudos.region(): 'a'}[intrinsic('Ref', 'AWS::Region')], 'a')
+    assert_equal(hash(Intrinsics.get_att('res_1', 'Arn')), hash(intrinsic('Fn::GetAtt', ('res_1', 'Arn'))))
+
+
+def test_intrinsic__arguments_told_apart_by_type():
+    assert intrinsic('Fn::Select', (1, 'a')) is not intrinsic('Fn::Select', (True, 'a'))
+    assert intrinsic('Fn::Select', (0.0, 'a')) is not intrinsic('Fn::Select', (-0.0, 'a'))
+    assert_equal(json.dumps(intrinsic('Fn::Select', (True, 'a'))), '{"Fn::Select": [true, "a"]}')
+
+
+def test_intrinsic__mutable_arguments_not_interned():
+    node = Intrinsics.fn_if('cond_1', {'key_1': 'a'}, 'b')
+    assert_equal(type(node), dict)
+    node['Fn::If'][1]['key_1'] = 'c'
+    assert_equal(Intrinsics.fn_if('cond_1', {'key_1': 'a'}, 'b'), {'Fn::If': ['cond_1', {'key_1': 'a'}, 'b']})
+
+
+@raises(TypeError)
+def test_intrinsic__immutable_node():
+    Pseudos.region()['Ref'] = 'AWS::StackName'
+
+
+def test_intrinsic__immutable_node_updated_in_place():
+    node = Intrinsics.ref('res_1')
+    try:
+        node |= {'key_1': 1}
+    except TypeError:
+        pass
+    else:
+        raise AssertionError('TypeError not raised')
+    assert_equal(Intrinsics.ref('res_1'), {'Ref': 'res_1'})
+
+
+@raises(TypeError)
+def test_intrinsic__immutable_arguments():
+    Intrinsics.get_att('res_1', 'Arn')['Fn::GetAtt'].append('Endpoint')
+
+
+def test_intrinsic__copy_and_pickle():
+    node = Intrinsics.fn_if('cond_1', Pseudos.region(), Pseudos.no_value())
+    assert copy.copy(node) is node
+    assert copy.deepcopy({'key_1': node})['key_1'] is node
+    assert pickle.loads(pickle.dumps(node)) is node
+
+
+def test_intrinsic__serialized_as_dict():
+    node = Intrinsics.get_att('res_1', 'Arn')
+    assert_equal(json.dumps(node), json.dumps({'Fn::GetAtt': ['res_1', 'Arn']}))
+    assert_equal(node, {'Fn::GetAtt': ['res_1', 'Arn']})
+
+
 def test_user_data_of():
     assert_equal(
         UserData.of(['value_1', 'value_2', 'value_3']),
@@ -503,6 +764,24 @@ def test_user_data_of():
     )
 
 
+def test_user_data_from_files():
+    user_data = UserData.from_files([(X_SHELL_SCRIPT_FILE_NAME, 'x-shellscript')], {'param_1': Pseudos.region()})
+    tokens = user_data['UserData']['Fn::Base64']['Fn::Join'][1]
+    assert_equal(len(tokens), 3)
+    assert_equal(tokens[0].endswith('ABCDE '), True)
+    assert_equal(tokens[1], {'Ref': 'AWS::Region'})
+    assert_equal(tokens[2].startswith('\nabcde {{ param_2 }}\n'), True)
+
+
+def test_cfn_init_metadata_config__files__local_file_path():
+    config = CfnInitMetadata.Config('config').files('/etc/file', local_file_path=X_SHELL_SCRIPT_FILE_NAME,
+                                                    local_file_params=X_SHELL_SCRIPT_PARAMS)
+    assert_equal(
+        config.value,
+        {'files': {'/etc/file': {'content': {'Fn::Join': ['', ['ABCDE value_1\nabcde value_2\n\n']]}}}}
+    )
+
+
 def test_cfn_init_metadata_of__config():
     assert_equal(
         CfnInitMetadata.of([
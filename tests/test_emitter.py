@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+import nose
+from nose.tools import assert_equal
+from nose.tools import nottest
+from nose.tools import raises
+
+from io import StringIO
+from json import dumps, loads
+
+from aws_vapor.dsl import Template
+from aws_vapor.dsl import Parameter
+from aws_vapor.dsl import Mapping
+from aws_vapor.dsl import Condition
+from aws_vapor.dsl import Resource
+from aws_vapor.dsl import Output
+from aws_vapor.dsl import Intrinsics
+from aws_vapor.dsl import Pseudos
+from aws_vapor.dsl import UserData
+from aws_vapor.emitter import YamlEncoding
+from aws_vapor.emitter import encode_scalar
+from aws_vapor.emitter import encode_value
+from aws_vapor.encoder import dump
+
+STRINGS = ['', ' ', 'a: b', 'a:', 'yes', 'No', 'null', '~', '1.5', '007', '2010-09-09', '- x', '#c', 'a #b', "it's",
+           'x\ny', 'x\ny\n', 'x\ny\n\n', '\nx\ny', ' x\ny', 'x\n\ty \n  \nz', 'déscription', '\x85', '\x7f', '\ttab',
+           'x\u2028y', 'x\u2029y\nz\n', 'line\n', 'a b\n\n',
+           'AWS::Region', '${AWS::StackName}-x', '[a]', '{a}', 'a,b', '@x', '!x', '&x', '*x', '|x', '>x', '<<']
+
+
+@nottest
+def load_yaml(document):
+    try:
+        import yaml
+    except ImportError:
+        raise nose.SkipTest('PyYAML is not installed')
+
+    class Loader(yaml.SafeLoader):
+        pass
+
+    def construct_intrinsic(loader, suffix, node):
+        if isinstance(node, yaml.ScalarNode):
+            value = loader.construct_scalar(node)
+            if suffix == 'GetAtt':
+                value = value.split('.', 1)
+        elif isinstance(node, yaml.SequenceNode):
+            value = loader.construct_sequence(node, deep=True)
+        else:
+            value = loader.construct_mapping(node, deep=True)
+        return {suffix if suffix == 'Ref' else 'Fn::' + suffix: value}
+
+    Loader.add_multi_constructor('!', construct_intrinsic)
+    # AWS CloudFormation reads dates as strings
+    for first, resolvers in list(Loader.yaml_implicit_resolvers.items()):
+        Loader.yaml_implicit_resolvers[first] = [r for r in resolvers if not r[0].endswith(':timestamp')]
+    return yaml.load(document, Loader)
+
+
+@nottest
+def sample_template():
+    template = Template(description='déscription "quoted"\n')
+    template.parameters(Parameter('param_1').type('Number').default(1.5).allowed_values([1, 2 ** 70, 1e16]))
+    mapping = template.mappings(Mapping('map_1').add_category('category_1').add_item('key_1', 'value_1'))
+    condition = template.conditions(Condition('cond_1').expression(Intrinsics.fn_equals(Intrinsics.ref('param_1'), 'a')))
+    template.resources(Resource('res_1').type('type_1').condition(condition).properties([
+        {'key_1': mapping.find_in_map(Pseudos.region(), 'key_1')},
+        {'key_2': None},
+        {'key_3': [True, False, {}, []]},
+        {'key_4': Intrinsics.sub('${AWS::StackName}\n${param_1}\n')},
+        {'key_5': Intrinsics.fn_if('cond_1', Intrinsics.get_att('res_2', 'Arn'), Pseudos.no_value())},
+        UserData.of(['#!/bin/bash\n', 'echo ', Intrinsics.ref('param_1'), '\n'])
+    ]))
+    template.resources(Resource('res_2').type('type_2').properties([{'key_1': STRINGS}]))
+    template.outputs(Output('out_1').value(Intrinsics.get_att('res_1', 'attr_1')).export('name_1'))
+    template.elements['Metadata'] = []
+    return template
+
+
+@nottest
+def actual_document(template):
+    output_file = StringIO()
+    dump(template, output_file, YamlEncoding())
+    return output_file.getvalue() + '\n'
+
+
+def test_encode_scalar():
+    assert_equal(encode_scalar('AWS::Region'), 'AWS::Region')
+    assert_equal(encode_scalar('AWS::Region', flow=True), "'AWS::Region'")
+    assert_equal(encode_scalar('yes'), "'yes'")
+    assert_equal(encode_scalar("it's 1"), "'it''s 1'")
+    assert_equal(encode_scalar('a\nb'), '"a\\nb"')
+    assert_equal(encode_scalar(1e16), '1.0e+16')
+    assert_equal(encode_scalar(None), 'null')
+
+
+@raises(TypeError)
+def test_encode_scalar__not_serializable():
+    encode_scalar(object())
+
+
+def test_encode_value__short_form():
+    assert_equal(encode_value(Intrinsics.ref('param_1')), ' !Ref param_1')
+    assert_equal(encode_value(Intrinsics.get_att('res_1', 'attr_1')), ' !GetAtt res_1.attr_1')
+    assert_equal(encode_value(Intrinsics.sub('${AWS::Region}')), " !Sub '${AWS::Region}'")
+    assert_equal(encode_value(Intrinsics.fn_equals(Intrinsics.ref('param_1'), 'a')), ' !Equals [!Ref param_1, a]')
+
+
+def test_encode_value__long_form_for_nested_function():
+    assert_equal(encode_value(Intrinsics.base64(Intrinsics.sub('${param_1}'))), "\n  Fn::Base64: !Sub '${param_1}'")
+    assert_equal(encode_value(Intrinsics.get_azs(Pseudos.region()), 1), "\n    Fn::GetAZs: !Ref 'AWS::Region'")
+
+
+def test_encode_value__block():
+    assert_equal(encode_value({'key_1': [{'key_2': 'a' * 80}, ['b']], 'key_3': 'c\nd\n'}),
+                 '\n  key_1:\n  - key_2: %s\n  - [b]\n  key_3: |\n    c\n    d' % ('a' * 80))
+
+
+def test_encode_value__line_separator():
+    assert_equal(encode_value({'key_1': 'a\u2028b\nc\n'}), '\n  key_1: "a\\u2028b\\nc\\n"')
+
+
+def test_encode_value__trailing_newline():
+    assert_equal(encode_value({'key_1': 'line\n'}), '\n  key_1: "line\\n"')
+
+
+def test_dump__strings_ending_with_newline():
+    lines = ['#!/bin/bash\n', 'echo ', Intrinsics.ref('param_1'), '\n', 'exit\n']
+    value = loads(dumps({'Description': 'x\n', 'UserData': Intrinsics.base64(Intrinsics.join('', lines)),
+                         'Lines': lines}))
+    assert_equal(load_yaml('key_1:' + encode_value(value) + '\n'), {'key_1': value})
+    assert_equal(load_yaml('key_1:' + encode_value([value]) + '\n'), {'key_1': [value]})
+    assert_equal(load_yaml('Description: ' + encode_value('x\n') + '\n'), {'Description': 'x\n'})
+
+
+def test_dump__same_as_json():
+    template = sample_template()
+    assert_equal(load_yaml(actual_document(template)), loads(dumps(template.to_template())))
+
+
+def test_dump__strings():
+    for value in STRINGS:
+        document = 'key_1:' + encode_value([value, {'key_2': [[value]]}]) + '\n'
+        assert_equal(load_yaml(document), {'key_1': [value, {'key_2': [[value]]}]})
+
+
+def test_dump__smaller_than_json():
+    template = sample_template()
+    assert len(actual_document(template)) < len(dumps(template.to_template(), indent=2))
+
+
+if __name__ == '__main__':
+    nose.main(argv=['nosetests', '-s', '-v'], defaultTest=__file__)
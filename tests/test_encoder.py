@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+
+import nose
+from nose.tools import assert_equal
+from nose.tools import nottest
+from nose.tools import raises
+
+from io import StringIO
+from json import dumps
+
+from aws_vapor.dsl import Template
+from aws_vapor.dsl import Element
+from aws_vapor.dsl import Metadatum
+from aws_vapor.dsl import Parameter
+from aws_vapor.dsl import Mapping
+from aws_vapor.dsl import Condition
+from aws_vapor.dsl import Resource
+from aws_vapor.dsl import Output
+from aws_vapor.dsl import Intrinsics
+from aws_vapor.dsl import Pseudos
+from aws_vapor.dsl import UserData
+from aws_vapor.dsl import CfnInitMetadata
+from aws_vapor.encoder import encode_value
+from aws_vapor.encoder import encode_element
+from aws_vapor.encoder import iterencode
+from aws_vapor.encoder import dump
+from aws_vapor.encoder import Encoding
+from aws_vapor.encoder import JsonBackend
+from aws_vapor.encoder import get_backend
+from aws_vapor.encoder import register_backend
+from aws_vapor.encoder import _backends
+from aws_vapor.encoder import _preferred_backends
+
+import pickle
+
+
+@nottest
+def expected_document(template):
+    return dumps(template.to_template(), indent=2, separators=(',', ': '))
+
+
+@nottest
+def actual_document(template, encoding=None):
+    output_file = StringIO()
+    if encoding is None:
+        dump(template, output_file)
+    else:
+        dump(template, output_file, encoding)
+    return output_file.getvalue()
+
+
+@nottest
+def sample_template():
+    template = Template(description='déscription "quoted"\n')
+    template.parameters(Parameter('param_1').type('Number').default(1.5).allowed_values([1, 2 ** 70]))
+    template.mappings(Mapping('map_1').add_category('category_1').add_item('key_1', 'value_1'))
+    template.resources(Resource('res_1').type('type_1').properties([
+        {'key_1': Intrinsics.ref('param_1')},
+        {'key_2': None},
+        {'key_3': [True, False, {}]},
+        UserData.of(['value_1', Intrinsics.ref('param_1')])
+    ]))
+    template.elements['Outputs'] = []
+    return template
+
+
+class ReversedBackend(JsonBackend):
+    name = 'reversed'
+
+
+class MissingBackend(JsonBackend):
+    name = 'missing'
+
+    def __init__(self):
+        raise ImportError('No module named missing')
+
+
+def test_encode_value__scalar():
+    assert_equal(encode_value('abcde', 3), '"abcde"')
+
+
+def test_encode_value__nested():
+    assert_equal(
+        encode_value({'key_1': ['value_1', 'value_2'], 'key_2': {}}, 1),
+        '{\n    "key_1": [\n      "value_1",\n      "value_2"\n    ],\n    "key_2": {}\n  }'
+    )
+
+
+def test_dump__empty_template():
+    template = Template()
+    assert_equal(actual_document(template), expected_document(template))
+
+
+def test_dump__empty_section():
+    template = Template(description='description')
+    template.elements['Resources'] = []
+    assert_equal(actual_document(template), expected_document(template))
+
+
+def test_dump__all_sections():
+    template = Template(description='déscription "quoted"\n')
+    template.metadata(Metadatum('meta_1').attributes('key_1', 'value_1'))
+    template.parameters(Parameter('param_1').type('String').default('').allowed_values(['a', 'b']))
+    mapping = template.mappings(Mapping('map_1').add_category('category_1').add_item('key_1', 'value_1'))
+    condition = template.conditions(Condition('cond_1').expression(Intrinsics.fn_equals(Intrinsics.ref('param_1'), 'a')))
+    resource = template.resources(Resource('res_1').type('type_1').condition(condition).properties([
+        {'key_1': mapping.find_in_map(Pseudos.region(), 'key_1')},
+        {'key_2': 1},
+        {'key_3': None},
+        {'key_4': True},
+        UserData.of(['value_1', Intrinsics.ref('param_1')])
+    ]).metadata(CfnInitMetadata.of([
+        CfnInitMetadata.Init([
+            CfnInitMetadata.Config('config').commands('key_1', 'value_1').packages('yum', 'httpd')
+        ])
+    ])))
+    template.resources(Resource('res_2').type('type_2').depends_on(resource))
+    template.outputs(Output('out_1').value(Intrinsics.get_att('res_1', 'attr_1')).export('name_1'))
+    assert_equal(actual_document(template), expected_document(template))
+
+
+def test_iterencode__one_chunk_per_element():
+    template = Template()
+    for i in range(3):
+        template.resources(Resource('res_%d' % i).type('type'))
+    chunks = [chunk for chunk in iterencode(template) if '"type"' in chunk]
+    assert_equal(len(chunks), 3)
+
+
+def test_encode_element__cached_until_modified():
+    resource = Resource('res_1').type('type_1')
+    encoded = encode_element(resource)
+    assert_equal(encoded, '\n    "res_1": {\n      "Type": "type_1"\n    }')
+    assert_equal(resource.dirty, False)
+    assert encode_element(resource) is encoded
+
+    resource.attrs['Type'] = 'type_X'
+    assert_equal(resource.dirty, True)
+    assert_equal(encode_element(resource), '\n    "res_1": {\n      "Type": "type_X"\n    }')
+
+    resource.attrs['Type'] = True
+    assert_equal(encode_element(resource), '\n    "res_1": {\n      "Type": true\n    }')
+
+
+def test_encode_element__nested_values_modified_in_place():
+    config = CfnInitMetadata.Config('config').commands('key_1', 'value_1')
+    metadata = CfnInitMetadata.of([CfnInitMetadata.Init([config])])
+    res_1 = Resource('res_1').type('type_1').metadata(metadata)
+    res_2 = Resource('res_2').type('type_2').metadata(metadata).add_property({'key_1': {'key_2': ['a']}})
+    encode_element(res_1)
+    encode_element(res_2)
+
+    config.commands('key_2', 'value_2')
+    res_2.attrs['Properties']['key_1']['key_2'].append('b')
+    res_1.touch()
+    assert_equal('"key_2"' in encode_element(res_1), True)
+
+    Element.verify_caches = True
+    try:
+        assert_equal('"key_2"' in encode_element(res_2), True)
+        assert_equal('"b"' in encode_element(res_2), True)
+        assert_equal(res_2.dirty, False)
+        res_2.attrs['Properties']['key_1']['key_2'].append('c')
+        assert_equal(res_2.dirty, True)
+    finally:
+        Element.verify_caches = False
+
+
+def test_dump__after_modification():
+    template = Template()
+    mapping = template.mappings(Mapping('map_1').add_category('category_1').add_item('key_1', 'value_1'))
+    resource = template.resources(Resource('res_1').type('type_1').add_property({'key_1': 'value_1'}))
+    condition = template.conditions(Condition('cond_1').expression(Intrinsics.fn_equals('a', 'b')))
+    template.parameters(Parameter('param_1').type('String'))
+    actual_document(template)
+
+    mapping.add_item('key_2', 'value_2')
+    resource.add_property({'key_2': 'value_2'})
+    condition.expression(Intrinsics.fn_equals('a', 'c'))
+    template.parameters(Parameter('param_1').default('value_1'), merge=True)
+    assert_equal(actual_document(template), expected_document(template))
+
+
+def test_dump__minify():
+    template = sample_template()
+    assert_equal(actual_document(template, Encoding(minify=True)),
+                 dumps(template.to_template(), separators=(',', ':')))
+
+
+def test_dump__orjson():
+    try:
+        backend = get_backend('orjson')
+    except ValueError:
+        raise nose.SkipTest('orjson is not installed')
+
+    template = sample_template()
+    assert_equal(actual_document(template, Encoding(backend)), expected_document(template))
+    assert_equal(actual_document(template, Encoding(backend, minify=True)),
+                 dumps(template.to_template(), separators=(',', ':')))
+
+
+def test_orjson_backend__non_finite_floats():
+    try:
+        backend = get_backend('orjson')
+    except ValueError:
+        raise nose.SkipTest('orjson is not installed')
+
+    value = {'key_1': [1.5, float('nan'), None], 'key_2': float('-inf')}
+    assert_equal(backend.dumps(value), JsonBackend().dumps(value))
+    assert_equal(backend.dumps(value, 2), JsonBackend().dumps(value, 2))
+    assert_equal(backend.dumps({'key_1': None}), '{"key_1":null}')
+
+
+def test_dump__same_element_with_each_encoding():
+    template = Template()
+    template.resources(Resource('res_1').type('type_1'))
+    assert_equal(actual_document(template, Encoding(minify=True)), dumps(template.to_template(), separators=(',', ':')))
+    assert_equal(actual_document(template), expected_document(template))
+
+
+def test_encoding__pickle():
+    encoding = pickle.loads(pickle.dumps(Encoding(minify=True)))
+    assert_equal(encoding.backend.name, 'json')
+    assert_equal(encoding.minify, True)
+    assert_equal(encoding.key, Encoding('json', True).key)
+
+
+@raises(ValueError)
+def test_get_backend__unknown():
+    get_backend('unknown')
+
+
+@raises(ValueError)
+def test_get_backend__not_available():
+    register_backend(MissingBackend.name, MissingBackend)
+    try:
+        get_backend(MissingBackend.name)
+    finally:
+        del _backends[MissingBackend.name]
+
+
+def test_register_backend__preferred():
+    register_backend(MissingBackend.name, MissingBackend, preferred=True)
+    register_backend(ReversedBackend.name, ReversedBackend, preferred=True)
+    try:
+        assert_equal(get_backend().name, ReversedBackend.name)
+    finally:
+        for name in (MissingBackend.name, ReversedBackend.name):
+            del _backends[name]
+            _preferred_backends.remove(name)
+
+
+if __name__ == '__main__':
+    nose.main(argv=['nosetests', '-s', '-v'], defaultTest=__file__)
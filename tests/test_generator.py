@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+
+import nose
+from nose.tools import assert_equal
+from nose.tools import nottest
+from nose.tools import raises
+
+import json
+import os
+
+from argparse import Namespace
+from io import StringIO
+
+from aws_vapor.analyzer import LimitExceededError
+from aws_vapor.generator import Generator
+from aws_vapor.generator import load_vaporfile
+from aws_vapor.generator import find_tasks
+from aws_vapor.generator import generate_tasks
+from aws_vapor.generator import prepare_templates
+from aws_vapor.dsl import Intrinsics
+from aws_vapor.dsl import Resource
+from aws_vapor.dsl import Template
+from aws_vapor.validator import ValidationError
+from aws_vapor.utils import CURRENT_DIRECTORY
+
+TOX_TMP_DIR = '.tox/tmp_generator'
+VAPORFILE_NAME = os.path.join(TOX_TMP_DIR, 'vaporfile_for_generator.py')
+VAPORFILE = '''
+from aws_vapor.dsl import Template, Resource, Output
+
+
+def _template(name):
+    t = Template(description=name)
+    t.resources(Resource(name).type('AWS::EC2::Instance'))
+    return t
+
+
+def generate():
+    return _template('Default')
+
+
+def task_dev():
+    return _template('Dev')
+
+
+def task_prod():
+    return _template('Prod')
+
+
+def broken():
+    raise RuntimeError('broken task')
+
+
+def chained():
+    t = Template(description='Chained')
+    for i in range(5):
+        resource = t.resources(Resource('Res%d' % i).type('AWS::SNS::Topic'))
+        if i > 0:
+            resource.add_property({'TopicName': {'Fn::GetAtt': ['Res%d' % (i - 1), 'TopicName']}})
+    t.outputs(Output('Last').value({'Ref': 'Res4'}))
+    return t
+
+
+def dangling():
+    t = _template('Dangling')
+    t.outputs(Output('Missing').value({'Ref': 'Missing'}))
+    return t
+'''
+
+
+class App(object):
+    def __init__(self):
+        self.stdout = StringIO()
+
+
+def setup():
+    if not os.path.exists(TOX_TMP_DIR):
+        os.mkdir(TOX_TMP_DIR)
+
+    with open(VAPORFILE_NAME, mode='wt') as fh:
+        fh.write(VAPORFILE)
+
+
+def teardown():
+    os.chdir(CURRENT_DIRECTORY)
+    for filename in os.listdir(TOX_TMP_DIR):
+        if filename.endswith('.json'):
+            os.remove(os.path.join(TOX_TMP_DIR, filename))
+
+
+@nottest
+def run_generator(task, output=None, jobs=None, max_bytes=0, minify=False, output_format='json', validate=False,
+                  max_resources=0, nested_stack_url=None, max_parameters=0, max_outputs=0):
+    app = App()
+    command = Generator(app, None)
+    args = Namespace(vaporfile=VAPORFILE_NAME, task=task, contrib=None, recipe=None, output=output, jobs=jobs,
+                     watch=False, interval=1.0, cache=False, cache_dir=None, cache_size=None,
+                     max_bytes=max_bytes, max_resources=max_resources, max_parameters=max_parameters,
+                     max_outputs=max_outputs, size_report=False, minify=minify,
+                     encoder='json', format=output_format, validate=validate, nested_stack_url=nested_stack_url)
+    try:
+        return command.take_action(args), app.stdout.getvalue()
+    finally:
+        os.chdir(CURRENT_DIRECTORY)
+
+
+@nottest
+def read_description(task_name):
+    with open(os.path.join(TOX_TMP_DIR, '%s.json' % task_name)) as fh:
+        return json.load(fh)['Description']
+
+
+def test_find_tasks__names_and_patterns():
+    (vaporfile, _, _) = load_vaporfile(os.path.abspath(VAPORFILE_NAME), None, resolve_task=False)
+    assert_equal(find_tasks(vaporfile, ['generate', 'task_*', 'task_dev']), ['generate', 'task_dev', 'task_prod'])
+
+
+@raises(ValueError)
+def test_find_tasks__missing_task():
+    (vaporfile, _, _) = load_vaporfile(os.path.abspath(VAPORFILE_NAME), None, resolve_task=False)
+    find_tasks(vaporfile, ['task_X'])
+
+
+@raises(ValueError)
+def test_find_tasks__no_task_matches_pattern():
+    (vaporfile, _, _) = load_vaporfile(os.path.abspath(VAPORFILE_NAME), None, resolve_task=False)
+    find_tasks(vaporfile, ['task_X*'])
+
+
+def test_generator__default_task_to_stdout():
+    status, stdout = run_generator([])
+    assert_equal(status, 0)
+    assert_equal(json.loads(stdout)['Description'], 'Default')
+
+
+def test_generator__minify():
+    status, stdout = run_generator([], minify=True)
+    assert_equal(status, 0)
+    assert_equal(stdout, json.dumps(json.loads(stdout), separators=(',', ':')) + '\n')
+
+
+def test_generator__minify_multiple_tasks():
+    status, _ = run_generator(['task_*'], output=os.path.join(TOX_TMP_DIR, '{task}.json'), jobs=2, minify=True)
+    assert_equal(status, 0)
+    with open(os.path.join(TOX_TMP_DIR, 'task_dev.json')) as fh:
+        assert_equal(fh.read().count('\n'), 1)
+
+
+def test_generator__yaml():
+    status, stdout = run_generator([], output_format='yaml')
+    assert_equal(status, 0)
+    assert_equal(stdout, "AWSTemplateFormatVersion: '2010-09-09'\nDescription: Default\n"
+                         "Resources:\n  Default:\n    Type: AWS::EC2::Instance\n")
+
+
+@raises(ValueError)
+def test_generator__yaml_minify():
+    run_generator([], minify=True, output_format='yaml')
+
+
+def test_generator__multiple_tasks():
+    status, _ = run_generator(['task_*'], output=os.path.join(TOX_TMP_DIR, '{task}.json'), jobs=2)
+    assert_equal(status, 0)
+    assert_equal(read_description('task_dev'), 'Dev')
+    assert_equal(read_description('task_prod'), 'Prod')
+
+
+def test_generator__pattern_matching_one_task_to_stdout():
+    status, stdout = run_generator(['task_d*'])
+    assert_equal(status, 0)
+    assert_equal(json.loads(stdout)['Description'], 'Dev')
+
+
+def test_generator__repeated_task_to_stdout():
+    status, stdout = run_generator(['task_dev', 'task_dev'])
+    assert_equal(status, 0)
+    assert_equal(json.loads(stdout)['Description'], 'Dev')
+
+
+@raises(ValueError)
+def test_generator__multiple_tasks_without_output():
+    run_generator(['task_*'])
+
+
+@raises(ValueError)
+def test_generator__multiple_tasks_without_task_in_output():
+    run_generator(['task_dev', 'task_prod'], output=os.path.join(TOX_TMP_DIR, 'output.json'))
+
+
+@raises(LimitExceededError)
+def test_generator__limits_exceeded():
+    output = os.path.join(TOX_TMP_DIR, 'exceeded.json')
+    try:
+        run_generator(['task_dev'], output=output, max_bytes=100)
+    finally:
+        assert_equal(os.path.exists(output), False)
+
+
+def test_generator__limits_exceeded_in_multiple_tasks():
+    status, _ = run_generator(['task_*'], output=os.path.join(TOX_TMP_DIR, 'exceeded_{task}.json'), jobs=1,
+                              max_bytes=100)
+    assert_equal(status, 1)
+    assert_equal(os.path.exists(os.path.join(TOX_TMP_DIR, 'exceeded_task_dev.json')), False)
+
+
+def test_generator__validate():
+    status, stdout = run_generator(['task_dev'], validate=True)
+    assert_equal(status, 0)
+    assert_equal(json.loads(stdout)['Description'], 'Dev')
+
+
+@raises(ValidationError)
+def test_generator__validate_dangling_reference():
+    output = os.path.join(TOX_TMP_DIR, 'dangling.json')
+    try:
+        run_generator(['dangling'], output=output, validate=True)
+    finally:
+        assert_equal(os.path.exists(output), False)
+
+
+def test_generator__dangling_reference_without_validate():
+    status, stdout = run_generator(['dangling'])
+    assert_equal(status, 0)
+    assert_equal(json.loads(stdout)['Outputs']['Missing']['Value'], {'Ref': 'Missing'})
+
+
+def test_generate_tasks__validate_dangling_reference():
+    results = list(generate_tasks(os.path.abspath(VAPORFILE_NAME), ['dangling', 'task_dev'], None, None,
+                                  os.path.join(TOX_TMP_DIR, '{task}.json'), jobs=1, validate=True))
+    assert_equal(results[0][2], "dangling has invalid references.\n"
+                                "Outputs/Missing/Value/Ref: Ref refers to undeclared parameter or resource 'Missing'")
+    assert_equal(results[1][2], None)
+
+
+def test_generator__nested_stacks():
+    output = os.path.join(TOX_TMP_DIR, 'chained.json')
+    status, _ = run_generator(['chained'], output=output, max_resources=3,
+                              nested_stack_url='https://example.com/templates/')
+    assert_equal(status, 0)
+    with open(output) as fh:
+        parent = json.load(fh)
+    assert_equal(sorted(parent['Resources']), ['Stack1', 'Stack2'])
+    assert_equal(parent['Resources']['Stack2']['Properties'], {
+        'TemplateURL': 'https://example.com/templates/chained-Stack2.json',
+        'Parameters': {'Res2TopicName': {'Fn::GetAtt': ['Stack1', 'Outputs.Res2TopicName']}},
+    })
+    assert_equal(parent['Outputs']['Last']['Value'], {'Fn::GetAtt': ['Stack2', 'Outputs.Res4']})
+    with open(os.path.join(TOX_TMP_DIR, 'chained-Stack2.json')) as fh:
+        child = json.load(fh)
+    assert_equal(sorted(child['Resources']), ['Res3', 'Res4'])
+    assert_equal(child['Resources']['Res3']['Properties']['TopicName'], {'Ref': 'Res2TopicName'})
+
+
+def test_generator__nested_stacks_within_limits():
+    output = os.path.join(TOX_TMP_DIR, 'chained.json')
+    status, _ = run_generator(['chained'], output=output, nested_stack_url='https://example.com/templates')
+    assert_equal(status, 0)
+    with open(output) as fh:
+        assert_equal(len(json.load(fh)['Resources']), 5)
+
+
+@raises(LimitExceededError)
+def test_prepare_templates__parameters_of_nested_stack_exceeded():
+    template = Template()
+    for index in range(1, 4):
+        template.resources(Resource('res_%d' % index).type('type_%d' % index))
+    template.resources(Resource('res_4').type('type_4').properties([
+        {'key_%d' % index: Intrinsics.get_att('res_%d' % index, 'Arn')} for index in range(1, 4)]))
+    limits = {'max_bytes': 0, 'max_resources': 2, 'max_parameters': 1, 'max_outputs': 0}
+    prepare_templates('fan_in', template, os.path.join(TOX_TMP_DIR, 'fan_in.json'), limits,
+                      nested_stack_url='https://example.com/templates')
+
+
+def test_generate_tasks__failure_reported():
+    results = list(generate_tasks(os.path.abspath(VAPORFILE_NAME), ['broken', 'task_dev'], None, None,
+                                  os.path.join(TOX_TMP_DIR, '{task}.json'), jobs=1))
+    assert_equal([task_name for task_name, _, _ in results], ['broken', 'task_dev'])
+    assert_equal('broken task' in results[0][2], True)
+    assert_equal(results[1][2], None)
+    assert_equal(os.getcwd(), CURRENT_DIRECTORY)
+
+
+if __name__ == '__main__':
+    nose.main(argv=['nosetests', '-s', '-v'], defaultTest=__file__)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+import nose
+from nose.tools import assert_equal
+from nose.tools import nottest
+from nose.tools import raises
+
+from aws_vapor.dsl import Template
+from aws_vapor.dsl import Parameter
+from aws_vapor.dsl import Mapping
+from aws_vapor.dsl import Condition
+from aws_vapor.dsl import Resource
+from aws_vapor.dsl import Output
+from aws_vapor.dsl import Intrinsics
+from aws_vapor.dsl import Pseudos
+from aws_vapor.graph import ReferenceGraph
+from aws_vapor.graph import element_references
+from aws_vapor.graph import iter_references
+
+
+@nottest
+def sample_template():
+    template = Template()
+    template.parameters(Parameter('param_1').type('String'))
+    mapping = template.mappings(Mapping('map_1').add_category('category_1').add_item('key_1', 'value_1'))
+    condition = template.conditions(
+        Condition('cond_1').expression(Intrinsics.fn_equals(Intrinsics.ref('param_1'), 'a')))
+    template.conditions(Condition('cond_2').expression(Intrinsics.fn_not(condition)))
+    template.conditions(Condition('cond_3').expression({'Fn::Not': [{'Condition': 'cond_1'}]}))
+    res_1 = template.resources(Resource('res_1').type('type_1').properties([
+        {'key_1': mapping.find_in_map(Pseudos.region(), 'key_1')},
+        {'key_2': Intrinsics.sub('${param_1}-${AWS::StackName}-${!Literal}')},
+    ]))
+    template.resources(Resource('res_2').type('type_2').condition(condition).depends_on(res_1).properties([
+        {'key_1': Intrinsics.fn_if('cond_1', Intrinsics.get_att('res_1', 'Arn'), Pseudos.no_value())},
+        {'key_2': Intrinsics.sub(['${res_1.Arn}/${name}', {'name': Intrinsics.ref('param_1')}])},
+    ]))
+    template.outputs(Output('out_1').value(Intrinsics.ref('res_2')).condition(condition))
+    return template
+
+
+def test_iter_references():
+    attrs = {
+        'Condition': 'cond_1',
+        'DependsOn': ['res_1', 'res_2'],
+        'Properties': {
+            'key_1': [{'Ref': 'param_1'}, {'Fn::GetAtt': 'res_3.Arn'}],
+            'key_2': {'Fn::Sub': '${res_4.Arn}${AWS::Region}${!res_5}'},
+            'Condition': {'key': 'value'},
+        },
+    }
+    assert_equal(list(iter_references(attrs, ('Resources', 'res_0'))), [
+        ('Condition', 'cond_1', ('Resources', 'res_0', 'Condition')),
+        ('DependsOn', 'res_1', ('Resources', 'res_0', 'DependsOn')),
+        ('DependsOn', 'res_2', ('Resources', 'res_0', 'DependsOn')),
+        ('Ref', 'param_1', ('Resources', 'res_0', 'Properties', 'key_1', 0, 'Ref')),
+        ('Fn::GetAtt', 'res_3', ('Resources', 'res_0', 'Properties', 'key_1', 1, 'Fn::GetAtt')),
+        ('Fn::GetAtt', 'res_4', ('Resources', 'res_0', 'Properties', 'key_2', 'Fn::Sub')),
+        ('Fn::Sub', 'AWS::Region', ('Resources', 'res_0', 'Properties', 'key_2', 'Fn::Sub')),
+    ])
+
+
+def test_element_references__cached_until_modified():
+    resource = Resource('res_1').type('type_1').add_property({'key_1': Intrinsics.ref('param_1')})
+    references = element_references('Resources', resource)
+    assert_equal(references, [('Ref', 'param_1', ('Resources', 'res_1', 'Properties', 'key_1', 'Ref'))])
+    assert element_references('Resources', resource) is references
+
+    resource.add_property({'key_2': Intrinsics.ref('param_2')})
+    assert_equal(len(element_references('Resources', resource)), 2)
+    assert_equal(element_references('Parameters', Parameter('param_1')), [])
+
+    resource.attrs['Properties']['key_1'] = Intrinsics.ref('param_3')
+    resource.touch()
+    assert_equal(element_references('Resources', resource)[0][1], 'param_3')
+
+
+def test_reference_graph__dependencies_and_dependents():
+    graph = ReferenceGraph(sample_template())
+    assert_equal(graph.dependencies(('Resources', 'res_1')), [('Mappings', 'map_1'), ('Parameters', 'param_1')])
+    assert_equal(graph.dependencies(('Resources', 'res_2')), [
+        ('Conditions', 'cond_1'), ('Resources', 'res_1'), ('Parameters', 'param_1')])
+    # `Intrinsics.fn_not` copies an expression of the condition instead of referring to it
+    assert_equal(graph.dependencies(('Conditions', 'cond_2')), [('Parameters', 'param_1')])
+    assert_equal(graph.dependents(('Conditions', 'cond_1')), [
+        ('Conditions', 'cond_3'), ('Resources', 'res_2'), ('Outputs', 'out_1')])
+    assert_equal(graph.unresolved, [])
+
+
+def test_reference_graph__unresolved():
+    template = Template()
+    template.resources(Resource('res_1').type('type_1').add_property({'key_1': Intrinsics.ref('param_X')}))
+    template.outputs(Output('out_1').value(Intrinsics.get_att('res_X', 'Arn')))
+    graph = ReferenceGraph(template)
+    assert_equal(graph.unresolved, [
+        (('Resources', 'res_1'), 'Ref', 'param_X', ('Resources', 'res_1', 'Properties', 'key_1', 'Ref')),
+        (('Outputs', 'out_1'), 'Fn::GetAtt', 'res_X', ('Outputs', 'out_1', 'Value', 'Fn::GetAtt')),
+    ])
+
+
+def test_reference_graph__topological_order():
+    graph = ReferenceGraph(sample_template())
+    order = graph.topological_order()
+    assert_equal(sorted(order), sorted(graph.nodes))
+    positions = {node: index for index, node in enumerate(order)}
+    for source, target in graph.edges():
+        assert positions[target] < positions[source]
+
+
+def test_reference_graph__cycles():
+    template = Template()
+    template.resources(Resource('res_1').type('type_1').add_property({'key_1': Intrinsics.ref('res_2')}))
+    template.resources(Resource('res_2').type('type_1').add_property({'key_1': Intrinsics.get_att('res_1', 'Arn')}))
+    template.resources(Resource('res_3').type('type_1').add_property({'key_1': Intrinsics.ref('res_3')}))
+    template.resources(Resource('res_4').type('type_1').add_property({'key_1': Intrinsics.ref('res_1')}))
+    assert_equal(ReferenceGraph(template).cycles(), [
+        [('Resources', 'res_1'), ('Resources', 'res_2')],
+        [('Resources', 'res_3')],
+    ])
+
+
+@raises(ValueError)
+def test_reference_graph__topological_order_with_cycle():
+    template = Template()
+    template.resources(Resource('res_1').type('type_1').add_property({'key_1': Intrinsics.ref('res_1')}))
+    ReferenceGraph(template).topological_order()
+
+
+def test_reference_graph__long_chain():
+    template = Template()
+    for i in range(5000):
+        template.resources(
+            Resource('res_%d' % i).type('type_1').add_property({'key_1': Intrinsics.ref('res_%d' % (i + 1))}))
+    graph = ReferenceGraph(template)
+    assert_equal(len(graph.unresolved), 1)
+    assert_equal(graph.topological_order()[:2], [('Resources', 'res_4999'), ('Resources', 'res_4998')])
+
+    template.resources(Resource('res_5000').type('type_1').add_property({'key_1': Intrinsics.ref('res_0')}))
+    assert_equal(len(ReferenceGraph(template).cycles()[0]), 5001)
+
+
+if __name__ == '__main__':
+    nose.main(argv=['nosetests', '-s', '-v'], defaultTest=__file__)
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+import nose
+from nose.tools import assert_equal
+
+import subprocess
+import sys
+
+SCRIPT = '''
+import sys
+from aws_vapor.main import LazyCommandManager
+manager = LazyCommandManager('aws_vapor.command')
+print(sorted([name for name, _ in manager]))
+print(sorted([name for name in sys.modules if name.startswith('aws_vapor.')]))
+command, name, args = manager.find_command(['generate', 'vaporfile.py'])
+print(command.__module__, name, args)
+print(sorted([name for name in sys.modules if name in ('email.mime', 'urllib.request', 'concurrent.futures')]))
+'''
+
+
+def test_lazy_command_manager():
+    output = subprocess.check_output([sys.executable, '-c', SCRIPT], universal_newlines=True)
+    assert_equal(output.splitlines(), [
+        "['batch', 'config', 'diff', 'generate', 'get']",
+        "['aws_vapor.main', 'aws_vapor.meta']",
+        "aws_vapor.generator generate ['vaporfile.py']",
+        '[]',
+    ])
+
+
+if __name__ == '__main__':
+    nose.main(argv=['nosetests', '-s', '-v'], defaultTest=__file__)
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+import nose
+from nose.tools import assert_equal
+from nose.tools import nottest
+from nose.tools import raises
+
+from aws_vapor.dsl import Template
+from aws_vapor.dsl import Parameter
+from aws_vapor.dsl import Mapping
+from aws_vapor.dsl import Condition
+from aws_vapor.dsl import Resource
+from aws_vapor.dsl import Output
+from aws_vapor.dsl import Intrinsics
+from aws_vapor.graph import ReferenceGraph
+from aws_vapor.partitioner import assign_resources
+from aws_vapor.partitioner import partition
+from aws_vapor.partitioner import referred_values
+from aws_vapor.validator import validate
+
+
+@nottest
+def template_url(stack_name):
+    return 'https://example.com/%s.json' % stack_name
+
+
+@nottest
+def sample_template():
+    template = Template()
+    template.parameters(Parameter('param_1').type('String'))
+    template.parameters(Parameter('param_2').type('List<AWS::EC2::Subnet::Id>'))
+    template.mappings(Mapping('map_1').add_category('category_1').add_item('key_1', 'value_1'))
+    template.conditions(Condition('cond_1').expression(Intrinsics.fn_equals(Intrinsics.ref('param_1'), 'a')))
+    template.conditions(Condition('cond_2').expression({'Fn::Not': [{'Condition': 'cond_1'}]}))
+    res_1 = template.resources(Resource('res_1').type('type_1').add_property(
+        {'key_1': Intrinsics.find_in_map('map_1', 'category_1', 'key_1')}))
+    template.resources(Resource('res_2').type('type_2').depends_on(res_1).properties([
+        {'key_1': Intrinsics.get_att('res_1', 'Arn')},
+        {'key_2': Intrinsics.sub('${res_1}/${res_1.Endpoint.Address}/${param_1}')},
+    ]))
+    template.resources(Resource('res_3').type('type_3').attributes('Condition', 'cond_2').add_property(
+        {'key_1': Intrinsics.ref('param_2')}))
+    template.outputs(Output('out_1').value(Intrinsics.sub('${res_2.Arn}')))
+    template.outputs(Output('out_2').value(Intrinsics.ref('param_1')))
+    return template
+
+
+@nottest
+def fan_in_template():
+    template = Template()
+    for index in range(1, 4):
+        template.resources(Resource('res_%d' % index).type('type_%d' % index))
+    template.resources(Resource('res_4').type('type_4').properties([
+        {'key_%d' % index: Intrinsics.get_att('res_%d' % index, 'Arn')} for index in range(1, 4)]))
+    template.resources(Resource('res_5').type('type_5').add_property({'key_1': Intrinsics.ref('res_4')}))
+    return template
+
+
+def test_referred_values():
+    values = referred_values(sample_template())
+    assert_equal(values[('Resources', 'res_1')], {})
+    assert_equal(sorted(values[('Resources', 'res_2')], key=repr),
+                 [('res_1', 'Arn'), ('res_1', 'Endpoint.Address'), ('res_1', None)])
+    assert_equal(values[('Resources', 'res_3')], {})
+    assert_equal(values[('Outputs', 'out_1')], {('res_2', 'Arn'): None})
+    assert_equal(values[('Outputs', 'out_2')], {})
+
+
+def test_assign_resources__connected_resources_together():
+    reference_graph = ReferenceGraph(sample_template())
+    assert_equal(assign_resources(reference_graph, {}, max_resources=2), [['res_1', 'res_2'], ['res_3']])
+    assert_equal(assign_resources(reference_graph, {}, max_resources=0), [['res_1', 'res_2', 'res_3']])
+
+
+def test_assign_resources__sizes():
+    reference_graph = ReferenceGraph(sample_template())
+    sizes = {'res_1': 400, 'res_2': 400, 'res_3': 100}
+    assert_equal(assign_resources(reference_graph, sizes, max_resources=0, max_bytes=1000, fill=0.5),
+                 [['res_1', 'res_3'], ['res_2']])
+
+
+def test_assign_resources__dependencies_first():
+    template = Template()
+    template.resources(Resource('res_3').type('type_3').add_property({'key_1': Intrinsics.ref('res_2')}))
+    template.resources(Resource('res_1').type('type_1'))
+    template.resources(Resource('res_2').type('type_2').add_property({'key_1': Intrinsics.ref('res_1')}))
+    assert_equal(assign_resources(ReferenceGraph(template), {}, max_resources=2), [['res_1', 'res_2'], ['res_3']])
+
+
+def test_assign_resources__parameters_and_outputs():
+    template = fan_in_template()
+    reference_graph = ReferenceGraph(template)
+    values = referred_values(template)
+    assert_equal(assign_resources(reference_graph, {}, max_resources=4, values=values),
+                 [['res_1', 'res_2', 'res_3', 'res_4'], ['res_5']])
+    assert_equal(assign_resources(reference_graph, {}, max_resources=4, values=values, max_outputs=2),
+                 [['res_1', 'res_2'], ['res_3', 'res_4', 'res_5']])
+    assert_equal(assign_resources(reference_graph, {}, max_resources=4, values=values, max_parameters=1,
+                                  max_outputs=2),
+                 [['res_1', 'res_2'], ['res_3'], ['res_4'], ['res_5']])
+    # a set of connected resources which fits in a group refers to no other group
+    assert_equal(assign_resources(reference_graph, {}, max_resources=0, values=values, max_parameters=1,
+                                  max_outputs=1),
+                 [['res_1', 'res_2', 'res_3', 'res_4', 'res_5']])
+
+
+def test_assign_resources__outputs_of_template():
+    template = fan_in_template()
+    template.outputs(Output('out_1').value(Intrinsics.ref('res_1')))
+    groups = assign_resources(ReferenceGraph(template), {}, max_resources=4, values=referred_values(template),
+                              max_outputs=2)
+    assert_equal(groups, [['res_1'], ['res_2', 'res_3', 'res_4', 'res_5']])
+
+
+def test_partition():
+    template = sample_template()
+    parent, children = partition(template, template_url, max_resources=1)
+    assert_equal([stack_name for stack_name, _ in children], ['Stack1', 'Stack2', 'Stack3'])
+
+    parent_template = parent.to_template()
+    assert_equal(list(parent_template['Parameters']), ['param_1', 'param_2'])
+    assert_equal(parent_template['Resources']['Stack1'], {
+        'Type': 'AWS::CloudFormation::Stack',
+        'Properties': {'TemplateURL': 'https://example.com/Stack1.json'},
+    })
+    assert_equal(parent_template['Resources']['Stack2'], {
+        'Type': 'AWS::CloudFormation::Stack',
+        'Properties': {
+            'TemplateURL': 'https://example.com/Stack2.json',
+            'Parameters': {
+                'param_1': {'Ref': 'param_1'},
+                'res_1Arn': {'Fn::GetAtt': ['Stack1', 'Outputs.res_1Arn']},
+                'res_1': {'Fn::GetAtt': ['Stack1', 'Outputs.res_1']},
+                'res_1EndpointAddress': {'Fn::GetAtt': ['Stack1', 'Outputs.res_1EndpointAddress']},
+            },
+        },
+        'DependsOn': ['Stack1'],
+    })
+    assert_equal(parent_template['Resources']['Stack3']['Properties']['Parameters'], {
+        'param_1': {'Ref': 'param_1'},
+        'param_2': {'Fn::Join': [',', {'Ref': 'param_2'}]},
+    })
+    assert_equal(parent_template['Outputs'], {
+        'out_1': {'Value': {'Fn::Sub': '${Stack2.Outputs.res_2Arn}'}},
+        'out_2': {'Value': {'Ref': 'param_1'}},
+    })
+
+    stack_1, stack_2, stack_3 = [child.to_template() for _, child in children]
+    assert_equal(list(stack_1['Mappings']), ['map_1'])
+    assert_equal(stack_1['Outputs'], {
+        'res_1Arn': {'Value': {'Fn::GetAtt': ['res_1', 'Arn']}},
+        'res_1': {'Value': {'Ref': 'res_1'}},
+        'res_1EndpointAddress': {'Value': {'Fn::GetAtt': ['res_1', 'Endpoint.Address']}},
+    })
+    assert_equal(stack_2['Resources']['res_2'], {
+        'Type': 'type_2',
+        'Properties': {
+            'key_1': {'Ref': 'res_1Arn'},
+            'key_2': {'Fn::Sub': '${res_1}/${res_1EndpointAddress}/${param_1}'},
+        },
+    })
+    assert_equal(stack_2['Outputs'], {'res_2Arn': {'Value': {'Fn::GetAtt': ['res_2', 'Arn']}}})
+    assert_equal(list(stack_3['Parameters']), ['param_1', 'param_2'])
+    assert_equal(list(stack_3['Conditions']), ['cond_1', 'cond_2'])
+
+    for stack_name, child in children:
+        assert_equal(validate(child), [])
+    assert_equal(validate(parent), [])
+
+
+def test_partition__unmodified_elements_shared():
+    template = sample_template()
+    parent, children = partition(template, template_url, max_resources=2)
+    assert children[0][1].elements['Resources'][0] is template.get('Resources', 'res_1')
+    assert children[1][1].elements['Resources'][0] is template.get('Resources', 'res_3')
+    assert parent.elements['Outputs'][1] is template.get('Outputs', 'out_2')
+    # the template itself is not modified
+    assert_equal(template.get('Resources', 'res_2').attrs['DependsOn'], 'res_1')
+
+
+def test_partition__parameters_and_outputs_within_limits():
+    template = Template()
+    for index in range(1, 31):
+        resource = Resource('res_%d' % index).type('type_1')
+        if index > 1:
+            resource.add_property({'key_1': Intrinsics.get_att('res_%d' % (index - 1), 'Arn'),
+                                   'key_2': Intrinsics.ref('res_%d' % (index // 2))})
+        template.resources(resource)
+    _, children = partition(template, template_url, max_resources=10, max_parameters=4, max_outputs=4)
+    for _, child in children:
+        assert len(child.elements.get('Parameters', [])) <= 4
+        assert len(child.elements.get('Outputs', [])) <= 4
+        assert_equal(validate(child), [])
+
+
+@raises(ValueError)
+def test_partition__attribute_given_by_function():
+    template = Template()
+    template.resources(Resource('res_1').type('type_1'))
+    template.resources(Resource('res_2').type('type_2').add_property(
+        {'key_1': {'Fn::GetAtt': ['res_1', {'Ref': 'param_1'}]}}))
+    partition(template, template_url, max_resources=1)
+
+
+if __name__ == '__main__':
+    nose.main(argv=['nosetests', '-s', '-v'], defaultTest=__file__)
@@ -7,11 +7,21 @@ from nose.tools import raises
 
 import os
 
+from io import StringIO
+
+import aws_vapor.utils as utils
+
 from aws_vapor.utils import load_from_config_file
 from aws_vapor.utils import get_property_from_config_file
+from aws_vapor.utils import get_properties_from_config_file
 from aws_vapor.utils import save_to_config_file
 from aws_vapor.utils import combine_user_data
 from aws_vapor.utils import inject_params
+from aws_vapor.utils import iter_inject_params
+from aws_vapor.utils import read_file
+from aws_vapor.utils import clear_file_cache
+from aws_vapor.utils import inject_params_from_file
+from aws_vapor.utils import inject_params_to_user_data
 from aws_vapor.utils import open_output_file
 from aws_vapor.utils import CURRENT_DIRECTORY
 from aws_vapor.utils import CONFIG_FILE_NAME
@@ -160,6 +170,36 @@ def test_get_property_from_config_file__not_found_key_with_default_value():
     )
 
 
+def test_get_properties_from_config_file():
+    assert_equal(
+        get_properties_from_config_file('section_1', ['key_1', 'key_2', 'key_X'], 'value_default'),
+        {'key_1': 'value_1', 'key_2': 'value_2', 'key_X': 'value_default'}
+    )
+
+
+def test_get_properties_from_config_file__not_found_section():
+    assert_equal(
+        get_properties_from_config_file('section_X', ['key_1']),
+        {'key_1': None}
+    )
+
+
+def test_load_from_config_file__cached_until_modified():
+    config_file = os.path.join(TOX_TMP2_DIR, CONFIG_FILE_NAME)
+    first = load_from_config_file([TOX_TMP2_DIR])
+    parsed = utils._config_cache[(config_file,)][1]
+    load_from_config_file([TOX_TMP2_DIR])
+    assert_equal(utils._config_cache[(config_file,)][1] is parsed, True)
+
+    first['section_1']['key_1'] = 'modified'
+    assert_equal(load_from_config_file([TOX_TMP2_DIR])['section_1']['key_1'], 'value_1')
+
+    with open(config_file, mode='at') as fh:
+        fh.write('[section_3]\n')
+        fh.write('key_6 = value_6\n')
+    assert_equal(load_from_config_file([TOX_TMP2_DIR])['section_3'], {'key_6': 'value_6'})
+
+
 def test_inject_params__all_placeholders_replaced():
     assert_equal(
         inject_params('abcde\n__{{ fghij }}__\nklmno\n', {'fghij': '__fghij__'}),
@@ -216,5 +256,146 @@ def test_inject_params__multi_placeholders_in_one_line():
     )
 
 
+def test_inject_params__adjacent_placeholders():
+    assert_equal(
+        inject_params('{{ fghij }}{{ klmno }}', {'fghij': '__fghij__', 'klmno': '__klmno__'}),
+        ['', '__fghij__', '', '__klmno__', '\n']
+    )
+
+
+def test_inject_params__placeholder_names_sharing_prefix():
+    assert_equal(
+        inject_params('{{ ab }}_{{ a }}_{{ abc }}', {'a': 1, 'ab': 2, 'abc': 3}),
+        ['', 2, '_', 1, '_', 3, '\n']
+    )
+
+
+def test_inject_params__placeholder_names_including_special_characters():
+    assert_equal(
+        inject_params('__{{ a.b* }}__{{ a_b_ }}__', {'a.b*': '__1__', 'a_b_': '__2__'}),
+        ['__', '__1__', '__', '__2__', '__\n']
+    )
+
+
+def test_inject_params__non_string_values():
+    assert_equal(
+        inject_params('region={{ region }}\n', {'region': {'Ref': 'AWS::Region'}}),
+        ['region=', {'Ref': 'AWS::Region'}, '\n', '\n']
+    )
+
+
+def test_inject_params__many_placeholders_in_one_line():
+    tokens = inject_params('{{ fghij }}_' * 10000, {'fghij': 'x'})
+    assert_equal(len(tokens), 20001)
+    assert_equal(''.join(tokens), 'x_' * 10000 + '\n')
+
+
+def test_iter_inject_params__literals_coalesced():
+    assert_equal(
+        list(iter_inject_params(StringIO('abcde\n__{{ fghij }}__\nklmno\n'), {'fghij': '__fghij__'})),
+        ['abcde\n____fghij____\nklmno\n\n']
+    )
+
+
+def test_iter_inject_params__split_by_non_string_values():
+    assert_equal(
+        list(iter_inject_params(StringIO('{{ a }}__{{ b }}__\n{{ a }}'), {'a': {'Ref': 'a'}, 'b': 'b'})),
+        [{'Ref': 'a'}, '__b__\n', {'Ref': 'a'}, '\n']
+    )
+
+
+def test_iter_inject_params__no_parameters_passed():
+    assert_equal(
+        list(iter_inject_params(StringIO('abcde\n__{{ fghij }}__'), {})),
+        ['abcde\n__{{ fghij }}__\n']
+    )
+
+
+def test_iter_inject_params__empty_file():
+    assert_equal(list(iter_inject_params(StringIO(''), {'fghij': '__fghij__'})), ['\n'])
+
+
+def test_iter_inject_params__small_chunks():
+    content = 'abcde {{ fghij }}\n{{ klmno }}\n\nlong line {{ fghij }} without newline'
+    params = {'fghij': {'Ref': 'fghij'}, 'klmno': '__klmno__'}
+    for chunk_size in range(1, len(content) + 2):
+        tokens = list(iter_inject_params(StringIO(content), params, chunk_size))
+        assert_equal(tokens, [
+            'abcde ', {'Ref': 'fghij'}, '\n__klmno__\n\nlong line ', {'Ref': 'fghij'}, ' without newline\n'
+        ])
+
+
+@nottest
+def write_text_file(file_path, content):
+    with open(file_path, mode='wt') as fh:
+        fh.write(content)
+
+
+def test_read_file__cached_until_modified():
+    file_path = os.path.join(TOX_TMP1_DIR, 'cached.txt')
+    write_text_file(file_path, 'abcde\n')
+    clear_file_cache()
+
+    content = read_file(file_path)
+    assert_equal(content, 'abcde\n')
+    assert_equal(read_file(file_path) is content, True)
+
+    write_text_file(file_path, 'fghijklmno\n')
+    assert_equal(read_file(file_path), 'fghijklmno\n')
+
+
+def test_read_file__least_recently_used_evicted():
+    file_paths = [os.path.join(TOX_TMP1_DIR, 'cached_%d.txt' % i) for i in range(3)]
+    for file_path in file_paths:
+        write_text_file(file_path, file_path)
+    clear_file_cache()
+
+    original_size = utils.FILE_CACHE_SIZE
+    utils.FILE_CACHE_SIZE = 2
+    try:
+        first = read_file(file_paths[0])
+        read_file(file_paths[1])
+        read_file(file_paths[0])
+        read_file(file_paths[2])
+        assert_equal(len(utils._file_cache), 2)
+        assert_equal(read_file(file_paths[0]) is first, True)
+    finally:
+        utils.FILE_CACHE_SIZE = original_size
+
+
+def test_inject_params_from_file__cached_per_params():
+    file_path = os.path.join(TOX_TMP1_DIR, 'template.txt')
+    write_text_file(file_path, 'abcde {{ fghij }}\n')
+    clear_file_cache()
+
+    tokens = inject_params_from_file(file_path, {'fghij': {'Ref': 'fghij'}})
+    assert_equal(tokens, ['abcde ', {'Ref': 'fghij'}, '\n\n'])
+    tokens.append('modified')
+    assert_equal(inject_params_from_file(file_path, {'fghij': {'Ref': 'fghij'}}), ['abcde ', {'Ref': 'fghij'}, '\n\n'])
+    assert_equal(inject_params_from_file(file_path, {'fghij': '__fghij__'}), ['abcde __fghij__\n\n'])
+
+
+def test_inject_params_to_user_data__cached():
+    file_path = os.path.join(TOX_TMP1_DIR, 'user_data.txt')
+    write_text_file(file_path, 'abcde {{ fghij }}\n')
+    clear_file_cache()
+
+    tokens = inject_params_to_user_data([(file_path, 'x-shellscript')], {'fghij': {'Ref': 'fghij'}})
+    assert_equal(tokens[1], {'Ref': 'fghij'})
+    assert_equal(tokens, inject_params_to_user_data([(file_path, 'x-shellscript')], {'fghij': {'Ref': 'fghij'}}))
+
+
+def test_inject_params_to_user_data__cached_per_file_name():
+    file_path = os.path.join(TOX_TMP1_DIR, 'user_data.txt')
+    write_text_file(file_path, 'abcde\n')
+    clear_file_cache()
+
+    tokens = inject_params_to_user_data([(file_path, 'x-shellscript')], {})
+    assert_equal('filename="%s"' % file_path in tokens[0], True)
+    other_path = os.path.join('.', file_path)
+    tokens = inject_params_to_user_data([(other_path, 'x-shellscript')], {})
+    assert_equal('filename="%s"' % other_path in tokens[0], True)
+
+
 if __name__ == '__main__':
     nose.main(argv=['nosetests', '-s', '-v'], defaultTest=__file__)
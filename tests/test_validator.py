@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+import nose
+from nose.tools import assert_equal
+from nose.tools import nottest
+from nose.tools import raises
+
+from aws_vapor.dsl import Template
+from aws_vapor.dsl import Parameter
+from aws_vapor.dsl import Mapping
+from aws_vapor.dsl import Condition
+from aws_vapor.dsl import Resource
+from aws_vapor.dsl import Output
+from aws_vapor.dsl import Intrinsics
+from aws_vapor.dsl import Pseudos
+from aws_vapor.validator import ValidationError
+from aws_vapor.validator import check_references
+from aws_vapor.validator import validate
+
+
+@nottest
+def valid_template():
+    template = Template()
+    template.parameters(Parameter('param_1').type('String'))
+    mapping = template.mappings(Mapping('map_1').add_category('category_1').add_item('key_1', 'value_1'))
+    condition = template.conditions(
+        Condition('cond_1').expression(Intrinsics.fn_equals(Intrinsics.ref('param_1'), 'a')))
+    res_1 = template.resources(Resource('res_1').type('type_1').properties([
+        {'key_1': mapping.find_in_map(Pseudos.region(), 'key_1')},
+        {'key_2': Intrinsics.sub('${param_1}-${AWS::StackName}')},
+    ]))
+    template.resources(Resource('res_2').type('type_2').condition(condition).depends_on(res_1).properties([
+        {'key_1': Intrinsics.get_att('res_1', 'Arn')},
+    ]))
+    template.outputs(Output('out_1').value(Intrinsics.ref('res_2')))
+    return template
+
+
+def test_validate__no_problems():
+    assert_equal(validate(valid_template()), [])
+    check_references(valid_template())
+
+
+def test_validate__all_problems_in_one_pass():
+    template = valid_template()
+    template.resources(Resource('res_3').type('type_3').depends_on(Resource('res_X')).properties([
+        {'key_1': Intrinsics.ref('param_X')},
+        {'key_2': Intrinsics.get_att('param_1', 'Arn')},
+        {'key_3': Intrinsics.find_in_map('map_X', 'key_1', 'key_2')},
+        {'key_4': Intrinsics.fn_if('cond_X', 'a', 'b')},
+    ]))
+    assert_equal(validate(template), [
+        "Resources/res_3/DependsOn: DependsOn refers to undeclared resource 'res_X'",
+        "Resources/res_3/Properties/key_1/Ref: Ref refers to undeclared parameter or resource 'param_X'",
+        "Resources/res_3/Properties/key_2/Fn::GetAtt: Fn::GetAtt refers to undeclared resource 'param_1'",
+        "Resources/res_3/Properties/key_3/Fn::FindInMap: Fn::FindInMap refers to undeclared mapping 'map_X'",
+        "Resources/res_3/Properties/key_4/Fn::If: Condition refers to undeclared condition 'cond_X'",
+    ])
+
+
+def test_validate__cycles():
+    template = Template()
+    template.resources(Resource('res_1').type('type_1').depends_on(Resource('res_2')))
+    template.resources(Resource('res_2').type('type_2').add_property({'key_1': Intrinsics.ref('res_1')}))
+    assert_equal(validate(template), ['Resources/res_1, Resources/res_2: elements refer to each other cyclically'])
+
+
+@raises(ValidationError)
+def test_check_references__problems():
+    template = valid_template()
+    template.outputs(Output('out_2').value(Intrinsics.ref('res_X')))
+    check_references(template)
+
+
+if __name__ == '__main__':
+    nose.main(argv=['nosetests', '-s', '-v'], defaultTest=__file__)
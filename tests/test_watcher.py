@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+import nose
+from nose.tools import assert_equal
+from nose.tools import nottest
+from nose.tools import raises
+
+import os
+import shutil
+import sys
+
+from aws_vapor.watcher import Watcher
+from aws_vapor.utils import CURRENT_DIRECTORY
+
+TOX_TMP_DIR = '.tox/tmp_watcher'
+VAPORFILE_NAME = os.path.join(TOX_TMP_DIR, 'vaporfile_for_watcher.py')
+HELPER_NAME = os.path.join(TOX_TMP_DIR, 'helper_for_watcher.py')
+HELPER_A_NAME = os.path.join(TOX_TMP_DIR, 'helper_a_for_watcher.py')
+HELPER_B_NAME = os.path.join(TOX_TMP_DIR, 'helper_b_for_watcher.py')
+RECIPE_NAME = os.path.join(TOX_TMP_DIR, 'recipe_for_watcher.py')
+DATA_A_NAME = os.path.join(TOX_TMP_DIR, 'data_a.txt')
+DATA_B_NAME = os.path.join(TOX_TMP_DIR, 'data_b.txt')
+VAPORFILE = '''
+from aws_vapor.dsl import Template, Resource, CfnInitMetadata
+import helper_for_watcher
+import helper_a_for_watcher
+from helper_b_for_watcher import data_file
+
+
+def _template(data_file):
+    config = CfnInitMetadata.Config('config').files('/etc/data', local_file_path=data_file)
+    t = Template(description=helper_for_watcher.DESCRIPTION)
+    t.resources(Resource('Instance').metadata(CfnInitMetadata.of([CfnInitMetadata.Init([config])])))
+    return t
+
+
+def task_a():
+    return _template(helper_a_for_watcher.DATA_FILE)
+
+
+def task_b():
+    return _template(data_file())
+'''
+
+
+@nottest
+def write_text_file(file_path, content):
+    with open(file_path, mode='wt') as fh:
+        fh.write(content)
+
+
+def setup():
+    if not os.path.exists(TOX_TMP_DIR):
+        os.mkdir(TOX_TMP_DIR)
+    write_text_file(VAPORFILE_NAME, VAPORFILE)
+
+
+def teardown():
+    shutil.rmtree(TOX_TMP_DIR)
+    unload_modules()
+
+
+@nottest
+def unload_modules():
+    for name in ['vaporfile_for_watcher', 'helper_for_watcher', 'helper_a_for_watcher', 'helper_b_for_watcher',
+                 'recipe_for_watcher']:
+        sys.modules.pop(name, None)
+
+
+@nottest
+def new_watcher(outputs, recipes=None):
+    unload_modules()
+    write_text_file(HELPER_NAME, 'DESCRIPTION = "first"\n')
+    write_text_file(HELPER_A_NAME, 'DATA_FILE = "data_a.txt"\n')
+    write_text_file(HELPER_B_NAME, 'def data_file():\n    return "data_b.txt"\n')
+    write_text_file(DATA_A_NAME, 'a\n')
+    write_text_file(DATA_B_NAME, 'b\n')
+
+    def output(task_name, template):
+        content = template.elements['Resources'][0].attrs['Metadata']['AWS::CloudFormation::Init']['config']
+        outputs.append((task_name, template.description, content['files']['/etc/data']['content']['Fn::Join'][1]))
+
+    contrib = os.path.abspath(TOX_TMP_DIR) if recipes is not None else None
+    return Watcher(VAPORFILE_NAME, ['task_a', 'task_b'], contrib, recipes, output, interval=0)
+
+
+def test_watcher__dependencies_recorded():
+    outputs = []
+    watcher = new_watcher(outputs)
+    watcher.watch(cycles=0)
+    assert_equal(outputs, [('task_a', 'first', ['a\n\n']), ('task_b', 'first', ['b\n\n'])])
+    assert_equal(os.path.abspath(DATA_A_NAME) in watcher.dependencies['task_a'], True)
+    assert_equal(os.path.abspath(DATA_A_NAME) in watcher.dependencies['task_b'], False)
+    assert_equal(os.path.abspath(HELPER_NAME) in watcher.dependencies['task_b'], True)
+    assert_equal(watcher.poll(), set())
+    assert_equal(os.getcwd(), CURRENT_DIRECTORY)
+
+
+def test_watcher__data_file_modified():
+    outputs = []
+    watcher = new_watcher(outputs)
+    watcher.watch(cycles=0)
+    del outputs[:]
+
+    write_text_file(DATA_A_NAME, 'modified a\n')
+    assert_equal(watcher.regenerate(watcher.poll()), ['task_a'])
+    assert_equal(outputs, [('task_a', 'first', ['modified a\n\n'])])
+
+
+def test_watcher__imported_module_modified():
+    outputs = []
+    watcher = new_watcher(outputs)
+    watcher.watch(cycles=0)
+    del outputs[:]
+
+    write_text_file(HELPER_NAME, 'DESCRIPTION = "second"\n')
+    assert_equal(watcher.unload_modules({os.path.abspath(HELPER_NAME)}),
+                 ['helper_for_watcher', 'vaporfile_for_watcher'])
+    assert_equal(watcher.regenerate(watcher.poll()), ['task_a', 'task_b'])
+    assert_equal(outputs, [('task_a', 'second', ['a\n\n']), ('task_b', 'second', ['b\n\n'])])
+
+
+def test_watcher__only_tasks_using_module_regenerated():
+    outputs = []
+    watcher = new_watcher(outputs)
+    watcher.watch(cycles=0)
+    assert_equal(os.path.abspath(HELPER_A_NAME) in watcher.dependencies['task_a'], True)
+    assert_equal(os.path.abspath(HELPER_A_NAME) in watcher.dependencies['task_b'], False)
+    assert_equal(os.path.abspath(HELPER_B_NAME) in watcher.dependencies['task_a'], False)
+    assert_equal(os.path.abspath(HELPER_B_NAME) in watcher.dependencies['task_b'], True)
+    del outputs[:]
+
+    write_text_file(HELPER_A_NAME, 'DATA_FILE = "data_b.txt"\n')
+    assert_equal(watcher.regenerate(watcher.poll()), ['task_a'])
+    assert_equal(outputs, [('task_a', 'first', ['b\n\n'])])
+    del outputs[:]
+
+    write_text_file(HELPER_B_NAME, 'def data_file():\n    return "data_a.txt"\n')
+    assert_equal(watcher.regenerate(watcher.poll()), ['task_b'])
+    assert_equal(outputs, [('task_b', 'first', ['a\n\n'])])
+
+
+def test_watcher__recipe_modified():
+    write_text_file(RECIPE_NAME, 'def recipe(template):\n    template.description += "!"\n')
+    outputs = []
+    watcher = new_watcher(outputs, ['recipe_for_watcher'])
+    watcher.watch(cycles=0)
+    assert_equal([description for _, description, _ in outputs], ['first!', 'first!'])
+    del outputs[:]
+
+    write_text_file(RECIPE_NAME, 'def recipe(template):\n    template.description += "?"\n')
+    assert_equal(watcher.regenerate(watcher.poll()), ['task_a', 'task_b'])
+    assert_equal([description for _, description, _ in outputs], ['first?', 'first?'])
+
+
+def test_watcher__failed_task_keeps_dependencies():
+    outputs = []
+    watcher = new_watcher(outputs)
+    watcher.watch(cycles=0)
+    del outputs[:]
+
+    os.remove(DATA_B_NAME)
+    assert_equal(watcher.regenerate(watcher.poll()), ['task_b'])
+    assert_equal(outputs, [])
+
+    write_text_file(DATA_B_NAME, 'fixed b\n')
+    assert_equal(watcher.regenerate(watcher.poll()), ['task_b'])
+    assert_equal(outputs, [('task_b', 'first', ['fixed b\n\n'])])
+
+
+if __name__ == '__main__':
+    nose.main(argv=['nosetests', '-s', '-v'], defaultTest=__file__)